@@ -13,20 +13,36 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import json
+import os
+
 import antlr4
 
-from smartanthill_phc import writer
+from smartanthill_phc import interpreter, simulator, size_report, trace,\
+    writer
 from smartanthill_phc.antlr_parser import CLexer, CParser
 from smartanthill_phc.builtin import create_builtins
 from smartanthill_phc.common.antlr_helper import dump_antlr_tree
 from smartanthill_phc.common.compiler import Compiler, Ctx
 from smartanthill_phc.common.visitor import dump_tree,\
     check_all_nodes_reachables
+from smartanthill_phc.cost import get_cost_table
+from smartanthill_phc.cost_report import get_state_costs, format_text,\
+    format_json
+from smartanthill_phc.fold import fold_constants
+from smartanthill_phc.inline import inline_functions
 from smartanthill_phc.manifest import create_manifest
+from smartanthill_phc.micro_sleep import replace_short_sleeps
+from smartanthill_phc.narrow import narrow_moved_vars
+from smartanthill_phc.parse_write import ZeptoPlugin
 from smartanthill_phc.parser import c_parse_tree_to_syntax_tree
+from smartanthill_phc.peephole import optimize_states
+from smartanthill_phc.promote import promote_moved_vars
+from smartanthill_phc.remat import rematerialize
 from smartanthill_phc.resolve import resolve_tree
 from smartanthill_phc.rewrite import rewrite_code
 from smartanthill_phc.root import RootNode
+from smartanthill_phc.scalar import split_structs
 from smartanthill_phc.state import create_states
 
 
@@ -45,13 +61,11 @@ class _Helper(object):
         self.cparser = CParser.CParser(self.token_stream)
 
 
-def process_file(file_name, zepto_plugin, prefix, split_all, dump, papi=None):
+def _create_tree(c, file_name, zepto_plugin, prefix, dump, papi):
     '''
-    Process a c input file, and returns an string with output text
+    Parses and resolves a c input file, returns the root node and
+    the parser helper of the file
     '''
-    # pylint: disable=too-many-locals
-
-    c = Compiler()
     root = c.init_node(RootNode(), Ctx.ROOT)
     builtin = create_builtins(c, Ctx.BUILTIN)
     root.builtins.set(builtin)
@@ -83,23 +97,354 @@ def process_file(file_name, zepto_plugin, prefix, split_all, dump, papi=None):
     check_all_nodes_reachables(c, root)
     resolve_tree(c, root)
 
-    create_states(c, root, prefix, split_all)
+    return (root, helper)
+
+
+# options changing the tree in ways token based rewrite can not follow
+_NO_REWRITE = ['inline_threshold', 'overlap_waits', 'yield_budget',
+               'narrow_vars', 'scalar_structs', 'recompute', 'pack_state',
+               'trace', 'profile', 'peephole', 'micro_sleep', 'promote_vars',
+               'parse_in_place', 'outline_waits', 'fold']
+
+
+class Options(object):
+
+    '''
+    Options of the passes creating states and of the writers, shared by
+    process_file, report_costs, simulate_handler, write_state_map and
+    scenario plugins, so all of them see the same state machine.
+    split is the granularity of extra debug states, False or 'none',
+    True or 'statement', 'block', 'loop', or a statement count.
+    inline_threshold is the maximum size (in statements) of functions with
+    states that will be inlined into its callers, zero disables inlining.
+    computed_goto selects label table state dispatch for gcc and clang.
+    overlap_waits starts adjacent independent blocking calls together,
+    overlap_sleeps also allows sleeps to be grouped with them.
+    yield_budget is the maximum estimated cost of a state, as computed
+    with cost_table, before a 'PLUGIN_YIELD' state is added,
+    zero disables it.
+    narrow_vars stores moved integer variables in the smallest type that
+    holds their range of values.
+    pack_state also stores moved booleans and small range integers as bit
+    fields of the state struct, it implies narrow_vars.
+    scalar_structs replaces local struct variables with a variable for
+    each field used, so only fields needed after a state change are moved.
+    recompute moves side effect free declarations to function beginning,
+    when cheaper than keeping them in the state, see rematerialize.
+    trace calls SA_TRACE_* macros at each state entry, yield and sub state
+    machine entry and exit, see write_state_map to decode their arguments.
+    profile maps function names to a map of state number to times it was
+    run, as written by write_profile. States resumed most often are
+    dispatched first, and rarely run states and sub state machines are
+    marked as cold.
+    fast_polls is the number of times spi and i2c waits are checked right
+    after starting them, so operations completed by then continue without
+    a handler re-entry, zero disables it.
+    peephole merges and removes states that only add a handler re-entry,
+    see optimize_states.
+    micro_sleep is the duration below which sleeps with a literal duration
+    are a busy wait instead of a state change, zero disables it.
+    promote_vars is the number of uses in a single state from which a moved
+    variable is kept in a local while the handler runs, instead of being
+    accessed through the state struct, see promote_moved_vars, zero
+    disables it.
+    fields_table writes request parser and reply composer as a table of
+    fields and a shared loop, see writer.write_parser.
+    parse_in_place decodes the request straight into the handler variable
+    holding it, in the state struct when it is moved, instead of returning
+    it by value and copying it.
+    buffer_sizes defines the worst case encoded size of request and reply
+    at plugin header, see report_sizes.
+    outline_waits is the number of spi or i2c waits of the same kind from
+    which their start is a call to a static helper shared by all of them,
+    instead of being written at each wait, zero disables it.
+    fold removes branches and loops never run because of a constant
+    condition, before states are created, see fold_constants.
+    rewrite also writes the code with token based rewrite of the source.
+    It can not follow inlined, grouped, yielding, narrowed, packed, scalar
+    replaced, recomputed, traced, profiled, peephole optimized, micro
+    sleep, promoted, in place parsed, outlined or folded code. When None,
+    it is enabled unless one of them is, when True it can not be enabled
+    together with them
+    '''
+
+    def __init__(self, split=False, inline_threshold=0, computed_goto=False,
+                 overlap_waits=False, overlap_sleeps=False, yield_budget=0,
+                 cost_table=None, narrow_vars=False, scalar_structs=False,
+                 recompute=False, pack_state=False, trace=False,
+                 profile=None, fast_polls=0, peephole=False, micro_sleep=0,
+                 promote_vars=0, fields_table=False, parse_in_place=False,
+                 buffer_sizes=False, outline_waits=0, fold=False,
+                 rewrite=None):
+        '''
+        Constructor
+        '''
+        # pylint: disable=too-many-locals
+        self.split = split
+        self.inline_threshold = inline_threshold
+        self.computed_goto = computed_goto
+        self.overlap_waits = overlap_waits
+        self.overlap_sleeps = overlap_sleeps
+        self.yield_budget = yield_budget
+        self.cost_table = cost_table
+        self.narrow_vars = narrow_vars
+        self.scalar_structs = scalar_structs
+        self.recompute = recompute
+        self.pack_state = pack_state
+        self.trace = trace
+        self.profile = profile
+        self.fast_polls = fast_polls
+        self.peephole = peephole
+        self.micro_sleep = micro_sleep
+        self.promote_vars = promote_vars
+        self.fields_table = fields_table
+        self.parse_in_place = parse_in_place
+        self.buffer_sizes = buffer_sizes
+        self.outline_waits = outline_waits
+        self.fold = fold
+
+        used = [name for name in _NO_REWRITE if getattr(self, name)]
+        if rewrite is None:
+            rewrite = len(used) == 0
+        elif rewrite and len(used) != 0:
+            raise ValueError("Token based rewrite can not be used with "
+                             "'%s'" % "', '".join(used))
+        self.rewrite = rewrite
+
+
+def _run_passes(compiler, root, options):
+    '''
+    Runs the passes creating states of a resolved tree, as selected by
+    options. All entry points use it, so the states written, costed,
+    simulated and traced are always the same ones
+    '''
+    prefix = root.manifest.get().txt_prefix
+
+    if options.fold:
+        fold_constants(compiler, root)
+
+    if options.micro_sleep != 0:
+        replace_short_sleeps(root, options.micro_sleep)
+
+    inline_functions(compiler, root, prefix, options.inline_threshold)
+
+    if options.scalar_structs:
+        split_structs(compiler, root)
+
+    if options.recompute:
+        rematerialize(root, get_cost_table(options.cost_table))
+
+    create_states(compiler, root, prefix, options.split,
+                  options.overlap_waits, options.overlap_sleeps,
+                  options.yield_budget, options.cost_table)
+
+    if options.peephole:
+        optimize_states(compiler, root)
+
+    if options.narrow_vars or options.pack_state:
+        narrow_moved_vars(root, options.pack_state)
+
+    if options.promote_vars != 0:
+        promote_moved_vars(root, options.promote_vars,
+                           get_cost_table(options.cost_table))
+
+
+def process_file(file_name, zepto_plugin, prefix, split, dump, papi=None,
+                 **kwargs):
+    '''
+    Process a c input file, and returns an string with output text
+    split and keyword arguments are the ones of Options. The rewrite
+    output is None when rewrite option is disabled
+    '''
+    options = Options(split, **kwargs)
+
+    c = Compiler()
+    root, helper = _create_tree(c, file_name, zepto_plugin, prefix, dump,
+                                papi)
+
+    _run_passes(c, root, options)
 
     if dump:
         print
         print '\n'.join(dump_tree(root))
 
-    async2 = rewrite_code(c, root, helper.token_stream)
-    header = writer.write_header(c, root, file_name)
-    async = writer.write_code(c, root, file_name)
-    parser = writer.write_parser(c, root)
+    if options.rewrite:
+        async2 = rewrite_code(c, root, helper.token_stream)
+    else:
+        async2 = None
+    header = writer.write_header(c, root, file_name, options.trace,
+                                 options.profile)
+    async = writer.write_code(c, root, file_name, options.computed_goto,
+                              options.trace, options.profile,
+                              options.fast_polls, options.parse_in_place,
+                              options.outline_waits)
+    parser = writer.write_parser(c, root, options.fields_table,
+                                 options.parse_in_place, options.buffer_sizes)
     return (async, header, async2, parser)
 
 
-def process_manifest(zepto_plugin, prefix, dump, papi=None):
+def report_costs(file_name, zepto_plugin, prefix, split, papi=None,
+                 json_format=False, **kwargs):
+    '''
+    Process a c input file, and returns an string with the worst case
+    cost of each state, as text or as json when json_format is True.
+    Options are the same of process_file, states over yield_budget are
+    flagged together with the most costly ones
+    '''
+    options = Options(split, **kwargs)
+
+    c = Compiler()
+    root, _ = _create_tree(c, file_name, zepto_plugin, prefix, False, papi)
+
+    _run_passes(c, root, options)
+
+    costs = get_state_costs(root, get_cost_table(options.cost_table),
+                            options.yield_budget)
+    if json_format:
+        return format_json(costs)
+    else:
+        return format_text(costs)
+
+
+def simulate_handler(file_name, zepto_plugin, prefix, split, papi=None,
+                     sim=None, **kwargs):
+    '''
+    Process a c input file, runs its handler with the interpreter against
+    simulated papi sim, and returns an string with the handler entries,
+    the simulated time and the states run.
+    Options are the same of process_file
+    '''
+    options = Options(split, **kwargs)
+
+    c = Compiler()
+    root, _ = _create_tree(c, file_name, zepto_plugin, prefix, False, papi)
+
+    _run_passes(c, root, options)
+
+    if sim is None:
+        sim = interpreter.SimulatedPapi()
+
+    report = interpreter.run_handler(root, sim)
+    return interpreter.format_text(report)
+
+
+def write_state_map(file_name, zepto_plugin, prefix, split, papi=None,
+                    **kwargs):
+    '''
+    Process a c input file, and returns the json state map used to decode
+    traces of code written with trace option of process_file.
+    Options must be the same used to write the code, so states match
+    '''
+    options = Options(split, **kwargs)
+
+    c = Compiler()
+    root, _ = _create_tree(c, file_name, zepto_plugin, prefix, False, papi)
+
+    _run_passes(c, root, options)
+
+    return trace.format_state_map(
+        trace.get_state_map(root, prefix, get_cost_table(options.cost_table)))
+
+
+def decode_trace(state_map_file, trace_file):
+    '''
+    Decodes a captured trace buffer file, using the state map file written
+    with write_state_map, and returns an string with entries and time
+    histogram of each state
+    '''
+    with open(state_map_file) as f:
+        state_map = json.load(f)
+
+    with open(trace_file, 'rb') as f:
+        data = f.read()
+
+    return trace.format_text(trace.decode(data, state_map))
+
+
+def write_profile(state_map_file, trace_file):
+    '''
+    Decodes a captured trace buffer file, as decode_trace, and returns the
+    json profile of times each state was run, used by process_file
+    '''
+    with open(state_map_file) as f:
+        state_map = json.load(f)
+
+    with open(trace_file, 'rb') as f:
+        data = f.read()
+
+    return trace.format_profile(trace.decode(data, state_map))
+
+
+def _constant(value):
+    '''
+    Returns a simulated papi function always returning value
+    '''
+    return lambda *args: value
+
+
+def simulate_scenario(file_name, policy=None):
+    '''
+    Runs the plugins of a json scenario file sharing one cooperative loop,
+    and returns an string with latency, bus and starvation results, see
+    simulator.simulate. policy overrides the one of the scenario.
+    The scenario has 'duration', 'policy', 'cost_unit', the 'papi' header
+    and a list of 'plugins'. Each plugin has its 'prefix', the 'dir' with
+    its source and manifest, relative to the scenario file, 'period',
+    'offset', 'priority', the simulated papi 'request', 'config', 'waits',
+    'entry' and constant 'calls' results, and 'options' as the ones of
+    Options, 'split' included, used to create its states
+    '''
+    with open(file_name) as f:
+        scenario = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(file_name))
+    papi = scenario.get('papi')
+    if papi is not None:
+        papi = os.path.join(base, papi)
+
+    models = []
+    for each in scenario['plugins']:
+        prefix = each['prefix']
+        plugin_dir = os.path.join(base, each.get('dir', prefix))
+        options = Options(**each.get('options', {}))
+
+        c = Compiler()
+        root, _ = _create_tree(
+            c, os.path.join(plugin_dir, "%s.c" % prefix),
+            ZeptoPlugin(os.path.join(plugin_dir, "manifest.xml")),
+            prefix, False, papi)
+
+        _run_passes(c, root, options)
+
+        table = get_cost_table(options.cost_table)
+        costs = dict(((s.txt_function, s.int_state), s.int_cost)
+                     for s in get_state_costs(root, table))
+
+        calls = dict((k, _constant(v))
+                     for k, v in each.get('calls', {}).items())
+        sim = interpreter.SimulatedPapi(
+            each.get('waits'), 0, each.get('entry', 0), each.get('request'),
+            each.get('config'), calls)
+
+        models.append(simulator.PluginModel(
+            prefix, root, costs, sim, each.get('period', 1000),
+            each.get('offset', 0), each.get('priority', 0)))
+
+    if policy is None:
+        policy = scenario.get('policy', 'fifo')
+
+    report = simulator.simulate(models, scenario['duration'], policy,
+                                scenario.get('cost_unit', 1))
+    return simulator.format_text(report)
+
+
+def process_manifest(zepto_plugin, prefix, dump, papi=None, **kwargs):
     '''
     Process a c input file, and returns an string with output text
+    keyword arguments are the ones of Options, only fields_table,
+    parse_in_place and buffer_sizes change the output
     '''
+    options = Options(**kwargs)
 
     c = Compiler()
     root = c.init_node(RootNode(), Ctx.ROOT)
@@ -130,5 +475,19 @@ def process_manifest(zepto_plugin, prefix, dump, papi=None):
         print
         print '\n'.join(dump_tree(root))
 
-    parser = writer.write_parser(c, root)
+    parser = writer.write_parser(c, root, options.fields_table,
+                                 options.parse_in_place, options.buffer_sizes)
     return parser
+
+
+def report_sizes(zepto_plugin, json_format=False):
+    '''
+    Returns an string with the worst case encoded size of each request
+    and reply field of plugin manifest, and of the whole request and
+    reply, as text or as json when json_format is True
+    '''
+    sizes = size_report.get_field_sizes(zepto_plugin)
+    if json_format:
+        return size_report.format_json(sizes)
+    else:
+        return size_report.format_text(sizes)
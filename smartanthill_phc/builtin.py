@@ -21,7 +21,8 @@ from smartanthill_phc.common.base import DeclarationListNode
 _builtin_papi_defines = [
     "#define PLUGIN_OK 0",
     "#define PLUGIN_WAITING 1",
-    "#define PLUGIN_DEBUG 2"
+    "#define PLUGIN_DEBUG 2",
+    "#define PLUGIN_YIELD 3"
 ]
 
 
@@ -82,6 +83,8 @@ _builtin_papi = [
     "void papi_wait_for_spi_receive( uint8_t spi_id, uint16_t addr, uint8_t addr_sz, uint16_t* data );",
     "void papi_wait_for_i2c_receive( uint8_t i2c_id, uint16_t addr, uint8_t addr_sz, uint16_t* data );",
     "void papi_wait_for_wait_handler( waiting_for* wf );",
+    "void papi_wait_for_all();",
+    "void papi_wait_for_any( uint8_t* completed );",
 
     "void papi_init_wait_handler( waiting_for* wf );",
     "void papi_wait_handler_add_wait_for_spi_send( waiting_for* wf, uint8_t spi_id );",
@@ -229,6 +229,30 @@ class IntTypeDeclNode(CTypeDeclNode):
         assert False
 
 
+# Integer types, with their size in bytes and range, smaller types first
+INT_TYPES = [
+    ('uint8_t', 1, 0, 0xff),
+    ('int8_t', 1, -0x80, 0x7f),
+    ('uint16_t', 2, 0, 0xffff),
+    ('int16_t', 2, -0x8000, 0x7fff),
+    ('uint32_t', 4, 0, 0xffffffff),
+    ('int32_t', 4, -0x80000000, 0x7fffffff),
+]
+
+
+def get_type_info(t):
+    '''
+    Returns the INT_TYPES entry of type declaration t, None when t is not
+    one of them
+    '''
+    if isinstance(t, IntTypeDeclNode):
+        for each in INT_TYPES:
+            if each[0] == t.txt_name:
+                return each
+
+    return None
+
+
 class StructTypeDeclNode(CTypeDeclNode):
 
     '''
@@ -256,6 +280,8 @@ class AttributeDeclarationNode(Node, OnDemandResolution):
         super(AttributeDeclarationNode, self).__init__()
         self.txt_name = None
         self.declaration_type = Child(self, TypeNode)
+        self.int_min = None
+        self.int_max = None
 
 
 class TrivialCastRuleNode(Node):
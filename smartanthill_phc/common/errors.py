@@ -65,3 +65,12 @@ class ResolutionError(Exception):
     Raised when a resolution error occurs that needs to raise
     '''
     pass
+
+
+class InterpreterError(Exception):
+
+    '''
+    Raised when the interpreter can not run a tree, or the tree fails when
+    run, as reading a variable not kept across a state change
+    '''
+    pass
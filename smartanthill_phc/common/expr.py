@@ -47,6 +47,7 @@ class FunctionCallExprNode(ExpressionNode):
         self.txt_name = None
         self.argument_list = Child(self, ArgumentListNode)
         self.ref_declaration = None
+        self.bool_micro_sleep = False
 
 
 class MemberAccessExprNode(ExpressionNode):
@@ -110,6 +110,7 @@ class VariableDeclarationStmtNode(StatementNode, OnDemandResolution):
         self.txt_name = None
         self.declaration_type = Child(self, TypeNode)
         self.initializer_expression = ChildExprOpt(self)
+        self.bool_recomputed = False
 
     def get_static_value(self):
         '''
@@ -0,0 +1,257 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import LoopStmtNode, ForStmtNode,\
+    get_type_info
+from smartanthill_phc.common.base import StatementNode, StmtListNode
+from smartanthill_phc.common.expr import FunctionCallExprNode,\
+    AssignmentExprNode, OperatorExprNode, MemberOperatorExprNode,\
+    VariableExprNode, TrivialCastExprNode, AddressOfExprNode
+from smartanthill_phc.common.stmt import VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.overlap import get_literal_value
+
+
+# Weighted operation counts used to estimate the time taken by code.
+# Operators and functions are looked up by their text or name, when not
+# found '<operator>', '<call>' or '<papi>' (for papi_* functions) are used.
+# '<statement>' is added for each statement, and '<loop>' is the iteration
+# count assumed for loops when it can not be found from the code.
+# '<state byte>' is the cost worth recomputing at each resume, instead of
+# keeping a byte in the state struct
+DEFAULT_COST_TABLE = {
+    '<statement>': 1,
+    '<operator>': 1,
+    '*': 2,
+    '/': 8,
+    '%': 8,
+    '<call>': 4,
+    '<papi>': 8,
+    '<loop>': 16,
+    '<state byte>': 4,
+}
+
+
+def get_cost_table(table=None):
+    '''
+    Returns the default cost table, updated with entries in table
+    '''
+    result = dict(DEFAULT_COST_TABLE)
+    if table is not None:
+        result.update(table)
+
+    return result
+
+
+def get_cost(node, table):
+    '''
+    Returns the estimated cost of executing node once.
+    Nested loops are counted with their trip count when it is known,
+    or with '<loop>' iterations otherwise
+    '''
+    w = _CostWalker(table)
+    w.walk_node(node)
+    return w.cost
+
+
+def get_iteration_cost(loop, table):
+    '''
+    Returns the estimated cost of executing once the body and condition
+    of a loop
+    '''
+    w = _CostWalker(table)
+    w.walk_childs(loop)
+    return w.cost
+
+
+def get_trip_count(loop, init=None):
+    '''
+    Returns the number of iterations of a 'for' loop counting up from
+    a literal to a literal, or None when it can't be found.
+    The loop variable must not be written by the loop body, and the count
+    must end before the variable wraps around.
+    init is the statement before the loop, that may declare and initialize
+    the loop variable when the loop does not
+    '''
+    # pylint: disable=too-many-return-statements
+    # pylint: disable=too-many-branches
+    if not isinstance(loop, ForStmtNode):
+        return None
+
+    if not loop.init_expression.is_none():
+        e = loop.init_expression.get()
+        if not isinstance(e, AssignmentExprNode):
+            return None
+        var = get_variable(e.left_expression.get())
+        first = get_literal_value(e.right_expression.get())
+    elif isinstance(init, VariableDeclarationStmtNode) and\
+            not init.initializer_expression.is_none():
+        var = init
+        first = get_literal_value(init.initializer_expression.get())
+    else:
+        return None
+
+    if not isinstance(var, VariableDeclarationStmtNode) or first is None:
+        return None
+
+    if loop.condition_expression.is_none() or\
+            loop.iteration_expression.is_none():
+        return None
+
+    cond = loop.condition_expression.get()
+    if not isinstance(cond, OperatorExprNode) or\
+            cond.txt_operator not in ('<', '<=', '!='):
+        return None
+
+    args = cond.argument_list.get().arguments
+    if get_variable(args.at(0).get()) != var:
+        return None
+    last = get_literal_value(args.at(1).get())
+    if last is None:
+        return None
+
+    it = loop.iteration_expression.get()
+    if not isinstance(it, MemberOperatorExprNode) or\
+            it.txt_operator not in ('++', 'post++') or\
+            get_variable(it.expression.get()) != var:
+        return None
+
+    w = _WritesWalker(var)
+    w.walk_node(loop.statement_list.get())
+    if w.written:
+        return None
+
+    # values out of range would be converted, limit equal to the maximum
+    # is never passed by '<='
+    info = get_type_info(var.declaration_type.get().get_type())
+    if info is None or first < info[2] or first > info[3] or\
+            last > info[3]:
+        return None
+
+    if cond.txt_operator == '<=':
+        if last == info[3]:
+            return None
+        last += 1
+    elif cond.txt_operator == '!=' and first > last:
+        return None
+
+    return max(0, last - first)
+
+
+def get_variable(e):
+    '''
+    Returns the declaration of variable expression e, None if e is not
+    a variable
+    '''
+    while isinstance(e, TrivialCastExprNode):
+        e = e.expression.get()
+
+    if isinstance(e, VariableExprNode):
+        return e.ref_declaration
+
+    return None
+
+
+class _WritesWalker(NodeWalker):
+
+    '''
+    Walker class that finds if a variable is written, or may be written
+    through a pointer
+    '''
+
+    def __init__(self, var):
+        '''
+        Constructor
+        '''
+        super(_WritesWalker, self).__init__()
+        self._var = var
+        self.written = False
+
+    def walk_node(self, node):
+
+        if isinstance(node, AssignmentExprNode):
+            e = node.left_expression.get()
+        elif isinstance(node, MemberOperatorExprNode) and\
+                (node.txt_operator in ('++', '--', 'post++', 'post--') or
+                 node.txt_operator.endswith('=')):
+            e = node.expression.get()
+        elif isinstance(node, AddressOfExprNode):
+            e = node.expression.get()
+        else:
+            e = None
+
+        if e is not None and get_variable(e) == self._var:
+            self.written = True
+
+        self.walk_childs(node)
+
+
+class _CostWalker(NodeWalker):
+
+    '''
+    Walker class that sums the cost of each operation in a tree
+    '''
+
+    def __init__(self, table):
+        '''
+        Constructor
+        '''
+        super(_CostWalker, self).__init__()
+        self._table = table
+        self.cost = 0
+
+    def walk_node(self, node):
+
+        if isinstance(node, StmtListNode):
+            prev = None
+            for each in node.statements:
+                s = each.get()
+                if isinstance(s, LoopStmtNode):
+                    self._walk_loop(s, prev)
+                else:
+                    self.walk_node(s)
+                prev = s
+            return
+
+        if isinstance(node, LoopStmtNode):
+            self._walk_loop(node, None)
+            return
+
+        if isinstance(node, StatementNode):
+            self.cost += self._table['<statement>']
+        elif isinstance(node, (OperatorExprNode, MemberOperatorExprNode)):
+            self.cost += self._table.get(
+                node.txt_operator, self._table['<operator>'])
+        elif isinstance(node, AssignmentExprNode):
+            self.cost += self._table['<operator>']
+        elif isinstance(node, FunctionCallExprNode):
+            if node.txt_name.startswith('papi_'):
+                default = self._table['<papi>']
+            else:
+                default = self._table['<call>']
+            self.cost += self._table.get(node.txt_name, default)
+
+        self.walk_childs(node)
+
+    def _walk_loop(self, node, prev):
+        '''
+        Loop body is counted once for each iteration
+        '''
+        count = get_trip_count(node, prev)
+        if count is None:
+            count = self._table['<loop>']
+
+        self.cost += self._table['<statement>'] +\
+            get_iteration_cost(node, self._table) * count
@@ -0,0 +1,363 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import json
+
+from antlr4.ParserRuleContext import ParserRuleContext
+
+from smartanthill_phc.c_node import LoopStmtNode, WhileStmtNode
+from smartanthill_phc.common import antlr_helper
+from smartanthill_phc.common.base import StmtListNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.stmt import IfElseStmtNode, ReturnStmtNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.cost import get_cost, get_iteration_cost,\
+    get_trip_count
+from smartanthill_phc.root import NonBlockingData
+from smartanthill_phc.state import DebugStateStmtNode,\
+    YieldStateStmtNode, BeforeSubStmtNode, BeforeReturnStmtNode,\
+    PapiWaitStmtNode, PapiSleepStmtNode, PapiWaitGroupStmtNode,\
+    PapiWaitForStmtNode, StateMachineStmtNode, MainFirstStmtNode,\
+    SubFirstStmtNode, InitFirstStmtNode, AfterSubStmtNode
+
+_STATE_NODES = (DebugStateStmtNode, YieldStateStmtNode, BeforeSubStmtNode,
+                PapiWaitStmtNode, PapiSleepStmtNode, PapiWaitGroupStmtNode,
+                PapiWaitForStmtNode)
+
+_ZERO_COST_NODES = (StateMachineStmtNode, MainFirstStmtNode,
+                    SubFirstStmtNode, InitFirstStmtNode, AfterSubStmtNode,
+                    BeforeReturnStmtNode)
+
+
+class StateCost(object):
+
+    '''
+    Worst case cost of running a state, from the point it is entered
+    until the next state change or return
+    '''
+
+    def __init__(self, function, state, line):
+        '''
+        Constructor
+        '''
+        self.txt_function = function
+        self.int_state = state
+        self.int_line = line
+        self.int_cost = 0
+        self.txts_assumed_loops = set()
+        self.bool_worst = False
+
+    def to_dict(self):
+        '''
+        Returns a dictionary with this state cost, used for json output
+        '''
+        return {
+            'function': self.txt_function,
+            'state': self.int_state,
+            'line': self.int_line,
+            'cost': self.int_cost,
+            'assumed_loops': sorted(self.txts_assumed_loops),
+            'worst': self.bool_worst,
+        }
+
+
+def get_state_costs(root, table, budget=0):
+    '''
+    Returns the list of StateCost of each state of each function with
+    states, handler is always included.
+    The states with the highest cost, and the ones over budget, when it is
+    not zero, are flagged as worst.
+    Loop trip counts not known are assumed to be '<loop>' from cost table,
+    the condition of such loops is kept in txts_assumed_loops
+    '''
+    nb = root.get_scope(NonBlockingData)
+
+    result = []
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        name = node.declaration.get().txt_name
+        if name == nb.handler_name or\
+                nb.has_states(node.declaration.get()):
+            w = _StateCostWalker(name, table)
+            w.walk_function(node)
+            result.extend(sorted(w.states.values(),
+                                 key=lambda x: x.int_state))
+
+    if len(result) != 0:
+        worst = max([each.int_cost for each in result])
+        for each in result:
+            if each.int_cost == worst or\
+                    (budget > 0 and each.int_cost > budget):
+                each.bool_worst = True
+
+    return result
+
+
+def format_text(costs):
+    '''
+    Returns the text report of a list of StateCost
+    '''
+    lines = ["%-32s %5s %5s %7s" % ("function", "state", "line", "cost")]
+    for each in costs:
+        txt = "%-32s %5d %5s %7d" % (
+            each.txt_function, each.int_state,
+            each.int_line if each.int_line is not None else '-',
+            each.int_cost)
+        if each.bool_worst:
+            txt += " *"
+        if len(each.txts_assumed_loops) != 0:
+            txt += " assumed loops: %s" % ", ".join(
+                sorted(each.txts_assumed_loops))
+        lines.append(txt.rstrip())
+
+    return '\n'.join(lines) + '\n'
+
+
+def format_json(costs):
+    '''
+    Returns the json report of a list of StateCost
+    '''
+    return json.dumps([each.to_dict() for each in costs], indent=2,
+                      sort_keys=True, separators=(',', ': ')) + '\n'
+
+
+def _get_line(ctx):
+    '''
+    Returns the source line of a node context, None if not known
+    '''
+    lines = antlr_helper.get_reference_lines(ctx)
+    return lines[0] if lines is not None else None
+
+
+def _get_text(ctx):
+    '''
+    Returns the source text of a node context
+    '''
+    if isinstance(ctx, ParserRuleContext):
+        return ctx.getText()
+
+    return '?'
+
+
+def _merge(a, b):
+    '''
+    Merges two maps of state to (cost, assumed loops),
+    keeping the worst cost of each state
+    '''
+    result = dict(a)
+    for k, v in b.items():
+        if k in result:
+            result[k] = (max(result[k][0], v[0]), result[k][1] | v[1])
+        else:
+            result[k] = v
+
+    return result
+
+
+def _add(live, cost, assumed=frozenset()):
+    '''
+    Adds cost to every path in live
+    '''
+    return dict((k, (v[0] + cost, v[1] | assumed))
+                for k, v in live.items())
+
+
+class _HasStatesWalker(NodeWalker):
+
+    '''
+    Walker class that finds if a tree has state changes
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_HasStatesWalker, self).__init__()
+        self.states = False
+
+    def walk_node(self, node):
+        if isinstance(node, _STATE_NODES):
+            self.states = True
+        else:
+            self.walk_childs(node)
+
+
+class _StateCostWalker(object):
+
+    '''
+    Helper class that walks the statements of a function,
+    following every path from each state change to the next one.
+    Paths are kept as a map from the state they started at, to the worst
+    cost so far
+    '''
+
+    def __init__(self, function, table):
+        '''
+        Constructor
+        '''
+        self._function = function
+        self._table = table
+        self.states = {}
+
+    def walk_function(self, node):
+        '''
+        Walks a function definition, first state is zero
+        '''
+        self._get_state(0, node.ctx)
+        live = {0: (0, frozenset())}
+        live = self._walk_stmt_list(node.statement_list.get(), live)
+        self._close(live)
+
+    def _get_state(self, state, ctx):
+        '''
+        Returns the StateCost for state, created if needed
+        '''
+        if state not in self.states:
+            self.states[state] = StateCost(
+                self._function, state, _get_line(ctx))
+
+        return self.states[state]
+
+    def _close(self, live):
+        '''
+        Paths in live reached a state change or a return
+        '''
+        for k, v in live.items():
+            s = self.states[k]
+            s.int_cost = max(s.int_cost, v[0])
+            s.txts_assumed_loops.update(v[1])
+
+    def _walk_stmt_list(self, stmt_list, live):
+
+        prev = None
+        for each in stmt_list.statements:
+            s = each.get()
+            live = self._walk_stmt(s, prev, live)
+            if not isinstance(s, _STATE_NODES):
+                prev = s
+
+        return live
+
+    def _walk_stmt(self, node, prev, live):
+        # pylint: disable=too-many-return-statements
+
+        if len(live) == 0:  # not reachable
+            return live
+        elif isinstance(node, StmtListNode):
+            return self._walk_stmt_list(node, live)
+        elif isinstance(node, _ZERO_COST_NODES):
+            return live
+        elif isinstance(node, _STATE_NODES):
+            return self._walk_state(node, live)
+        elif isinstance(node, ReturnStmtNode):
+            self._close(_add(live, get_cost(node, self._table)))
+            return {}
+        elif isinstance(node, IfElseStmtNode):
+            live = _add(live, get_cost(node.expression.get(), self._table))
+            a = self._walk_stmt_list(node.if_stmt_list.get(), live)
+            if not node.else_stmt_list.is_none():
+                live = self._walk_stmt_list(node.else_stmt_list.get(), live)
+            return _merge(a, live)
+        elif isinstance(node, LoopStmtNode):
+            return self._walk_loop(node, prev, live)
+        else:
+            return _add(live, get_cost(node, self._table))
+
+    def _walk_state(self, node, live):
+        '''
+        A state change, paths are closed and a new path begins
+        '''
+        nxt = node.int_next_state
+        if isinstance(node, (PapiWaitStmtNode, PapiSleepStmtNode,
+                             PapiWaitGroupStmtNode, PapiWaitForStmtNode)):
+            # starting the operation and checking it is completed
+            live = _add(live, self._table['<papi>'])
+            self._get_state(nxt, node.ctx)
+            self._close(live)
+            return {nxt: (self._table['<papi>'], frozenset())}
+
+        self._get_state(nxt, node.ctx)
+        self._close(live)
+        return {nxt: (0, frozenset())}
+
+    def _walk_loop(self, node, prev, live):
+        '''
+        A loop without states is as costly as all its iterations,
+        otherwise the body is walked twice, to follow paths that cross
+        from one iteration to the next one
+        '''
+        if isinstance(node, WhileStmtNode):
+            cond = node.expression.get()
+        elif not node.condition_expression.is_none():
+            cond = node.condition_expression.get()
+        else:
+            cond = None
+
+        stmts = node.statement_list.get().statements
+        last = stmts.at(stmts.get_size() - 1).get()\
+            if stmts.get_size() != 0 else None
+
+        w = _HasStatesWalker()
+        for each in stmts:
+            if each.get() != last or\
+                    not isinstance(last, YieldStateStmtNode):
+                w.walk_node(each.get())
+        iteration = get_iteration_cost(node, self._table)
+
+        if not w.states and isinstance(last, YieldStateStmtNode):
+            return self._walk_yielding_loop(last, cond, iteration, live)
+
+        if not w.states:
+            count = get_trip_count(node, prev)
+            if count is not None:
+                return _add(live, self._table['<statement>'] +
+                            iteration * count)
+
+            assumed = frozenset([_get_text(cond.ctx)
+                                 if cond is not None else '?'])
+            return _add(live, self._table['<statement>'] +
+                        iteration * self._table['<loop>'], assumed)
+
+        cond_cost = get_cost(cond, self._table) if cond is not None else 0
+
+        first = self._walk_stmt_list(
+            node.statement_list.get(), _add(live, cond_cost))
+        second = self._walk_stmt_list(
+            node.statement_list.get(), _add(first, cond_cost))
+
+        return _add(_merge(live, _merge(first, second)), cond_cost)
+
+    def _walk_yielding_loop(self, node, cond, iteration, live):
+        '''
+        A loop with a single state change at the end of its body, done once
+        every node.int_every iterations.
+        Paths entering the loop, and the one starting at the state change,
+        run at most int_every iterations before the next state change,
+        and one less before leaving the loop
+        '''
+        nxt = node.int_next_state
+        cond_cost = get_cost(cond, self._table) if cond is not None else 0
+        most = iteration * node.int_every + self._table['<operator>']
+
+        self._get_state(nxt, node.ctx)
+        self._close(_add(live, most))
+        self._close({nxt: (most, frozenset())})
+
+        less = cond_cost + iteration * (node.int_every - 1)
+        return _merge(_add(live, less), {nxt: (less, frozenset())})
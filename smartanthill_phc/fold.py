@@ -0,0 +1,238 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import BooleanLiteralExprNode,\
+    ConstantDefineNode, DoWhileStmtNode, ForStmtNode, WhileStmtNode
+from smartanthill_phc.common.base import StmtListNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.errors import InterpreterError
+from smartanthill_phc.common.expr import AssignmentExprNode,\
+    BinaryOpExprNode, ConditionalExprNode, TrivialCastExprNode,\
+    UnaryOpExprNode, VariableExprNode
+from smartanthill_phc.common.stmt import ExpressionStmtNode,\
+    IfElseStmtNode, VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.cost import get_variable
+from smartanthill_phc.interpreter import compute_operator
+from smartanthill_phc.narrow import get_type_info
+from smartanthill_phc.overlap import get_literal_value
+
+
+def fold_constants(compiler, root):
+    '''
+    Removes the statements that never run because of a constant
+    condition, before states are created, so they add no states, labels
+    or moved variables.
+    An 'if' with a constant condition is replaced by the block of the
+    branch taken, or removed when there is none. A 'while' with a
+    constant false condition is removed, and so is a 'for' whose loop
+    variable is initialized with a constant value not passing its
+    condition, keeping its init expression.
+    Conditions may use literals, defines and operators on them.
+    Must run after resolve_tree, and before inline_functions and
+    create_states.
+    Returns a map of function name to the number of statements removed
+    or replaced
+    '''
+    result = {}
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        w = _FoldWalker(compiler)
+        w.walk_node(node.statement_list.get())
+        if w.count != 0:
+            result[node.declaration.get().txt_name] = w.count
+
+    return result
+
+
+def get_constant_value(e, env=None):
+    '''
+    Returns the integer value of expression e when it is known at compile
+    time, None otherwise. env maps declarations of variables to a known
+    value
+    '''
+    # pylint: disable=too-many-return-statements
+    # pylint: disable=too-many-branches
+
+    value = get_literal_value(e)
+    if value is not None:
+        return value
+
+    if isinstance(e, BooleanLiteralExprNode):
+        return 1 if e.bool_value else 0
+
+    elif isinstance(e, TrivialCastExprNode):
+        return get_constant_value(e.expression.get(), env)
+
+    elif isinstance(e, VariableExprNode):
+        d = e.ref_declaration
+        if isinstance(d, ConstantDefineNode):
+            return get_constant_value(d.expression.get(), env)
+        elif env is not None and d in env:
+            return env[d]
+        return None
+
+    elif isinstance(e, BinaryOpExprNode):
+        args = e.argument_list.get().arguments
+        a = get_constant_value(args.at(0).get(), env)
+        if e.txt_operator == '&&' and a is not None and not a:
+            return 0
+        elif e.txt_operator == '||' and a is not None and a:
+            return 1
+
+        b = get_constant_value(args.at(1).get(), env)
+        if a is None or b is None:
+            return None
+        elif e.txt_operator in ('&&', '||'):
+            return int(bool(b))
+
+        try:
+            return compute_operator(e.txt_operator, a, b)
+        except InterpreterError:
+            return None
+
+    elif isinstance(e, UnaryOpExprNode):
+        value = get_constant_value(e.expression.get(), env)
+        if value is None:
+            return None
+        elif e.txt_operator == '-':
+            return -value
+        elif e.txt_operator == '~':
+            return ~value
+        elif e.txt_operator == '!':
+            return int(not value)
+        elif e.txt_operator == '+':
+            return value
+        return None
+
+    elif isinstance(e, ConditionalExprNode):
+        value = get_constant_value(e.condition_expression.get(), env)
+        if value is None:
+            return None
+        elif value:
+            return get_constant_value(e.true_expression.get(), env)
+        return get_constant_value(e.false_expression.get(), env)
+
+    return None
+
+
+def _is_zero_trip(loop, prev):
+    '''
+    Returns True if 'for' loop condition is false with the constant its
+    variable is initialized with, at loop init or at prev declaration
+    '''
+    if loop.condition_expression.is_none():
+        return False
+
+    cond = loop.condition_expression.get()
+    value = get_constant_value(cond)
+    if value is not None:
+        return not value
+
+    if not loop.init_expression.is_none():
+        e = loop.init_expression.get()
+        if not isinstance(e, AssignmentExprNode):
+            return False
+        var = get_variable(e.left_expression.get())
+        first = get_constant_value(e.right_expression.get())
+    elif isinstance(prev, VariableDeclarationStmtNode) and\
+            not prev.initializer_expression.is_none():
+        var = prev
+        first = get_constant_value(prev.initializer_expression.get())
+    else:
+        return False
+
+    if not isinstance(var, VariableDeclarationStmtNode) or first is None:
+        return False
+
+    # a value out of range would be converted on assignment
+    info = get_type_info(var.declaration_type.get().get_type())
+    if info is None or first < info[2] or first > info[3]:
+        return False
+
+    value = get_constant_value(cond, {var: first})
+    return value is not None and not value
+
+
+class _FoldWalker(NodeWalker):
+
+    '''
+    Walker class that replaces or removes statements with a constant
+    condition, in each statement list
+    '''
+
+    def __init__(self, compiler):
+        '''
+        Constructor
+        '''
+        super(_FoldWalker, self).__init__()
+        self._c = compiler
+        self.count = 0
+
+    def walk_node(self, node):
+
+        if not isinstance(node, StmtListNode):
+            self.walk_childs(node)
+            return
+
+        i = 0
+        prev = None
+        while i < node.statements.get_size():
+            s = node.statements.at(i).get()
+            r = self._fold(s, prev)
+            if r is s:
+                self.walk_node(s)
+                prev = s
+                i += 1
+            elif r is None:
+                self._c.remove_nodes(node.statements.remove_at(i))
+                self.count += 1
+            else:
+                # replacement is folded in turn
+                self._c.remove_nodes(node.statements.replace_at(i, r))
+                self.count += 1
+
+    def _fold(self, s, prev):
+        '''
+        Returns the statement replacing s, s itself when it is kept, None
+        when it is removed
+        '''
+        if isinstance(s, IfElseStmtNode):
+            value = get_constant_value(s.expression.get())
+            if value is None:
+                return s
+            elif value:
+                return s.if_stmt_list.clear()
+            elif not s.else_stmt_list.is_none():
+                return s.else_stmt_list.clear()
+            return None
+
+        elif isinstance(s, ForStmtNode) and _is_zero_trip(s, prev):
+            if s.init_expression.is_none():
+                return None
+            e = self._c.init_node(ExpressionStmtNode(), s.ctx)
+            e.expression.set(s.init_expression.clear())
+            return e
+
+        elif isinstance(s, WhileStmtNode) and\
+                not isinstance(s, DoWhileStmtNode) and\
+                get_constant_value(s.expression.get()) == 0:
+            return None
+
+        return s
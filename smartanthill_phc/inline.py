@@ -0,0 +1,320 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import VoidTypeDeclNode
+from smartanthill_phc.common.base import StatementNode, StmtListNode
+from smartanthill_phc.common.child import Child, ChildList
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.expr import FunctionCallExprNode
+from smartanthill_phc.common.stmt import ReturnStmtNode,\
+    VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import CodeVisitor, NodeWalker
+from smartanthill_phc.root import NonBlockingData
+
+
+def inline_functions(compiler, root, prefix, threshold):
+    '''
+    Inlines calls to small functions with states into the caller.
+    Each call statement is replaced by a copy of the callee body, so the
+    callee states become states of the caller state machine, and the
+    sub state machine call protocol is not needed.
+    Only functions with a size (statement count) not bigger than threshold
+    are inlined, a threshold of zero disables this pass
+    '''
+    if threshold <= 0:
+        return
+
+    nb = root.get_scope(NonBlockingData)
+    nb.set_prefix(prefix)
+
+    decls = root.source.get().declaration_list.get().declarations
+    candidates = {}
+    stateful = set()
+    inlined = set()
+
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        v = _InlineVisitor(compiler, candidates)
+        v.visit_stmt_list(node.statement_list.get())
+        inlined.update(v.inlined)
+
+        name = node.declaration.get().txt_name
+        if name in (nb.handler_name, nb.handler_init_name,
+                    nb.exec_init_name):
+            continue
+
+        w = _CalleeWalker(name, stateful)
+        w.walk_node(node.statement_list.get())
+
+        if w.blocking:
+            stateful.add(name)
+            if w.is_inlinable(node, threshold):
+                candidates[name] = node
+
+    _remove_unused(compiler, root, inlined)
+
+    compiler.check_stage('inline')
+
+
+def _remove_unused(compiler, root, inlined):
+    '''
+    Removes definitions of inlined functions that are not called anymore.
+    A function with states can only be called from within the plugin, since
+    its signature is changed by the state machine, so once all calls are
+    inlined, the definition is dead code
+    '''
+    decls = root.source.get().declaration_list.get().declarations
+
+    w = _CalledNamesWalker()
+    w.walk_node(root.source.get())
+
+    i = 0
+    while i < decls.get_size():
+        node = decls.at(i).get()
+        if isinstance(node, FunctionDefinitionNode) and\
+                node.declaration.get().txt_name in inlined and\
+                node.declaration.get().txt_name not in w.names:
+            compiler.remove_nodes(decls.remove_at(i))
+        else:
+            i += 1
+
+
+class _CloneHelper(object):
+
+    '''
+    Helper class that makes a deep copy of a resolved tree
+    '''
+
+    def __init__(self, compiler, refs):
+        '''
+        Constructor
+        '''
+        super(_CloneHelper, self).__init__()
+        self._c = compiler
+        self._refs = refs
+
+    def clone(self, node):
+        '''
+        Returns a deep copy of node
+        '''
+        result = self._c.init_node(type(node)(), node.ctx)
+        self._refs[node] = result
+
+        for name, value in vars(node).items():
+            if name in ('_parent', '_scopes', '_childs', 'node_id', 'ctx'):
+                pass
+            elif isinstance(value, Child):
+                if value.get() is not None:
+                    getattr(result, name).set(self.clone(value.get()))
+            elif isinstance(value, ChildList):
+                for each in value:
+                    getattr(result, name).add(self.clone(each.get()))
+            elif name.startswith('ref_'):
+                setattr(result, name, self._refs.get(value, value))
+            else:
+                setattr(result, name, value)
+
+        return result
+
+
+class _CalleeWalker(NodeWalker):
+
+    '''
+    Walker class that checks a function body,
+    finds if it has blocking calls, and if it can be inlined
+    '''
+
+    def __init__(self, name, stateful):
+        '''
+        Constructor
+        '''
+        super(_CalleeWalker, self).__init__()
+        self._name = name
+        self._stateful = stateful
+        self.blocking = False
+        self.recursive = False
+        self.returns = []
+        self.size = 0
+
+    def walk_node(self, node):
+        if isinstance(node, StatementNode) and\
+                not isinstance(node, StmtListNode):
+            self.size += 1
+
+        if isinstance(node, ReturnStmtNode):
+            self.returns.append(node)
+        elif isinstance(node, FunctionCallExprNode):
+            if node.txt_name == self._name:
+                self.recursive = True
+            elif node.bool_is_blocking or node.txt_name in self._stateful:
+                self.blocking = True
+
+        self.walk_childs(node)
+
+    def is_inlinable(self, node, threshold):
+        '''
+        Returns True if this function can be inlined.
+        It must return void, not be recursive, and have at most a single
+        'return' as last statement
+        '''
+        if self.recursive:
+            return False
+
+        if not isinstance(
+                node.declaration.get().return_type.get().get_type(),
+                VoidTypeDeclNode):
+            return False
+
+        size = self.size
+        if len(self.returns) == 1:
+            stmts = node.statement_list.get().statements
+            if stmts.get_size() == 0 or\
+                    stmts.at(stmts.get_size() - 1).get() != self.returns[0]:
+                return False
+            size -= 1
+        elif len(self.returns) > 1:
+            return False
+
+        return size <= threshold
+
+
+class _CalledNamesWalker(NodeWalker):
+
+    '''
+    Walker class that collects the names of all called functions
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_CalledNamesWalker, self).__init__()
+        self.names = set()
+
+    def walk_node(self, node):
+        if isinstance(node, FunctionCallExprNode):
+            self.names.add(node.txt_name)
+
+        self.walk_childs(node)
+
+
+class _InlineVisitor(CodeVisitor):
+
+    '''
+    Visitor class that replaces call statements to inlinable functions,
+    with a copy of the callee body
+    '''
+
+    def __init__(self, compiler, candidates):
+        '''
+        Constructor
+        '''
+        super(_InlineVisitor, self).__init__()
+        self._c = compiler
+        self._candidates = candidates
+        self.inlined = set()
+
+    def default_visit(self, node):
+        '''
+        Default action when a node specific action is not found
+        '''
+        # pylint: disable=unused-argument
+        pass
+
+    def visit_StmtListNode(self, node):
+        self.visit_stmt_list(node)
+
+    def visit_IfElseStmtNode(self, node):
+        self.visit_childs(node)
+
+    def visit_LoopStmtNode(self, node):
+        self.visit_childs(node)
+
+    def visit_FunctionCallStmtNode(self, node):
+
+        name = node.expression.get().txt_name
+        if name not in self._candidates:
+            return
+
+        callee = self._candidates[name]
+        refs = {}
+
+        stmt_list = self._c.init_node(StmtListNode(), node.ctx)
+
+        # arguments are passed by value, so each one is replaced by
+        # a local variable initialized with the call argument
+        args = node.expression.get().argument_list.get().arguments
+        decls = callee.declaration.get().argument_decl_list.get().declarations
+        assert args.get_size() == decls.get_size()
+
+        for each in decls:
+            arg = each.get()
+            d = self._c.init_node(VariableDeclarationStmtNode(), node.ctx)
+            d.txt_name = _mangle(name, arg.txt_name)
+            d.declaration_type.set(
+                _CloneHelper(self._c, refs).clone(arg.argument_type.get()))
+            d.initializer_expression.set(args.remove_at(0))
+            d.begin_resolution()
+            d.set_type(arg.get_type())
+            stmt_list.statements.add(d)
+            refs[arg] = d
+
+        stmts = callee.statement_list.get().statements
+        for each in stmts:
+            s = each.get()
+            if isinstance(s, ReturnStmtNode):
+                assert s == stmts.at(stmts.get_size() - 1).get()
+                continue
+
+            s = _CloneHelper(self._c, refs).clone(s)
+            stmt_list.statements.add(s)
+
+        _RenameWalker(name).walk_node(stmt_list)
+
+        old = self.replace_current_statement(stmt_list)
+        self._c.remove_nodes(old)
+        self.inlined.add(name)
+
+
+def _mangle(func_name, var_name):
+    '''
+    Returns the name used for an inlined variable,
+    'sa_' prefix is reserved so no user variable can collide with it
+    '''
+    return 'sa_%s_%s' % (func_name, var_name)
+
+
+class _RenameWalker(NodeWalker):
+
+    '''
+    Walker class that renames variables declared inside inlined code
+    '''
+
+    def __init__(self, func_name):
+        '''
+        Constructor
+        '''
+        super(_RenameWalker, self).__init__()
+        self._func_name = func_name
+
+    def walk_node(self, node):
+        if isinstance(node, VariableDeclarationStmtNode) and\
+                not node.txt_name.startswith('sa_'):
+            node.txt_name = _mangle(self._func_name, node.txt_name)
+
+        self.walk_childs(node)
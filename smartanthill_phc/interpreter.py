@@ -0,0 +1,757 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import BooleanLiteralExprNode, CastExprNode,\
+    ConstantDefineNode, DoWhileStmtNode, ForStmtNode, FunctionCallStmtNode,\
+    IntTypeDeclNode, StructTypeDeclNode, WhileStmtNode
+from smartanthill_phc.common.base import StmtListNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.errors import InterpreterError
+from smartanthill_phc.common.expr import AddressOfExprNode,\
+    AssignmentExprNode, BinaryOpExprNode, ConditionalExprNode,\
+    FunctionCallExprNode, MemberAccessExprNode, MemberBinaryOpExprNode,\
+    PointerExprNode, PostUnaryOpExprNode, StaticEvaluatedExprNode,\
+    TrivialCastExprNode, UnaryOpExprNode, VariableExprNode
+from smartanthill_phc.common.stmt import ExpressionStmtNode,\
+    IfElseStmtNode, NopStmtNode, ReturnStmtNode, VariableDeclarationStmtNode
+from smartanthill_phc.manifest import ComposerStmtNode, ParserStmtNode
+from smartanthill_phc.narrow import get_type_info
+from smartanthill_phc.overlap import get_literal_value
+from smartanthill_phc.root import NonBlockingData
+from smartanthill_phc.state import AfterSubStmtNode,\
+    BeforeReturnStmtNode, BeforeSubStmtNode, DebugStateStmtNode,\
+    FunctionCallSubExprNode, FunctionCallSubStmtNode, InitFirstStmtNode,\
+    MainFirstStmtNode, PapiSleepStmtNode, PapiWaitForStmtNode,\
+    PapiWaitGroupStmtNode, PapiWaitStmtNode, StateMachineStmtNode,\
+    StatefullCallArgumentExprNode, SubFirstStmtNode, YieldStateStmtNode
+
+# Simulated time each blocking operation takes to complete, in milliseconds
+DEFAULT_WAITS = {
+    'spi_send': 1,
+    'spi_receive': 1,
+    'i2c_send': 1,
+    'i2c_receive': 1,
+}
+
+# Value of local variables not kept at the state struct, after a resume
+_UNDEFINED = 'undefined'
+
+_NOP_NODES = (StateMachineStmtNode, MainFirstStmtNode, SubFirstStmtNode,
+              InitFirstStmtNode, BeforeSubStmtNode, AfterSubStmtNode,
+              BeforeReturnStmtNode, NopStmtNode)
+
+
+class SimulatedPapi(object):
+
+    '''
+    Behaviour of the papi the handler is run against.
+    Each blocking operation completes after waits time, sleeps after their
+    argument. When int_poll is zero, the handler is entered again just
+    when the operation it waits for is completed, otherwise it is entered
+    every int_poll, and returns again while not completed.
+    Each handler entry takes int_entry time.
+    request and config are the values of request and configuration fields,
+    missing ones are zero.
+    calls maps papi function names to python functions returning their
+    value, other papi functions return zero
+    '''
+
+    def __init__(self, waits=None, poll=0, entry=0, request=None,
+                 config=None, calls=None, max_entries=100000):
+        '''
+        Constructor
+        '''
+        self.waits = dict(DEFAULT_WAITS)
+        if waits is not None:
+            self.waits.update(waits)
+        self.int_poll = poll
+        self.int_entry = entry
+        self.request = request if request is not None else {}
+        self.config = config if config is not None else {}
+        self.calls = calls if calls is not None else {}
+        self.int_max_entries = max_entries
+
+
+class RunReport(object):
+
+    '''
+    Results of running a handler until it returns something else than
+    'PLUGIN_WAITING', 'PLUGIN_DEBUG' or 'PLUGIN_YIELD'
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.int_entries = 0
+        self.int_polls = 0
+        self.int_time = 0
+        self.int_result = None
+        self.states = []
+        self.papi_calls = []
+        self.replies = []
+
+    def get_state_counts(self):
+        '''
+        Returns a map from (function name, state) to the times the handler
+        was entered to run it
+        '''
+        result = {}
+        for each in self.states:
+            result[each] = result.get(each, 0) + 1
+
+        return result
+
+
+def run_handler(root, sim):
+    '''
+    Runs the handler of a tree already processed by create_states,
+    against the simulated papi sim, and returns a RunReport.
+    Each entry resumes the state machines the same way generated code
+    does, statements before the state dispatch are run again, and
+    local variables not kept at the state struct are lost, reading them
+    raises InterpreterError
+    '''
+    i = Interpreter(root, sim)
+    i.run()
+    return i.report
+
+
+def format_text(report):
+    '''
+    Returns the text report of a RunReport
+    '''
+    lines = ["entries %d" % report.int_entries,
+             "polls %d" % report.int_polls,
+             "time %d" % report.int_time,
+             "result %s" % report.int_result,
+             "",
+             "%-32s %5s %7s" % ("function", "state", "entries")]
+
+    counts = report.get_state_counts()
+    for each in sorted(counts.keys()):
+        lines.append("%-32s %5d %7d" % (each[0], each[1], counts[each]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _convert(value, t):
+    '''
+    Returns value converted to type t, as done on assignment
+    '''
+    if not isinstance(value, (int, long)) or\
+            not isinstance(t, IntTypeDeclNode):
+        return value
+
+    if t.txt_name == 'bool':
+        return 1 if value else 0
+
+    info = get_type_info(t)
+    if info is None:
+        return value
+
+    return (value - info[2]) % (info[3] - info[2] + 1) + info[2]
+
+
+def _default(t):
+    '''
+    Returns the value of a variable of type t with all bytes zero
+    '''
+    if isinstance(t, StructTypeDeclNode):
+        return dict((m.get().txt_name, _default(m.get().get_type()))
+                    for m in t.members)
+
+    return 0
+
+
+def _copy(value):
+    '''
+    Returns a copy of value, as done on assignment, structs are copied
+    and pointers keep pointing to the same place
+    '''
+    if isinstance(value, dict):
+        return dict((k, _copy(v)) for k, v in value.items())
+
+    return value
+
+
+def _read(env, decl):
+    '''
+    Returns the value of variable decl
+    '''
+    if decl not in env:
+        raise InterpreterError("Variable '%s' not found" % decl.txt_name)
+    elif env[decl] is _UNDEFINED:
+        raise InterpreterError(
+            "Variable '%s' read after a state change, "
+            "but not kept at the state struct" % decl.txt_name)
+
+    return env[decl]
+
+
+def compute_operator(op, a, b):
+    '''
+    Returns the result of binary operator op, with C integer semantic.
+    Raises InterpreterError when it is undefined, as a division by zero or
+    a negative shift count
+    '''
+    # pylint: disable=too-many-return-statements
+
+    if op in ('/', '%'):
+        if b == 0:
+            raise InterpreterError("Division by zero")
+        q = abs(a) // abs(b)
+        if (a < 0) != (b < 0):
+            q = -q
+        return q if op == '/' else a - b * q
+    elif op == '+':
+        return a + b
+    elif op == '-':
+        return a - b
+    elif op == '*':
+        return a * b
+    elif op == '&':
+        return a & b
+    elif op == '|':
+        return a | b
+    elif op == '^':
+        return a ^ b
+    elif op in ('<<', '>>'):
+        if b < 0:
+            raise InterpreterError("Negative shift count")
+        return a << b if op == '<<' else a >> b
+    elif op == '<':
+        return int(a < b)
+    elif op == '>':
+        return int(a > b)
+    elif op == '<=':
+        return int(a <= b)
+    elif op == '>=':
+        return int(a >= b)
+    elif op == '==':
+        return int(a == b)
+    elif op == '!=':
+        return int(a != b)
+    else:
+        raise InterpreterError("Operator '%s' not supported" % op)
+
+
+class _Return(Exception):
+
+    '''
+    Raised by a return statement, with the returned value
+    '''
+
+    def __init__(self, value):
+        '''
+        Constructor
+        '''
+        super(_Return, self).__init__()
+        self.value = value
+
+
+class _Pointer(object):
+
+    '''
+    Pointer value, the address of key at container
+    '''
+
+    def __init__(self, container, key):
+        '''
+        Constructor
+        '''
+        self._container = container
+        self._key = key
+
+    def get(self):
+        return self._container[self._key]
+
+    def set(self, value):
+        self._container[self._key] = value
+
+
+class Interpreter(object):
+
+    '''
+    Class that runs the handler of a tree, one entry at a time.
+    Functions and statements that may change state are python generators,
+    each state change is a yield of (function name, next state, time the
+    handler is entered again), or None as time when it is entered again
+    right away.
+    Time is kept at int_now, so a caller may run several of them against
+    a shared clock, and may override complete_at to delay blocking
+    operations
+    '''
+
+    def __init__(self, root, sim):
+        '''
+        Constructor
+        '''
+        self._nb = root.get_scope(NonBlockingData)
+        self._sim = sim
+        self.int_now = 0
+        self._gen = None
+        self._result = []
+        self._started = {}
+        self._defs = {}
+        self._config = {}
+        self.report = RunReport()
+
+        manifest = root.manifest.get()
+        config_name = 'struct _%s_plugin_config' % manifest.txt_prefix
+        elements = list(manifest.elements)
+        if not root.source.is_none():
+            elements += list(root.source.get().declaration_list.get(
+            ).declarations)
+
+        for each in elements:
+            node = each.get()
+            if isinstance(node, FunctionDefinitionNode):
+                self._defs[node.declaration.get().txt_name] = node
+            elif isinstance(node, StructTypeDeclNode) and\
+                    node.txt_name == config_name:
+                self._config = _default(node)
+
+        for k, v in sim.config.items():
+            self._config[k] = v
+
+    def start(self):
+        '''
+        Starts running the handler, returns the first state,
+        (handler name, 0)
+        '''
+        handler = self._defs[self._nb.handler_name]
+
+        # config, persistent state, state, command, reply, wf, first byte
+        args = [_Pointer([self._config], 0), None, None, None, 0, None, 0]
+        self._result = []
+        self._gen = self._run_function(handler, args, self._result)
+
+        return (self._nb.handler_name, 0)
+
+    def step(self):
+        '''
+        Runs the handler until the next state change, returns the next
+        state and the time it can run, None when it can run right away.
+        Returns None when the handler is done, its returned value is kept
+        at report.int_result
+        '''
+        try:
+            return next(self._gen)
+        except StopIteration:
+            self.report.int_result = self._result[0]\
+                if len(self._result) != 0 else None
+            return None
+
+    def complete_at(self, kind, start, duration):
+        '''
+        Returns the time a blocking operation of kind, started at start
+        and taking duration, is completed
+        '''
+        # pylint: disable=unused-argument
+        return start + duration
+
+    def run(self):
+        '''
+        Enters the handler until it is done
+        '''
+        nxt = self.start()
+        while True:
+            self._enter(nxt)
+            ev = self.step()
+            if ev is None:
+                break
+
+            nxt, until = ev
+
+            if until is not None and until > self.int_now:
+                poll = self._sim.int_poll
+                if poll == 0:
+                    self.int_now = until
+                else:
+                    ticks = (until - self.int_now + poll - 1) // poll
+                    for _ in range(ticks - 1):
+                        self.int_now += poll
+                        self._enter(nxt)
+                        self.report.int_polls += 1
+                    self.int_now += poll
+
+        self.report.int_time = self.int_now
+
+    def _enter(self, state):
+        '''
+        Handler is entered to run state
+        '''
+        if self.report.int_entries == self._sim.int_max_entries:
+            raise InterpreterError(
+                "Handler entered more than %d times" % self.report.int_entries)
+
+        self.report.int_entries += 1
+        self.report.states.append(state)
+        self.int_now += self._sim.int_entry
+
+    def _run_function(self, node, args, result):
+        '''
+        Runs function definition node, its return value is appended to
+        result
+        '''
+        decl = node.declaration.get()
+        env = {}
+        decls = decl.argument_decl_list.get().declarations
+        for i in range(decls.get_size()):
+            env[decls.at(i).get()] = args[i] if i < len(args) else None
+
+        sm = self._nb.get_state_machine_data(decl)
+        stmt_list = node.statement_list.get()
+        try:
+            for each in self._exec(stmt_list, env, decl.txt_name):
+                yield each
+                if sm is not None:
+                    self._resume(sm, stmt_list, env)
+        except _Return as r:
+            result.append(_convert(r.value, decl.return_type.get().get_type()))
+
+    def _resume(self, sm, stmt_list, env):
+        '''
+        The function is entered again after a state change
+        '''
+        for k in env.keys():
+            if isinstance(k, VariableDeclarationStmtNode) and\
+                    not sm.is_moved_var_decl(k):
+                env[k] = _UNDEFINED
+
+        for each in stmt_list.statements:
+            s = each.get()
+            if isinstance(s, StateMachineStmtNode):
+                break
+            for _ in self._exec(s, env, None):
+                assert False
+
+    def _has_states(self, call):
+        return self._nb.has_states(call.ref_declaration)
+
+    def _call(self, call, env, result):
+        '''
+        Runs function call expression, its value is appended to result
+        '''
+        args = []
+        for each in call.argument_list.get().arguments:
+            if not isinstance(each.get(), StatefullCallArgumentExprNode):
+                args.append(self._eval(each.get(), env))
+
+        if call.txt_name in self._defs:
+            node = self._defs[call.txt_name]
+            for each in self._run_function(node, args, result):
+                yield each
+        else:
+            result.append(self._papi_call(call, args))
+
+    def _papi_call(self, call, args):
+        '''
+        Runs a papi function, or any other without definition.
+        Micro sleeps busy wait, time goes on without a handler re-entry
+        '''
+        if call.bool_micro_sleep:
+            self.int_now += args[0]
+
+        self._started[call] = self.int_now
+        self.report.papi_calls.append((call.txt_name, tuple(
+            each for each in args if isinstance(each, (int, long)))))
+
+        if call.txt_name in self._sim.calls:
+            return self._sim.calls[call.txt_name](*args)
+
+        return 0
+
+    def _exec(self, node, env, func_name):
+        '''
+        Runs statement node
+        '''
+        # pylint: disable=too-many-branches
+        # pylint: disable=too-many-statements
+
+        if isinstance(node, StmtListNode):
+            for each in node.statements:
+                for ev in self._exec(each.get(), env, func_name):
+                    yield ev
+
+        elif isinstance(node, _NOP_NODES):
+            pass
+
+        elif isinstance(node, ExpressionStmtNode):
+            self._eval(node.expression.get(), env)
+
+        elif isinstance(node, VariableDeclarationStmtNode):
+            if node.initializer_expression.is_none():
+                env[node] = _default(node.get_type())
+            else:
+                e = node.initializer_expression.get()
+                if isinstance(e, FunctionCallExprNode) and\
+                        self._has_states(e):
+                    result = []
+                    for ev in self._call(e, env, result):
+                        yield ev
+                    value = result[0]
+                else:
+                    value = self._eval(e, env)
+                env[node] = _convert(_copy(value), node.get_type())
+
+        elif isinstance(node, FunctionCallStmtNode):
+            e = node.expression.get()
+            if self._has_states(e):
+                for ev in self._call(e, env, []):
+                    yield ev
+            else:
+                self._eval(e, env)
+
+        elif isinstance(node, FunctionCallSubStmtNode):
+            result = []
+            for ev in self._call(node.expression.get(), env, result):
+                yield ev
+            env[node] = result[0]
+
+        elif isinstance(node, IfElseStmtNode):
+            if self._eval(node.expression.get(), env):
+                stmts = node.if_stmt_list.get()
+            elif not node.else_stmt_list.is_none():
+                stmts = node.else_stmt_list.get()
+            else:
+                stmts = None
+            if stmts is not None:
+                for ev in self._exec(stmts, env, func_name):
+                    yield ev
+
+        elif isinstance(node, DoWhileStmtNode):
+            while True:
+                for ev in self._exec(node.statement_list.get(), env,
+                                     func_name):
+                    yield ev
+                if not self._eval(node.expression.get(), env):
+                    break
+
+        elif isinstance(node, WhileStmtNode):
+            while self._eval(node.expression.get(), env):
+                for ev in self._exec(node.statement_list.get(), env,
+                                     func_name):
+                    yield ev
+
+        elif isinstance(node, ForStmtNode):
+            if not node.init_expression.is_none():
+                self._eval(node.init_expression.get(), env)
+            while node.condition_expression.is_none() or\
+                    self._eval(node.condition_expression.get(), env):
+                for ev in self._exec(node.statement_list.get(), env,
+                                     func_name):
+                    yield ev
+                if not node.iteration_expression.is_none():
+                    self._eval(node.iteration_expression.get(), env)
+
+        elif isinstance(node, ReturnStmtNode):
+            if node.expression.is_none():
+                raise _Return(None)
+            raise _Return(self._eval(node.expression.get(), env))
+
+        elif isinstance(node, DebugStateStmtNode):
+            yield ((func_name, node.int_next_state), None)
+
+        elif isinstance(node, YieldStateStmtNode):
+            if node.ref_counter is not None:
+                d = node.ref_counter
+                env[d] = _convert(_read(env, d) + 1, d.get_type())
+                if env[d] == node.int_every:
+                    env[d] = 0
+                    yield ((func_name, node.int_next_state), None)
+            else:
+                yield ((func_name, node.int_next_state), None)
+
+        elif isinstance(node, (PapiSleepStmtNode, PapiWaitStmtNode)):
+            until = self._start_wait(node, env)
+            yield ((func_name, node.int_next_state), until)
+
+        elif isinstance(node, PapiWaitGroupStmtNode):
+            until = max(self._start_wait(each.get(), env)
+                        for each in node.waits)
+            yield ((func_name, node.int_next_state), until)
+
+        elif isinstance(node, PapiWaitForStmtNode):
+            done = [self.complete_at(kind, self._started[each],
+                                     self._sim.waits[kind])
+                    for each, kind in zip(node.refs_starts,
+                                          node.txts_wait_for)]
+            if node.bool_any:
+                until = min(done)
+                ptr = self._eval(node.completed.get(), env)
+                ptr.set(done.index(until))
+            else:
+                until = max(done)
+            yield ((func_name, node.int_next_state), until)
+
+        elif isinstance(node, ParserStmtNode):
+            raise _Return(dict(
+                (each.name, self._sim.request.get(each.name, 0))
+                for each in node.parser_elements))
+
+        elif isinstance(node, ComposerStmtNode):
+            values = dict((k.txt_name, v) for k, v in env.items())
+            self.report.replies.append(tuple(
+                values[each.name] for each in node.parser_elements))
+
+        else:
+            raise InterpreterError(
+                "Statement '%s' not supported" % type(node).__name__)
+
+    def _start_wait(self, node, env):
+        '''
+        Starts a blocking operation, returns the time it is completed
+        '''
+        args = [self._eval(each.get(), env)
+                for each in node.argument_list.get().arguments]
+
+        if isinstance(node, PapiSleepStmtNode):
+            self.report.papi_calls.append(('papi_sleep', tuple(args)))
+            return self.int_now + args[0]
+
+        self.report.papi_calls.append((node.txt_name, tuple(args)))
+        return self.complete_at(node.txt_wait_for, self.int_now,
+                                self._sim.waits[node.txt_wait_for])
+
+    def _ref(self, e, env):
+        '''
+        Returns the pointer to lvalue expression e
+        '''
+        if isinstance(e, (TrivialCastExprNode, CastExprNode)):
+            return self._ref(e.expression.get(), env)
+        elif isinstance(e, VariableExprNode):
+            return _Pointer(env, e.ref_declaration)
+        elif isinstance(e, MemberAccessExprNode):
+            if e.bool_arrow:
+                struct = self._eval(e.expression.get(), env).get()
+            else:
+                struct = self._ref(e.expression.get(), env).get()
+            return _Pointer(struct, e.txt_name)
+        elif isinstance(e, PointerExprNode):
+            return self._eval(e.expression.get(), env)
+        else:
+            raise InterpreterError(
+                "Expression '%s' is not an lvalue" % type(e).__name__)
+
+    def _store(self, e, value, env):
+        '''
+        Stores value at lvalue expression e, and returns it converted to
+        the type of e
+        '''
+        value = _convert(_copy(value), e.get_type())
+        self._ref(e, env).set(value)
+        return value
+
+    def _eval(self, e, env):
+        '''
+        Returns the value of expression e
+        '''
+        # pylint: disable=too-many-branches
+        # pylint: disable=too-many-return-statements
+
+        value = get_literal_value(e)
+        if value is not None:
+            return value
+
+        if isinstance(e, BooleanLiteralExprNode):
+            return 1 if e.bool_value else 0
+
+        elif isinstance(e, StaticEvaluatedExprNode):
+            return e.get_static_value()
+
+        elif isinstance(e, TrivialCastExprNode):
+            return self._eval(e.expression.get(), env)
+
+        elif isinstance(e, CastExprNode):
+            return _convert(self._eval(e.expression.get(), env), e.get_type())
+
+        elif isinstance(e, VariableExprNode):
+            d = e.ref_declaration
+            if isinstance(d, ConstantDefineNode):
+                return self._eval(d.expression.get(), env)
+            return _read(env, d)
+
+        elif isinstance(e, FunctionCallSubExprNode):
+            return env[e.ref_declaration]
+
+        elif isinstance(e, FunctionCallExprNode):
+            result = []
+            for _ in self._call(e, env, result):
+                raise InterpreterError(
+                    "State change inside expression at '%s'" % e.txt_name)
+            return result[0] if len(result) != 0 else None
+
+        elif isinstance(e, MemberAccessExprNode):
+            if e.bool_arrow:
+                return self._eval(e.expression.get(), env).get()[e.txt_name]
+            return self._eval(e.expression.get(), env)[e.txt_name]
+
+        elif isinstance(e, AssignmentExprNode):
+            return self._store(e.left_expression.get(),
+                               self._eval(e.right_expression.get(), env), env)
+
+        elif isinstance(e, ConditionalExprNode):
+            if self._eval(e.condition_expression.get(), env):
+                return self._eval(e.true_expression.get(), env)
+            return self._eval(e.false_expression.get(), env)
+
+        elif isinstance(e, BinaryOpExprNode):
+            args = e.argument_list.get().arguments
+            a = self._eval(args.at(0).get(), env)
+            if e.txt_operator == '&&':
+                return int(bool(a) and bool(self._eval(args.at(1).get(), env)))
+            elif e.txt_operator == '||':
+                return int(bool(a) or bool(self._eval(args.at(1).get(), env)))
+            return compute_operator(e.txt_operator, a,
+                                    self._eval(args.at(1).get(), env))
+
+        elif isinstance(e, MemberBinaryOpExprNode):
+            target = e.expression.get()
+            arg = e.argument_list.get().arguments.at(0).get()
+            value = compute_operator(e.txt_operator[:-1],
+                                     self._eval(target, env),
+                                     self._eval(arg, env))
+            return self._store(target, value, env)
+
+        elif isinstance(e, UnaryOpExprNode):
+            value = self._eval(e.expression.get(), env)
+            if e.txt_operator in ('++', '--'):
+                value += 1 if e.txt_operator == '++' else -1
+                return self._store(e.expression.get(), value, env)
+            elif e.txt_operator == '-':
+                return -value
+            elif e.txt_operator == '~':
+                return ~value
+            elif e.txt_operator == '!':
+                return int(not value)
+            return value
+
+        elif isinstance(e, PostUnaryOpExprNode):
+            value = self._eval(e.expression.get(), env)
+            step = 1 if e.txt_operator == 'post++' else -1
+            self._store(e.expression.get(), value + step, env)
+            return value
+
+        elif isinstance(e, PointerExprNode):
+            return self._eval(e.expression.get(), env).get()
+
+        elif isinstance(e, AddressOfExprNode):
+            return self._ref(e.expression.get(), env)
+
+        else:
+            raise InterpreterError(
+                "Expression '%s' not supported" % type(e).__name__)
@@ -63,9 +63,11 @@ def create_manifest(compiler, ctx, prefix, zepto_plugin):
 
     req = _get_elements(zepto_plugin.get_request_fields())
     _make_parser(compiler, ctx, node.elements, struct_name, parser_name, req)
+    node.int_request_size = sum([each.int_size for each in req])
 
     resp = _get_elements(zepto_plugin.get_response_fields())
     _make_composer(compiler, ctx, node.elements, writer_name, resp)
+    node.int_reply_size = sum([each.int_size for each in resp])
 
     per = _get_elements(zepto_plugin.get_peripheral())
     _add_struct(compiler, ctx, node.elements, config_name, per)
@@ -75,9 +77,49 @@ def create_manifest(compiler, ctx, prefix, zepto_plugin):
 
 class _Element(object):
 
-    def __init__(self, name, c_type):
+    def __init__(self, name, c_type, min_value=None, max_value=None,
+                 size=1):
         self.name = name
         self.c_type = c_type
+        self.min_value = min_value
+        self.max_value = max_value
+        self.int_size = size
+
+
+def get_encoded_size(field):
+    '''
+    Returns the worst case size in bytes of a request or response field
+    as encoded by papi, from its type and its min and max attributes.
+    Encoded integers of two bytes keep 7 bits of value in the first one,
+    with the high bit set when a second byte follows, so they take a
+    single byte when min and max are known to fit in those bits
+    '''
+    t = "".join(field['type'].split())
+    min_value = _get_int(field.get('min'))
+    max_value = _get_int(field.get('max'))
+
+    if t == "encoded-uint[max=2]":
+        if max_value is not None and max_value < 0x80:
+            return 1
+        return 2
+    elif t == "encoded-int[max=2]":
+        if min_value is not None and max_value is not None and\
+                min_value >= -0x40 and max_value < 0x40:
+            return 1
+        return 2
+    else:
+        return 1
+
+
+def _get_int(value):
+    '''
+    Returns a manifest attribute as an integer, None if not set.
+    Response attributes are not converted by ZeptoPlugin
+    '''
+    if value is None:
+        return None
+
+    return int(value)
 
 
 def _get_elements(fields):
@@ -97,7 +139,9 @@ def _get_elements(fields):
         else:
             assert False
 
-        result.append(_Element(current['name'], c_type))
+        result.append(_Element(current['name'], c_type,
+                               current.get('min'), current.get('max'),
+                               get_encoded_size(current)))
 
     return result
 
@@ -111,6 +155,8 @@ def _add_struct(compiler, ctx, elements, name, per):
         for each in per:
             att = compiler.init_node(c_node.AttributeDeclarationNode(), ctx)
             att.txt_name = each.name
+            att.int_min = each.min_value
+            att.int_max = each.max_value
             t = compiler.init_node(c_node.SimpleTypeNode(), ctx)
             t.txt_name = each.c_type
             att.declaration_type.set(t)
@@ -0,0 +1,77 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import FunctionCallStmtNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.overlap import get_literal_value
+
+
+def replace_short_sleeps(root, threshold):
+    '''
+    Marks papi_sleep calls with a literal duration smaller than threshold
+    as micro sleeps. They are no longer blocking, so no state is created
+    for them, and they are written as a busy wait with
+    papi_gravely_power_inefficient_micro_sleep.
+    Must run before inline_functions and create_states, so functions
+    whose only blocking calls are short sleeps have no states at all.
+    Returns a map of function name to the number of sleeps replaced,
+    each one is a state less
+    '''
+    result = {}
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        w = _SleepsWalker(threshold)
+        w.walk_node(node.statement_list.get())
+        for call in w.sleeps:
+            call.bool_is_blocking = False
+            call.bool_micro_sleep = True
+
+        if len(w.sleeps) != 0:
+            result[node.declaration.get().txt_name] = len(w.sleeps)
+
+    return result
+
+
+class _SleepsWalker(NodeWalker):
+
+    '''
+    Walker class that collects papi_sleep call expressions, used as a
+    statement, with a literal duration smaller than threshold
+    '''
+
+    def __init__(self, threshold):
+        '''
+        Constructor
+        '''
+        super(_SleepsWalker, self).__init__()
+        self._threshold = threshold
+        self.sleeps = []
+
+    def walk_node(self, node):
+
+        if isinstance(node, FunctionCallStmtNode):
+            call = node.expression.get()
+            if call.txt_name == "papi_sleep" and call.bool_is_blocking:
+                value = get_literal_value(
+                    call.argument_list.get().arguments.at(0).get())
+                if value is not None and value < self._threshold:
+                    self.sleeps.append(call)
+
+        self.walk_childs(node)
@@ -0,0 +1,436 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import INT_TYPES, AttributeDeclarationNode,\
+    CastExprNode, DoWhileStmtNode, ForStmtNode, IntTypeDeclNode,\
+    LoopStmtNode, WhileStmtNode, get_type_info
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.expr import AddressOfExprNode,\
+    AssignmentExprNode, BinaryOpExprNode, ConditionalExprNode,\
+    MemberAccessExprNode, MemberOperatorExprNode, TrivialCastExprNode,\
+    VariableExprNode
+from smartanthill_phc.common.stmt import VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.cost import get_variable
+from smartanthill_phc.overlap import get_literal_value
+from smartanthill_phc.root import NonBlockingData
+from smartanthill_phc.state import YieldStateStmtNode
+
+
+# Value of an expression that can not be bounded
+_TOP = 'top'
+
+# Times a variable range may grow before it is given up
+_MAX_GROWTH = 8
+
+_STEPS = {'++': 1, 'post++': 1, '--': -1, 'post--': -1}
+
+
+def narrow_moved_vars(root, pack=False):
+    '''
+    Finds the range of values of each integer variable moved to a
+    state struct, and selects the smallest type that holds it.
+    Ranges are seeded from literals, from request fields min and max in
+    plugin manifest, and from the condition of the loop a variable is
+    counted in. Manifest bounds are trusted, as the parser does not
+    check them.
+    Only the state struct field is narrowed, reads are converted back
+    to the declared type, so expressions keep their meaning.
+    When pack is True, booleans and non negative integers that fit in
+    less than a byte are also packed into bit fields, see _pack_vars.
+    Results are kept at each StateMachineData
+    '''
+    nb = root.get_scope(NonBlockingData)
+
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        sm = nb.get_state_machine_data(node.declaration.get())
+        if sm is None:
+            continue
+
+        sm.narrowed_types = {}
+        sm.int_narrowed_bytes = 0
+
+        w = _AccessWalker()
+        w.walk_node(node.statement_list.get())
+
+        candidates = set()
+        for v in sm.refs_moved_var_decls:
+            if isinstance(v, VariableDeclarationStmtNode) and\
+                    v not in w.counters and v not in w.escaped and\
+                    get_type_info(v.declaration_type.get().get_type())\
+                    is not None:
+                candidates.add(v)
+
+        ranges = _get_ranges(w, candidates)
+
+        if pack:
+            _pack_vars(sm, w, ranges)
+
+        for v in sm.refs_moved_var_decls:
+            if v not in candidates or v in sm.narrowed_types:
+                continue
+            r = ranges[v]
+            if r is None or r == _TOP:
+                continue
+
+            info = get_type_info(v.declaration_type.get().get_type())
+            for name, size, lo, hi in INT_TYPES:
+                if size < info[1] and lo <= r[0] and r[1] <= hi:
+                    sm.narrowed_types[v] = name
+                    sm.int_narrowed_bytes += info[1] - size
+                    break
+
+        sm.refs_narrowed_writes = set(
+            e for e in w.lvalues if e.ref_declaration in sm.narrowed_types)
+
+
+def _pack_vars(sm, w, ranges):
+    '''
+    Selects the moved variables stored as bit fields, booleans take one
+    bit, and integers whose range is non negative and below 0x80 take
+    the bits of their highest value.
+    Bit fields do not cross a byte, so they are grouped in bytes,
+    widest first, each one at the first byte with room for it.
+    Variables whose address is taken can not be bit fields
+    '''
+    bits = {}
+    order = []
+    for v in sm.refs_moved_var_decls:
+        if not isinstance(v, VariableDeclarationStmtNode) or\
+                v in w.counters or v in w.escaped:
+            continue
+
+        t = v.declaration_type.get().get_type()
+        if isinstance(t, IntTypeDeclNode) and t.txt_name == 'bool':
+            bits[v] = 1
+        elif ranges.get(v) not in (None, _TOP) and ranges[v][0] >= 0 and\
+                ranges[v][1] < 0x80:
+            bits[v] = max(1, ranges[v][1].bit_length())
+        else:
+            continue
+        order.append(v)
+
+    groups = []
+    for v in sorted(order, key=lambda x: -bits[x]):
+        for g in groups:
+            if g[0] + bits[v] <= 8:
+                g[0] += bits[v]
+                g[1].append(v)
+                break
+        else:
+            groups.append([bits[v], [v]])
+
+    sm.packed_bits = bits
+    sm.refs_packed_vars = [v for g in groups for v in g[1]]
+
+    for v in order:
+        t = v.declaration_type.get().get_type()
+        if bits[v] == 1 and t.txt_name == 'bool':
+            sm.narrowed_types[v] = 'bool'
+            sm.int_narrowed_bytes += 1
+        else:
+            sm.narrowed_types[v] = 'uint8_t'
+            sm.int_narrowed_bytes += get_type_info(t)[1]
+
+    sm.int_narrowed_bytes -= len(groups)
+
+
+def _get_type_range(t):
+
+    if isinstance(t, IntTypeDeclNode) and t.txt_name == 'bool':
+        return (0, 1)
+
+    info = get_type_info(t)
+    if info is None:
+        return _TOP
+
+    return (info[2], info[3])
+
+
+def _join(a, b):
+    '''
+    Smallest range including ranges a and b, where None is the empty range
+    '''
+    if a is None:
+        return b
+    elif b is None:
+        return a
+    elif a == _TOP or b == _TOP:
+        return _TOP
+    else:
+        return (min(a[0], b[0]), max(a[1], b[1]))
+
+
+def _get_ranges(w, candidates):
+    '''
+    Iterates the writes found by walker w until ranges of candidates
+    are stable
+    '''
+    unsafe = w.escaped | w.dirty
+    ranges = dict((v, None) for v in candidates)
+    growth = dict((v, 0) for v in candidates)
+
+    changed = True
+    while changed:
+        changed = False
+        current = dict((v, None) for v in candidates)
+        for write in w.writes:
+            v = write[0]
+            if v in candidates:
+                r = _eval_write(w, write, ranges, unsafe)
+                declared = _get_type_range(
+                    v.declaration_type.get().get_type())
+                if r not in (None, _TOP) and\
+                        (r[0] < declared[0] or r[1] > declared[1]):
+                    r = _TOP
+                current[v] = _join(current[v], r)
+
+        for v in candidates:
+            if current[v] != ranges[v]:
+                changed = True
+                growth[v] += 1
+                if growth[v] > _MAX_GROWTH:
+                    current[v] = _TOP
+        ranges = current
+
+    return ranges
+
+
+def _eval_write(w, write, ranges, unsafe):
+    '''
+    Returns the range of the value stored by a write
+    '''
+    v, kind, e, loop = write
+    if kind == 'assign':
+        return _eval(e, ranges, unsafe)
+    elif kind != 'step' or loop is None or isinstance(loop, DoWhileStmtNode):
+        return _TOP
+
+    # only counting in the loop, and the loop checks it before each step
+    if w.loop_writes[loop].count(v) != 1:
+        return _TOP
+
+    if isinstance(loop, WhileStmtNode):
+        cond = loop.expression.get()
+    elif not loop.condition_expression.is_none():
+        cond = loop.condition_expression.get()
+    else:
+        return _TOP
+
+    if not isinstance(cond, BinaryOpExprNode):
+        return _TOP
+    args = cond.argument_list.get().arguments
+    if get_variable(args.at(0).get()) != v:
+        return _TOP
+
+    bound = _eval(args.at(1).get(), ranges, unsafe)
+    r = ranges[v]
+    if bound is None or r is None:
+        return None
+    elif bound == _TOP or r == _TOP:
+        return _TOP
+
+    # last is the value farthest from the start that passes the check
+    if e > 0 and cond.txt_operator in ('<', '<='):
+        last = bound[1] if cond.txt_operator == '<=' else bound[1] - 1
+        return (r[0] + e, last + e) if r[0] <= last else None
+    elif e < 0 and cond.txt_operator in ('>', '>='):
+        last = bound[0] if cond.txt_operator == '>=' else bound[0] + 1
+        return (last + e, r[1] + e) if r[1] >= last else None
+    else:
+        return _TOP
+
+
+def _eval(e, ranges, unsafe):
+    '''
+    Returns the range of values of expression e, None if it depends on
+    variables without a known range yet.
+    Manifest bounds are not used for fields in unsafe, or fields of
+    variables in unsafe, as they may be written by the function
+    '''
+    # pylint: disable=too-many-return-statements
+
+    value = get_literal_value(e)
+    if value is not None:
+        return (value, value)
+
+    if isinstance(e, TrivialCastExprNode):
+        return _eval(e.expression.get(), ranges, unsafe)
+
+    if isinstance(e, VariableExprNode) and e.ref_declaration in ranges:
+        return ranges[e.ref_declaration]
+
+    if isinstance(e, MemberAccessExprNode) and\
+            isinstance(e.ref_declaration, AttributeDeclarationNode) and\
+            e.ref_declaration.int_min is not None and\
+            e.ref_declaration.int_max is not None and\
+            e.ref_declaration not in unsafe and\
+            get_variable(e.expression.get()) not in unsafe:
+        return (e.ref_declaration.int_min, e.ref_declaration.int_max)
+
+    if isinstance(e, ConditionalExprNode):
+        return _join(_eval(e.true_expression.get(), ranges, unsafe),
+                     _eval(e.false_expression.get(), ranges, unsafe))
+
+    t = _get_type_range(e.get_type())
+
+    if isinstance(e, CastExprNode):
+        r = _eval(e.expression.get(), ranges, unsafe)
+        if r is None or r == _TOP or t == _TOP:
+            return r
+        return r if t[0] <= r[0] and r[1] <= t[1] else t
+
+    if isinstance(e, BinaryOpExprNode):
+        if e.txt_operator in ('<', '>', '<=', '>=', '==', '!=', '&&', '||'):
+            return (0, 1)
+
+        args = e.argument_list.get().arguments
+        a = _eval(args.at(0).get(), ranges, unsafe)
+        b = _eval(args.at(1).get(), ranges, unsafe)
+        if a is None or b is None:
+            return None
+        elif a == _TOP or b == _TOP:
+            return _TOP
+
+        r = _eval_binary(e.txt_operator, a, b)
+        if r is None or r == _TOP or t == _TOP:
+            return r
+        # out of the expression type, may wrap around
+        return r if t[0] <= r[0] and r[1] <= t[1] else _TOP
+
+    return t
+
+
+def _eval_binary(op, a, b):
+
+    if op == '+':
+        return (a[0] + b[0], a[1] + b[1])
+    elif op == '-':
+        return (a[0] - b[1], a[1] - b[0])
+    elif op == '*':
+        values = [x * y for x in a for y in b]
+        return (min(values), max(values))
+    elif op == '/' and a[0] >= 0 and b[0] > 0:
+        return (a[0] // b[1], a[1] // b[0])
+    elif op == '%' and a[0] >= 0 and b[0] > 0:
+        return (0, min(a[1], b[1] - 1))
+    else:
+        return _TOP
+
+
+class _AccessWalker(NodeWalker):
+
+    '''
+    Walker class that collects the writes to each variable of a function,
+    with the loops they are done in
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_AccessWalker, self).__init__()
+        self._loops = []
+        self.writes = []
+        self.lvalues = set()
+        self.escaped = set()
+        self.dirty = set()
+        self.counters = set()
+        self.loop_writes = {}
+
+    def _add_write(self, decl, kind, value):
+
+        loop = self._loops[-1] if len(self._loops) != 0 else None
+        self.writes.append((decl, kind, value, loop))
+        for each in self._loops:
+            self.loop_writes.setdefault(each, []).append(decl)
+
+    def walk_node(self, node):
+        # pylint: disable=too-many-branches
+
+        if isinstance(node, VariableDeclarationStmtNode):
+            if not node.initializer_expression.is_none():
+                self._add_write(
+                    node, 'assign', node.initializer_expression.get())
+            self.walk_childs(node)
+
+        elif isinstance(node, YieldStateStmtNode):
+            if node.ref_counter is not None:
+                self.counters.add(node.ref_counter)
+
+        elif isinstance(node, LoopStmtNode):
+            if isinstance(node, ForStmtNode):
+                # init is done once, before the loop
+                node.init_expression.call(self.walk_callback)
+                self._loops.append(node)
+                node.condition_expression.call(self.walk_callback)
+                node.iteration_expression.call(self.walk_callback)
+                node.statement_list.call(self.walk_callback)
+            else:
+                self._loops.append(node)
+                self.walk_childs(node)
+            self._loops.pop()
+
+        elif isinstance(node, AssignmentExprNode) and\
+                isinstance(node.left_expression.get(), VariableExprNode):
+            left = node.left_expression.get()
+            self._add_write(
+                left.ref_declaration, 'assign', node.right_expression.get())
+            self.lvalues.add(left)
+            node.right_expression.call(self.walk_callback)
+
+        elif isinstance(node, MemberOperatorExprNode) and\
+                isinstance(node.expression.get(), VariableExprNode) and\
+                (node.txt_operator in _STEPS or
+                 node.txt_operator.endswith('=')):
+            left = node.expression.get()
+            step = _STEPS.get(node.txt_operator)
+            if node.txt_operator in ('+=', '-='):
+                step = get_literal_value(
+                    node.argument_list.get().arguments.at(0).get())
+                if step is not None and node.txt_operator == '-=':
+                    step = -step
+            if step:
+                self._add_write(left.ref_declaration, 'step', step)
+            else:
+                self._add_write(left.ref_declaration, 'unknown', None)
+            self.lvalues.add(left)
+            node.argument_list.call(self.walk_callback)
+
+        elif isinstance(node, AssignmentExprNode) and\
+                isinstance(node.left_expression.get(), MemberAccessExprNode):
+            self.dirty.add(node.left_expression.get().ref_declaration)
+            self.walk_childs(node)
+
+        elif isinstance(node, MemberOperatorExprNode) and\
+                isinstance(node.expression.get(), MemberAccessExprNode) and\
+                (node.txt_operator in _STEPS or
+                 node.txt_operator.endswith('=')):
+            self.dirty.add(node.expression.get().ref_declaration)
+            self.walk_childs(node)
+
+        elif isinstance(node, AddressOfExprNode):
+            e = node.expression.get()
+            if isinstance(e, VariableExprNode):
+                self.escaped.add(e.ref_declaration)
+            self.walk_childs(node)
+
+        else:
+            self.walk_childs(node)
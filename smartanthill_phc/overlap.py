@@ -0,0 +1,152 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import IntegerLiteralExprNode
+from smartanthill_phc.common.expr import VariableExprNode,\
+    FunctionCallExprNode, TrivialCastExprNode, AddressOfExprNode
+from smartanthill_phc.common.visitor import NodeWalker
+
+
+def get_literal_value(e):
+    '''
+    Returns the value of an integer literal expression, None if the
+    expression is not a literal
+    '''
+    while isinstance(e, TrivialCastExprNode):
+        e = e.expression.get()
+
+    if not isinstance(e, IntegerLiteralExprNode):
+        return None
+
+    txt = e.txt_literal.rstrip('uUlL')
+    if len(txt) > 1 and txt[0] == '0' and txt[1] not in 'xX':
+        return int(txt, 8)
+
+    return int(txt, 0)
+
+
+class WaitAccess(object):
+
+    '''
+    Helper class describing resources used by a blocking papi call,
+    the bus, and the variables read and written
+    '''
+
+    def __init__(self, call):
+        '''
+        Constructor
+        '''
+        assert isinstance(call, FunctionCallExprNode)
+        assert call.bool_is_blocking
+
+        self.txt_name = call.txt_name
+        self.txt_bus = None
+        self.bus_id = None
+        self.bool_sleep = call.txt_name == 'papi_sleep'
+        self.bool_unknown_write = False
+        self.reads = set()
+        self.writes = set()
+
+        args = call.argument_list.get().arguments
+        if not self.bool_sleep:
+            # papi_wait_for_<bus>_<direction>
+            self.txt_bus = call.txt_name.split('_')[3]
+            self.bus_id = get_literal_value(args.at(0).get())
+
+        for i in range(args.get_size()):
+            e = args.at(i).get()
+            if self.txt_name.endswith('_receive') and i == 3:
+                # data is written asynchronously through this pointer
+                if isinstance(e, AddressOfExprNode) and\
+                        isinstance(e.expression.get(), VariableExprNode):
+                    self.writes.add(e.expression.get().ref_declaration)
+                    continue
+                else:
+                    self.bool_unknown_write = True
+
+            w = _ReadsWalker()
+            w.walk_node(e)
+            self.reads.update(w.reads)
+            if w.calls:
+                self.bool_unknown_write = True
+
+    def conflicts_with(self, other):
+        '''
+        Returns True if this call and other can not be in flight
+        at the same time
+        '''
+        if self.bool_unknown_write or other.bool_unknown_write:
+            return True
+
+        if self.bool_sleep and other.bool_sleep:
+            return True  # only one timeout can be waited for
+
+        if self.txt_bus is not None and self.txt_bus == other.txt_bus:
+            if self.bus_id is None or other.bus_id is None or\
+                    self.bus_id == other.bus_id:
+                return True
+
+        if self.writes & (other.reads | other.writes):
+            return True
+
+        if other.writes & self.reads:
+            return True
+
+        return False
+
+
+def can_overlap(group, access, overlap_sleeps):
+    '''
+    Returns True if blocking call described by access can be started
+    together with all calls in group.
+    A sleep next to a transfer usually gives a device time to settle,
+    that is not a data dependence we can see, so sleeps are only grouped
+    when overlap_sleeps is True
+    '''
+    if not overlap_sleeps:
+        if access.bool_sleep:
+            return False
+        for each in group:
+            if each.bool_sleep:
+                return False
+
+    for each in group:
+        if each.conflicts_with(access):
+            return False
+
+    return True
+
+
+class _ReadsWalker(NodeWalker):
+
+    '''
+    Walker class that collects variables read by an expression
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_ReadsWalker, self).__init__()
+        self.reads = set()
+        self.calls = False
+
+    def walk_node(self, node):
+        if isinstance(node, VariableExprNode):
+            self.reads.add(node.ref_declaration)
+        elif isinstance(node, FunctionCallExprNode):
+            self.calls = True
+
+        self.walk_childs(node)
@@ -52,7 +52,9 @@ _blocking_funcs = [
     "papi_wait_for_spi_send",
     "papi_wait_for_i2c_send",
     "papi_wait_for_spi_receive",
-    "papi_wait_for_i2c_receive"
+    "papi_wait_for_i2c_receive",
+    "papi_wait_for_all",
+    "papi_wait_for_any"
 ]
 
 
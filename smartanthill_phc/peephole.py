@@ -0,0 +1,194 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.common.base import StmtListNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.expr import TrivialCastExprNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.overlap import get_literal_value
+from smartanthill_phc.root import NonBlockingData
+from smartanthill_phc.state import DebugStateStmtNode,\
+    YieldStateStmtNode, BeforeReturnStmtNode, PapiWaitStmtNode,\
+    PapiSleepStmtNode, PapiWaitGroupStmtNode, PapiWaitForStmtNode
+
+# Largest duration of a single papi_sleep, its argument is an uint16_t
+_MAX_SLEEP = 0xffff
+
+
+def optimize_states(compiler, root):
+    '''
+    Removes states of a tree processed by create_states that only add a
+    handler re-entry.
+    Adjacent sleeps of literal durations are merged into a single sleep,
+    and 'PLUGIN_DEBUG' and 'PLUGIN_YIELD' states right before or after
+    another state change that always yields, or right before a return,
+    are removed. Remaining states of each state machine are renumbered
+    densely, in the same order.
+    Returns a map of function name to the number of states removed
+    '''
+    nb = root.get_scope(NonBlockingData)
+
+    result = {}
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        sm = nb.get_state_machine_data(node.declaration.get())
+        if sm is None:
+            continue
+
+        w = _StatesWalker()
+        w.walk_node(node.statement_list.get())
+
+        removed = 0
+        for stmt_list in w.stmt_lists:
+            removed += _optimize_stmt_list(compiler, stmt_list)
+
+        w = _StatesWalker()
+        w.walk_node(node.statement_list.get())
+        _renumber(w.states, sm.ref_state_machine)
+
+        result[node.declaration.get().txt_name] = removed
+
+    return result
+
+
+def _always_yields(node):
+    '''
+    Returns True if node is a state change that always yields
+    '''
+    if isinstance(node, YieldStateStmtNode):
+        return node.ref_counter is None
+
+    return isinstance(node, (DebugStateStmtNode, PapiWaitStmtNode,
+                             PapiSleepStmtNode, PapiWaitGroupStmtNode,
+                             PapiWaitForStmtNode))
+
+
+def _is_removable(node):
+    '''
+    Returns True if node is a state change that may be removed, without
+    changing what the plugin does
+    '''
+    if isinstance(node, YieldStateStmtNode):
+        return node.ref_counter is None
+
+    return isinstance(node, DebugStateStmtNode)
+
+
+def _get_sleep_literal(node):
+    '''
+    Returns the integer literal node with the duration of a sleep,
+    None when it is not a literal
+    '''
+    if not isinstance(node, PapiSleepStmtNode):
+        return None
+
+    e = node.argument_list.get().arguments.at(0).get()
+    if get_literal_value(e) is None:
+        return None
+
+    while isinstance(e, TrivialCastExprNode):
+        e = e.expression.get()
+
+    return e
+
+
+def _merge_sleeps(first, second):
+    '''
+    Adds the duration of second sleep to first one, returns False when
+    they can not be merged
+    '''
+    a = _get_sleep_literal(first)
+    b = _get_sleep_literal(second)
+    if a is None or b is None:
+        return False
+
+    value = get_literal_value(a) + get_literal_value(b)
+    if value > _MAX_SLEEP:
+        return False
+
+    a.txt_literal = str(value)
+    a.int_value = value
+    return True
+
+
+def _optimize_stmt_list(compiler, stmt_list):
+    '''
+    Merges and removes states of a statement list, returns the number of
+    states removed
+    '''
+    stmts = stmt_list.statements
+    removed = 0
+    i = 0
+    while i < stmts.get_size():
+        s = stmts.at(i).get()
+        prev = stmts.at(i - 1).get() if i != 0 else None
+        nxt = stmts.at(i + 1).get() if i + 1 < stmts.get_size() else None
+
+        if nxt is not None and _merge_sleeps(s, nxt):
+            stmts.remove_at(i + 1)
+            compiler.remove_nodes(nxt)
+            removed += 1
+        elif _is_removable(s) and\
+                (_always_yields(prev) or _always_yields(nxt) or
+                 isinstance(nxt, BeforeReturnStmtNode)):
+            stmts.remove_at(i)
+            compiler.remove_nodes(s)
+            removed += 1
+            i = max(0, i - 1)
+        else:
+            i += 1
+
+    return removed
+
+
+def _renumber(states, sm):
+    '''
+    Renumbers states from one, keeping their order
+    '''
+    order = sorted(each.int_next_state for each in states)
+    numbers = dict((old, i + 1) for i, old in enumerate(order))
+
+    for each in states:
+        each.int_next_state = numbers[each.int_next_state]
+
+    sm.int_last_state = len(order)
+
+
+class _StatesWalker(NodeWalker):
+
+    '''
+    Walker class that collects statement lists, and nodes starting a state
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_StatesWalker, self).__init__()
+        self.stmt_lists = []
+        self.states = []
+
+    def walk_node(self, node):
+
+        if isinstance(node, StmtListNode):
+            self.stmt_lists.append(node)
+        elif getattr(node, 'int_next_state', None) is not None:
+            self.states.append(node)
+
+        self.walk_childs(node)
@@ -0,0 +1,199 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import IntTypeDeclNode, LoopStmtNode
+from smartanthill_phc.common.base import StmtListNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.expr import AddressOfExprNode,\
+    AssignmentExprNode, MemberOperatorExprNode, VariableExprNode
+from smartanthill_phc.common.stmt import VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.cost import get_trip_count
+from smartanthill_phc.narrow import get_type_info
+from smartanthill_phc.root import NonBlockingData
+from smartanthill_phc.state import YieldStateStmtNode
+
+_WRITES = ('++', '--', 'post++', 'post--')
+
+
+def promote_moved_vars(root, threshold, table):
+    '''
+    Selects the moved variables of each function kept in locals while
+    a handler entry runs, instead of being accessed through sa_state.
+    Locals are loaded from the state struct at function entry, right
+    before state dispatch, and the ones written are stored back before
+    each state change. Nothing is stored before a return, as moved
+    variables are not used after it.
+    A variable is promoted when it is used at least threshold times in
+    a single state. Uses inside loops with no state change are counted
+    once per iteration, with their trip count or table '<loop>'.
+    Only integer and boolean variables whose address is never taken
+    are promoted, and not yield counters.
+    Results are kept at each StateMachineData
+    '''
+    nb = root.get_scope(NonBlockingData)
+
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        sm = nb.get_state_machine_data(node.declaration.get())
+        if sm is None:
+            continue
+
+        w = _UsesWalker(table)
+        w.walk_node(node.statement_list.get())
+
+        sm.refs_promoted_vars = []
+        for v in sm.refs_moved_var_decls:
+            if not isinstance(v, VariableDeclarationStmtNode) or\
+                    v in w.counters or v in w.escaped or\
+                    not _is_scalar(v.declaration_type.get().get_type()):
+                continue
+
+            uses = max([0] + [counts.get(v, 0)
+                              for counts in w.uses.values()])
+            if uses >= threshold:
+                sm.refs_promoted_vars.append(v)
+
+        sm.refs_stored_vars = [v for v in sm.refs_promoted_vars
+                               if v in w.written]
+
+
+def _is_scalar(t):
+    '''
+    Returns True if type declaration t is an integer or a boolean
+    '''
+    return get_type_info(t) is not None or\
+        (isinstance(t, IntTypeDeclNode) and t.txt_name == 'bool')
+
+
+def _has_states(node):
+    '''
+    Returns True if there is a state change under node
+    '''
+    w = _StatesWalker()
+    w.walk_node(node)
+    return w.found
+
+
+class _StatesWalker(NodeWalker):
+
+    '''
+    Walker class that looks for nodes starting a state
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_StatesWalker, self).__init__()
+        self.found = False
+
+    def walk_node(self, node):
+
+        if getattr(node, 'int_next_state', None) is not None:
+            self.found = True
+        else:
+            self.walk_childs(node)
+
+
+class _UsesWalker(NodeWalker):
+
+    '''
+    Walker class that counts the uses of each variable in each state,
+    following the code in textual order, and collects variables written,
+    with their address taken and used as yield counters
+    '''
+
+    def __init__(self, table):
+        '''
+        Constructor
+        '''
+        super(_UsesWalker, self).__init__()
+        self._table = table
+        self._state = 0
+        self._weight = 1
+        self.uses = {}
+        self.written = set()
+        self.escaped = set()
+        self.counters = set()
+
+    def _add_write(self, e):
+
+        if isinstance(e, VariableExprNode):
+            self.written.add(e.ref_declaration)
+
+    def walk_node(self, node):
+
+        if getattr(node, 'int_next_state', None) is not None:
+            self._state = node.int_next_state
+
+        if isinstance(node, StmtListNode):
+            prev = None
+            for each in node.statements:
+                s = each.get()
+                if isinstance(s, LoopStmtNode):
+                    self._walk_loop(s, prev)
+                else:
+                    self.walk_node(s)
+                prev = s
+            return
+
+        if isinstance(node, LoopStmtNode):
+            self._walk_loop(node, None)
+            return
+
+        if isinstance(node, VariableExprNode):
+            counts = self.uses.setdefault(self._state, {})
+            counts[node.ref_declaration] =\
+                counts.get(node.ref_declaration, 0) + self._weight
+        elif isinstance(node, VariableDeclarationStmtNode):
+            if not node.initializer_expression.is_none():
+                self.written.add(node)
+        elif isinstance(node, YieldStateStmtNode):
+            if node.ref_counter is not None:
+                self.counters.add(node.ref_counter)
+        elif isinstance(node, AssignmentExprNode):
+            self._add_write(node.left_expression.get())
+        elif isinstance(node, MemberOperatorExprNode) and\
+                (node.txt_operator in _WRITES or
+                 node.txt_operator.endswith('=')):
+            self._add_write(node.expression.get())
+        elif isinstance(node, AddressOfExprNode):
+            e = node.expression.get()
+            if isinstance(e, VariableExprNode):
+                self.escaped.add(e.ref_declaration)
+
+        self.walk_childs(node)
+
+    def _walk_loop(self, node, prev):
+        '''
+        Uses in a loop without states are counted once for each iteration
+        '''
+        if _has_states(node):
+            self.walk_childs(node)
+            return
+
+        count = get_trip_count(node, prev)
+        if count is None:
+            count = self._table['<loop>']
+
+        weight = self._weight
+        self._weight *= max(1, count)
+        self.walk_childs(node)
+        self._weight = weight
@@ -0,0 +1,244 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import CastExprNode, ConstantDefineNode
+from smartanthill_phc.common.base import StmtListNode
+from smartanthill_phc.common.decl import ArgumentDeclNode,\
+    FunctionDefinitionNode
+from smartanthill_phc.common.expr import AddressOfExprNode,\
+    AssignmentExprNode, BinaryOpExprNode, ConditionalExprNode,\
+    LiteralExprNode, MemberAccessExprNode, MemberOperatorExprNode,\
+    TrivialCastExprNode, UnaryOpExprNode, VariableExprNode
+from smartanthill_phc.common.stmt import VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import NodeWalker
+from smartanthill_phc.cost import get_cost
+from smartanthill_phc.narrow import get_type_info
+from smartanthill_phc.overlap import get_literal_value
+from smartanthill_phc.pointer import PointerTypeDeclNode
+from smartanthill_phc.root import NonBlockingData
+
+# Size assumed for pointers, smallest targets have 16 bits pointers
+_POINTER_SIZE = 2
+
+
+def rematerialize(root, table):
+    '''
+    Moves declarations of variables never written, whose value is a side
+    effect free function of literals, defines, plugin config fields and
+    other such variables, to the beginning of the function.
+    Those declarations are run again each time the function is resumed,
+    so the variable is not kept at the state struct. Inputs must have the
+    same values each time a function is resumed. Plugin config is the
+    only argument known to do so, the handler is called again with new
+    values of the other ones, so no other argument is an input.
+    A declaration is moved only when the cost of its initializer, as
+    computed with table, is not bigger than the bytes of state saved
+    times '<state byte>'
+    '''
+    nb = root.get_scope(NonBlockingData)
+    nb.set_prefix(root.manifest.get().txt_prefix)
+
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        stmt_list = node.statement_list.get()
+
+        w = _AccessWalker()
+        w.walk_node(stmt_list)
+
+        # pointers to plugin config, whose fields are inputs too
+        config = set()
+        if node.declaration.get().txt_name == nb.handler_name:
+            args = node.declaration.get().argument_decl_list.get()
+            plugin_config = args.declarations.at(0).get()
+            if plugin_config not in w.written:
+                config.add(plugin_config)
+
+        inputs = set(config)
+
+        i = 0
+        for s, parent in w.decls:
+            if not _is_candidate(s, w, inputs, config, table):
+                continue
+
+            inputs.add(s)
+            s.bool_recomputed = True
+            if _get_base_variable(s.initializer_expression.get()) in config:
+                config.add(s)
+
+            if parent == stmt_list and\
+                    stmt_list.statements.at(i).get() == s:
+                i += 1
+                continue
+
+            for j in range(parent.statements.get_size()):
+                if parent.statements.at(j).get() == s:
+                    parent.statements.remove_at(j)
+                    break
+
+            stmt_list.statements.insert_at(i, s)
+            i += 1
+
+
+def _get_size(t):
+    '''
+    Returns the size in bytes of a type, None when not known
+    '''
+    if isinstance(t, PointerTypeDeclNode):
+        return _POINTER_SIZE
+
+    info = get_type_info(t)
+    return info[1] if info is not None else None
+
+
+def _get_base_variable(e):
+    '''
+    Returns the declaration of variable e, under any casts, None if e is
+    not a variable
+    '''
+    while isinstance(e, (TrivialCastExprNode, CastExprNode)):
+        e = e.expression.get()
+
+    if isinstance(e, VariableExprNode):
+        return e.ref_declaration
+
+    return None
+
+
+def _is_candidate(decl, w, inputs, config, table):
+    '''
+    Returns True if decl can and should be recomputed at each resume
+    '''
+    if decl.initializer_expression.is_none() or decl in w.written:
+        return False
+
+    # moved to function scope, name must not hide anything else
+    if w.names[decl.txt_name] != set([decl]):
+        return False
+
+    size = _get_size(decl.get_type())
+    if size is None:
+        return False
+
+    e = decl.initializer_expression.get()
+    if not _is_pure(e, inputs, config):
+        return False
+
+    return get_cost(e, table) <= size * table['<state byte>']
+
+
+def _is_pure(e, inputs, config):
+    '''
+    Returns True if expression e has no side effects, can not fail, and
+    only reads variables in inputs and fields pointed by variables in
+    config
+    '''
+    # pylint: disable=too-many-return-statements
+
+    if isinstance(e, LiteralExprNode):
+        return True
+    elif isinstance(e, (TrivialCastExprNode, CastExprNode)):
+        return _is_pure(e.expression.get(), inputs, config)
+    elif isinstance(e, VariableExprNode):
+        return e.ref_declaration in inputs or\
+            isinstance(e.ref_declaration, ConstantDefineNode)
+    elif isinstance(e, MemberAccessExprNode):
+        if e.bool_arrow:
+            return _get_base_variable(e.expression.get()) in config
+        return _is_pure(e.expression.get(), inputs, config)
+    elif isinstance(e, UnaryOpExprNode):
+        return _is_pure(e.expression.get(), inputs, config)
+    elif isinstance(e, ConditionalExprNode):
+        return _is_pure(e.condition_expression.get(), inputs, config) and\
+            _is_pure(e.true_expression.get(), inputs, config) and\
+            _is_pure(e.false_expression.get(), inputs, config)
+    elif isinstance(e, BinaryOpExprNode):
+        args = e.argument_list.get().arguments
+        if e.txt_operator in ('/', '%') and\
+                not get_literal_value(args.at(1).get()):
+            return False  # may divide by zero where it was not reached
+        for each in args:
+            if not _is_pure(each.get(), inputs, config):
+                return False
+        return True
+    else:
+        return False
+
+
+class _AccessWalker(NodeWalker):
+
+    '''
+    Walker class that collects variable declarations with their statement
+    list, the variables written, and the declarations seen with each name
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_AccessWalker, self).__init__()
+        self._stmt_list = None
+        self.decls = []
+        self.written = set()
+        self.names = {}
+
+    def _add_name(self, name, decl):
+        self.names.setdefault(name, set()).add(decl)
+
+    def walk_node(self, node):
+
+        if isinstance(node, StmtListNode):
+            prev = self._stmt_list
+            self._stmt_list = node
+            self.walk_childs(node)
+            self._stmt_list = prev
+            return
+
+        if isinstance(node, VariableDeclarationStmtNode):
+            self.decls.append((node, self._stmt_list))
+            self._add_name(node.txt_name, node)
+
+        elif isinstance(node, VariableExprNode):
+            if node.ref_declaration is not None and\
+                    not isinstance(node.ref_declaration, ArgumentDeclNode):
+                self._add_name(node.txt_name, node.ref_declaration)
+
+        elif isinstance(node, AssignmentExprNode):
+            self._add_written(node.left_expression.get())
+
+        elif isinstance(node, MemberOperatorExprNode) and\
+                (node.txt_operator in ('++', '--', 'post++', 'post--') or
+                 node.txt_operator.endswith('=')):
+            self._add_written(node.expression.get())
+
+        elif isinstance(node, AddressOfExprNode):
+            self._add_written(node.expression.get())
+
+        self.walk_childs(node)
+
+    def _add_written(self, e):
+        '''
+        Variable at e is written, or may be written through a pointer
+        '''
+        while isinstance(e, (TrivialCastExprNode, MemberAccessExprNode)):
+            if isinstance(e, MemberAccessExprNode) and e.bool_arrow:
+                return
+            e = e.expression.get()
+
+        if isinstance(e, VariableExprNode):
+            self.written.add(e.ref_declaration)
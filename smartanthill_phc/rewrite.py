@@ -21,6 +21,7 @@ from smartanthill_phc.c_node import VoidTypeDeclNode, IntTypeDeclNode
 from smartanthill_phc.common.visitor import visit_node, CodeVisitor
 from smartanthill_phc.parser import get_declarator_identifier
 from smartanthill_phc.root import NonBlockingData
+from smartanthill_phc.writer import get_dispatch_lines
 
 
 def rewrite_code(compiler, root, token_stream):
@@ -240,6 +241,50 @@ class _RewriteVisitor(CodeVisitor):
 
         self._w.insertAfterToken(node.ctx.stop, txt)
 
+    def visit_PapiWaitForStmtNode(self, node):
+
+        self.visit_childs(node)
+
+        self._w.deleteTokens(node.ctx.start, node.ctx.stop)
+
+        args0 = []
+        for each in node.refs_starts:
+            args = each.argument_list.get().arguments
+            assert args.get_size() >= 1
+            args0.append(self._get_text(args.at(0).get().ctx))
+
+        txt = u""
+        for i in range(len(args0)):
+            txt += u"\npapi_wait_handler_add_wait_for_%s(sa_wf, %s);" % (
+                node.txts_wait_for[i], args0[i])
+
+        nxt = str(node.int_next_state)
+        txt += u"\nsa_state->sa_next = %s;" % nxt
+
+        txt += self._format_result_return("PLUGIN_WAITING")
+
+        txt += u"\n\nlabel_%s:" % nxt
+
+        checks = [u"papi_wait_handler_is_waiting_for_%s(sa_wf, %s)" % (
+            node.txts_wait_for[i], args0[i]) for i in range(len(args0))]
+
+        if not node.bool_any:
+            txt += u"\nif(%s) {" % u" || ".join(checks)
+        else:
+            completed = self._get_text(node.completed.get().ctx)
+            for i in range(len(checks)):
+                txt += u"\n%sif(!%s) {\n*(%s) = %s;\n}" % (
+                    u"else " if i != 0 else u"", checks[i], completed, i)
+            txt += u"\nelse {"
+
+        txt += self._format_result_return("PLUGIN_WAITING")
+        txt += u"\n}\n"
+
+        if node.ctx.stop.line is not None:
+            txt += u"//#line %s\n" % node.ctx.stop.line
+
+        self._w.insertAfterToken(node.ctx.stop, txt)
+
     def visit_LoopStmtNode(self, node):
         self.visit_childs(node)
 
@@ -251,16 +296,10 @@ class _RewriteVisitor(CodeVisitor):
 
     def visit_StateMachineStmtNode(self, node):
 
-        txt = u"\n\nswitch(sa_state->sa_next) {"
-
-        txt += u"\ncase 0: break;"
-        for i in range(1, node.int_last_state + 1):
-
-            txt += u"\ncase %s: goto label_%s;" % (str(i), str(i))
-    #            visit_node(self, each.child_statement_list)
-
-        txt += u"\ndefault: ZEPTO_ASSERT(0);"
-        txt += u"\n}\n\n"
+        txt = u"\n"
+        for each in get_dispatch_lines(node.int_last_state):
+            txt += u"\n" + each
+        txt += u"\n\n"
 
         if node.ctx.line is not None:
             txt += u"\n//#line %s\n" % node.ctx.line
@@ -288,7 +327,8 @@ class _RewriteVisitor(CodeVisitor):
     def visit_BeforeSubStmtNode(self, node):
 
         nxt = str(node.int_next_state)
-        txt = u"\n*(uint8_t*)(sa_state + 1) = 0;"
+        txt = u"\n*(%s*)(sa_state + 1) = 0;" % self._nb.get_next_type(
+            node.ref_function_decl)
         txt += u"\nsa_state->sa_next = %s;" % nxt
         txt += u"\nlabel_%s: " % nxt
 
@@ -296,7 +336,8 @@ class _RewriteVisitor(CodeVisitor):
 
     def visit_AfterSubStmtNode(self, node):
 
-        txt = u"\nif(*(uint8_t*)(sa_state + 1) != 0) "
+        txt = u"\nif(*(%s*)(sa_state + 1) != 0) " % self._nb.get_next_type(
+            node.ref_function_decl)
 
         if self._sm.ref_state_machine.is_main_machine():
             txt += u"return *sa_result;"
@@ -314,7 +355,9 @@ class _RewriteVisitor(CodeVisitor):
         self._w.insertAfterToken(args.ctx.symbol, txt_args)
 
         nxt = str(node.int_next_state)
-        txt = u"\n*(uint8_t*)(sa_state + 1) = 0;"
+        next_type = self._nb.get_next_type(
+            node.expression.get().ref_declaration)
+        txt = u"\n*(%s*)(sa_state + 1) = 0;" % next_type
         txt += u"\nsa_state->sa_next = %s;" % nxt
         txt += u"\nlabel_%s: ;/*nop*/" % nxt
 
@@ -322,7 +365,7 @@ class _RewriteVisitor(CodeVisitor):
         txt += u"\n%s %s = %s;" % (t, node.txt_name,
                                    self._get_text(node.expression.get().ctx))
 
-        txt += u"\nif(*(uint8_t*)(sa_state + 1) != 0) "
+        txt += u"\nif(*(%s*)(sa_state + 1) != 0) " % next_type
 
         if self._sm.ref_state_machine.is_main_machine():
             txt += u"return *sa_result;"
@@ -333,7 +376,8 @@ class _RewriteVisitor(CodeVisitor):
 
     def visit_InitFirstStmtNode(self, node):
 
-        txt = u"\n*(uint8_t*)%s = 0;" % node.txt_arg1
+        txt = u"\n*(%s*)%s = 0;" % (self._nb.get_next_type(),
+                                    node.txt_arg1)
         self._w.insertAfterToken(node.ctx, txt)
 
     def visit_BeforeReturnStmtNode(self, node):
@@ -45,9 +45,19 @@ class PluginManifestNode(Node):
         super(PluginManifestNode, self).__init__()
         self.txt_prefix = None
         self.txt_include_guard = None
+        self.int_request_size = 0
+        self.int_reply_size = 0
         self.elements = ChildList(self, Node)
 
 
+# Types sa_next can have, with the last state each one holds, smaller first
+_NEXT_TYPES = [
+    ('uint8_t', 0xff),
+    ('uint16_t', 0xffff),
+    ('uint32_t', 0xffffffff),
+]
+
+
 class StateMachineData(object):
 
     '''
@@ -62,6 +72,13 @@ class StateMachineData(object):
         self.refs_moved_var_decls = None
         self.ref_state_machine = None
         self.txt_struct_name = None
+        self.narrowed_types = None
+        self.refs_narrowed_writes = set()
+        self.int_narrowed_bytes = 0
+        self.packed_bits = None
+        self.refs_packed_vars = []
+        self.refs_promoted_vars = []
+        self.refs_stored_vars = []
 
     def is_moved_var_decl(self, decl):
         '''
@@ -69,6 +86,45 @@ class StateMachineData(object):
         '''
         return decl in self.refs_moved_var_decls
 
+    def get_narrowed_type(self, decl):
+        '''
+        Returns the type name of a moved declaration at the state struct,
+        when it was narrowed, None otherwise
+        '''
+        if self.narrowed_types is None:
+            return None
+
+        return self.narrowed_types.get(decl)
+
+    def get_next_type(self):
+        '''
+        Returns the type name of sa_next, the smallest one holding
+        the last state of this state machine
+        '''
+        last = self.ref_state_machine.int_last_state
+        for name, most in _NEXT_TYPES:
+            if last <= most:
+                return name
+
+        assert False
+
+    def is_promoted_var(self, decl):
+        '''
+        Checks if a moved declaration is kept in a local while the
+        function runs
+        '''
+        return decl in self.refs_promoted_vars
+
+    def get_packed_bits(self, decl):
+        '''
+        Returns the bit field width of a moved declaration at the state
+        struct, when it was packed, None otherwise
+        '''
+        if self.packed_bits is None:
+            return None
+
+        return self.packed_bits.get(decl)
+
 
 class NonBlockingData(object):
 
@@ -111,6 +167,19 @@ class NonBlockingData(object):
 
         return None
 
+    def get_next_type(self, func_decl=None):
+        '''
+        Returns the type name of sa_next at the state struct of a
+        function, or of the main state machine when func_decl is None
+        '''
+        for each in self.functions_with_states:
+            if each.ref_function_decl == func_decl or\
+                    (func_decl is None and
+                     each.ref_state_machine.is_main_machine()):
+                return each.get_next_type()
+
+        return 'uint8_t'
+
     def has_states(self, func_decl):
         '''
         Returns true if function has states
@@ -0,0 +1,180 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.c_node import RefTypeNode, StructTypeDeclNode
+from smartanthill_phc.common.decl import FunctionDefinitionNode
+from smartanthill_phc.common.expr import MemberAccessExprNode,\
+    VariableExprNode
+from smartanthill_phc.common.stmt import VariableDeclarationStmtNode
+from smartanthill_phc.common.visitor import CodeVisitor, NodeWalker
+
+
+def split_structs(compiler, root):
+    '''
+    Replaces local struct variables, only accessed through their fields,
+    with one variable for each field used.
+    The struct variable is kept to initialize the field variables,
+    and is not used after them.
+    This way the state pass moves to the state struct only the fields
+    whose values are needed after a state change, and not the whole struct
+    '''
+    decls = root.source.get().declaration_list.get().declarations
+    for each in decls:
+        node = each.get()
+        if not isinstance(node, FunctionDefinitionNode):
+            continue
+
+        w = _StructUsesWalker()
+        w.walk_node(node.statement_list.get())
+
+        fields = {}
+        for decl, used in w.fields.items():
+            if decl not in w.whole and len(used) != 0:
+                fields[decl] = used
+
+        if len(fields) != 0:
+            v = _SplitVisitor(compiler, fields)
+            v.visit_stmt_list(node.statement_list.get())
+
+
+def _mangle(var_name, field_name):
+    '''
+    Returns the name used for a field variable,
+    'sa_' prefix is reserved so no user variable can collide with it
+    '''
+    return 'sa_%s_%s' % (var_name, field_name)
+
+
+class _StructUsesWalker(NodeWalker):
+
+    '''
+    Walker class that collects the fields used of each local struct
+    variable, and the variables used as a whole
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_StructUsesWalker, self).__init__()
+        self.fields = {}
+        self.whole = set()
+
+    def walk_node(self, node):
+
+        if isinstance(node, VariableDeclarationStmtNode) and\
+                isinstance(node.get_type(), StructTypeDeclNode) and\
+                not node.initializer_expression.is_none():
+            self.fields[node] = set()
+            self.walk_childs(node)
+
+        elif isinstance(node, MemberAccessExprNode) and\
+                not node.bool_arrow and\
+                isinstance(node.expression.get(), VariableExprNode) and\
+                node.expression.get().ref_declaration in self.fields:
+            d = node.expression.get().ref_declaration
+            self.fields[d].add(node.ref_declaration)
+
+        elif isinstance(node, VariableExprNode):
+            self.whole.add(node.ref_declaration)
+
+        else:
+            self.walk_childs(node)
+
+
+class _SplitVisitor(CodeVisitor):
+
+    '''
+    Visitor class that adds the field variables next to each struct
+    variable declaration, and replaces field accesses with them
+    '''
+
+    def __init__(self, compiler, fields):
+        '''
+        Constructor
+        '''
+        super(_SplitVisitor, self).__init__()
+        self._c = compiler
+        self._fields = fields
+        self._vars = {}
+
+    def default_visit(self, node):
+        '''
+        Default action when a node specific action is not found
+        '''
+        self.visit_childs(node)
+
+    def visit_StmtListNode(self, node):
+        self.visit_stmt_list(node)
+
+    def visit_VariableDeclarationStmtNode(self, node):
+
+        self.visit_childs(node)
+        if node not in self._fields:
+            return
+
+        for each in node.get_type().members:
+            att = each.get()
+            if att not in self._fields[node]:
+                continue
+
+            d = self._c.init_node(VariableDeclarationStmtNode(), node.ctx)
+            d.txt_name = _mangle(node.txt_name, att.txt_name)
+
+            t = self._c.init_node(RefTypeNode(), node.ctx)
+            t.set_type(att.get_type())
+            d.declaration_type.set(t)
+
+            d.initializer_expression.set(self._make_field_access(node, att))
+
+            d.begin_resolution()
+            d.set_type(t.get_type())
+
+            self._vars[(node, att)] = d
+            self.insert_after_current(d)
+
+    def visit_MemberAccessExprNode(self, node):
+
+        e = node.expression.get()
+        if isinstance(e, VariableExprNode) and\
+                (e.ref_declaration, node.ref_declaration) in self._vars:
+            d = self._vars[(e.ref_declaration, node.ref_declaration)]
+
+            v = self._c.init_node(VariableExprNode(), node.ctx)
+            v.txt_name = d.txt_name
+            v.ref_declaration = d
+            v.set_type(d.get_type())
+
+            old = self.replace_current_expression(v)
+            self._c.remove_nodes(old)
+        else:
+            self.visit_childs(node)
+
+    def _make_field_access(self, decl, att):
+        '''
+        Returns an expression reading field att of struct variable decl
+        '''
+        v = self._c.init_node(VariableExprNode(), decl.ctx)
+        v.txt_name = decl.txt_name
+        v.ref_declaration = decl
+        v.set_type(decl.get_type())
+
+        e = self._c.init_node(MemberAccessExprNode(), decl.ctx)
+        e.txt_name = att.txt_name
+        e.expression.set(v)
+        e.ref_declaration = att
+        e.set_type(att.get_type())
+
+        return e
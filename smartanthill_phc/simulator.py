@@ -0,0 +1,347 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+from smartanthill_phc.common.errors import InterpreterError
+from smartanthill_phc.interpreter import Interpreter, SimulatedPapi
+
+# Percentiles of response latency reported for each plugin
+PERCENTILES = [50, 90, 99]
+
+
+class PluginModel(object):
+
+    '''
+    A plugin taking part in a simulation, with its tree already processed
+    by create_states, and the cost of each (function name, state).
+    A request arrives every int_period, starting at int_offset, and is
+    run with sim as its simulated papi
+    '''
+
+    def __init__(self, name, root, costs, sim=None, period=1000, offset=0,
+                 priority=0):
+        '''
+        Constructor
+        '''
+        self.txt_name = name
+        self.root = root
+        self.costs = costs
+        self.sim = sim if sim is not None else SimulatedPapi()
+        self.int_period = period
+        self.int_offset = offset
+        self.int_priority = priority
+
+
+class FifoPolicy(object):
+
+    '''
+    Runs first the plugin that is ready since longer
+    '''
+
+    def choose(self, ready, now):
+        '''
+        Returns the plugin of ready list to run next at time now
+        '''
+        # pylint: disable=unused-argument
+        # pylint: disable=no-self-use
+        return min(ready, key=lambda x: (x.int_ready, x.int_index))
+
+
+class RoundRobinPolicy(object):
+
+    '''
+    Runs ready plugins in turn, in the order they are listed
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self._last = -1
+
+    def choose(self, ready, now):
+        '''
+        Returns the plugin of ready list to run next at time now
+        '''
+        # pylint: disable=unused-argument
+        after = [each for each in ready if each.int_index > self._last]
+        result = min(after if len(after) != 0 else ready,
+                     key=lambda x: x.int_index)
+        self._last = result.int_index
+        return result
+
+
+class PriorityPolicy(object):
+
+    '''
+    Runs first the plugin with lowest priority value, the one that is
+    ready since longer among equals
+    '''
+
+    def choose(self, ready, now):
+        '''
+        Returns the plugin of ready list to run next at time now
+        '''
+        # pylint: disable=unused-argument
+        # pylint: disable=no-self-use
+        return min(ready, key=lambda x: (x.model.int_priority, x.int_ready,
+                                         x.int_index))
+
+
+# Scheduling policies by name, any object with a choose method like theirs
+# can be given to simulate as well
+POLICIES = {
+    'fifo': FifoPolicy,
+    'round_robin': RoundRobinPolicy,
+    'priority': PriorityPolicy,
+}
+
+
+class PluginStats(object):
+
+    '''
+    Simulation results of a plugin.
+    Latency is the time from request arrival until the handler returns,
+    starved is the time the handler was ready to run, waiting for others
+    '''
+
+    def __init__(self, name):
+        '''
+        Constructor
+        '''
+        self.txt_name = name
+        self.int_requests = 0
+        self.int_entries = 0
+        self.latencies = []
+        self.int_starved = 0
+        self.int_max_starved = 0
+
+    def get_percentile(self, p):
+        '''
+        Returns the nearest rank percentile p of latencies, None when there
+        are none
+        '''
+        if len(self.latencies) == 0:
+            return None
+
+        values = sorted(self.latencies)
+        rank = max(0, (p * len(values) + 99) // 100 - 1)
+        return values[rank]
+
+
+class SimulationReport(object):
+
+    '''
+    Results of a simulation, PluginStats of each plugin, in the same
+    order, and busy time of each bus
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        self.int_time = 0
+        self.int_cpu = 0
+        self.plugins = []
+        self.buses = {}
+
+
+def simulate(models, duration, policy='fifo', cost_unit=1):
+    '''
+    Runs plugin models sharing one cooperative loop for duration time,
+    and returns a SimulationReport.
+    Each handler entry takes the cost of the state entered times cost_unit,
+    plus int_entry of the plugin simulated papi, and the handler is entered
+    again when the operation it waits for is completed, int_poll is not
+    used.
+    Blocking operations of the same bus, the part of their kind before
+    '_', are run one after the other. Requests arriving while the previous
+    one is still running are queued.
+    policy is a name at POLICIES or an object with a choose method
+    '''
+    if not hasattr(policy, 'choose'):
+        if policy not in POLICIES:
+            raise InterpreterError("Unknown policy '%s'" % policy)
+        policy = POLICIES[policy]()
+
+    report = SimulationReport()
+    buses = {}
+    plugins = []
+    for i, model in enumerate(models):
+        plugins.append(_Plugin(i, model, cost_unit, buses, report.buses))
+        report.plugins.append(plugins[-1].stats)
+
+    now = 0
+    while True:
+        for each in plugins:
+            each.arrive(now, duration)
+
+        ready = [each for each in plugins if each.int_ready is not None and
+                 each.int_ready <= now]
+        if len(ready) == 0:
+            times = [each.get_next_time(duration) for each in plugins]
+            times = [each for each in times if each is not None]
+            if len(times) == 0:
+                break
+            now = max(now, min(times))
+            continue
+
+        p = policy.choose(ready, now)
+        now = p.enter(now)
+        report.int_cpu += p.int_last_cost
+
+    report.int_time = max(now, duration)
+    return report
+
+
+def format_text(report):
+    '''
+    Returns the text report of a SimulationReport
+    '''
+    lines = ["time %d" % report.int_time,
+             "cpu %s" % _format_ratio(report.int_cpu, report.int_time)]
+
+    for bus in sorted(report.buses.keys()):
+        lines.append("bus %s %s" % (
+            bus, _format_ratio(report.buses[bus], report.int_time)))
+
+    lines.append("")
+    header = "%-24s %8s %8s" % ("plugin", "requests", "entries")
+    for p in PERCENTILES:
+        header += " %6s" % ("p%d" % p)
+    header += " %6s %8s %8s" % ("max", "starved", "max_stv")
+    lines.append(header)
+
+    for each in report.plugins:
+        line = "%-24s %8d %8d" % (each.txt_name, each.int_requests,
+                                  each.int_entries)
+        for p in PERCENTILES + [100]:
+            value = each.get_percentile(p)
+            line += " %6s" % (value if value is not None else '-')
+        line += " %8d %8d" % (each.int_starved, each.int_max_starved)
+        lines.append(line)
+
+    return '\n'.join(lines) + '\n'
+
+
+def _format_ratio(value, total):
+
+    if total == 0:
+        return "0.0%"
+
+    return "%.1f%%" % (100.0 * value / total)
+
+
+class _BusInterpreter(Interpreter):
+
+    '''
+    Interpreter where blocking operations wait for their bus to be free
+    '''
+
+    def __init__(self, root, sim, buses, busy):
+        '''
+        Constructor
+        '''
+        super(_BusInterpreter, self).__init__(root, sim)
+        self._buses = buses
+        self._busy = busy
+
+    def complete_at(self, kind, start, duration):
+
+        bus = kind.split('_')[0]
+        start = max(start, self._buses.get(bus, 0))
+        self._buses[bus] = start + duration
+        self._busy[bus] = self._busy.get(bus, 0) + duration
+        return start + duration
+
+
+class _Plugin(object):
+
+    '''
+    Simulation state of a plugin, int_ready is the time its handler can
+    be entered, None while it has no request to run
+    '''
+
+    def __init__(self, index, model, cost_unit, buses, busy):
+        '''
+        Constructor
+        '''
+        self.int_index = index
+        self.model = model
+        self._cost_unit = cost_unit
+        self.stats = PluginStats(model.txt_name)
+        self.int_ready = None
+        self.int_last_cost = 0
+        self._buses = buses
+        self._busy = busy
+        self._next_arrival = model.int_offset
+        self._queue = []
+        self._interp = None
+        self._state = None
+        self._arrival = None
+
+    def get_next_time(self, duration):
+        '''
+        Returns the next time something happens to this plugin, None when
+        nothing will
+        '''
+        times = [self.int_ready]
+        if self._next_arrival < duration:
+            times.append(self._next_arrival)
+
+        times = [each for each in times if each is not None]
+        return min(times) if len(times) != 0 else None
+
+    def arrive(self, now, duration):
+        '''
+        Queues requests arrived until now, and starts the first one when
+        idle
+        '''
+        while self._next_arrival <= now and self._next_arrival < duration:
+            self._queue.append(self._next_arrival)
+            self.stats.int_requests += 1
+            self._next_arrival += self.model.int_period
+
+        if self._interp is None and len(self._queue) != 0:
+            self._arrival = self._queue.pop(0)
+            self._interp = _BusInterpreter(self.model.root, self.model.sim,
+                                           self._buses, self._busy)
+            self._state = self._interp.start()
+            self.int_ready = max(self._arrival, now)
+
+    def enter(self, now):
+        '''
+        Enters the handler at time now, returns the time it leaves
+        '''
+        starved = now - self.int_ready
+        self.stats.int_starved += starved
+        self.stats.int_max_starved = max(self.stats.int_max_starved, starved)
+        self.stats.int_entries += 1
+
+        self.int_last_cost = self.model.sim.int_entry +\
+            self.model.costs.get(self._state, 0) * self._cost_unit
+        now += self.int_last_cost
+
+        self._interp.int_now = now
+        ev = self._interp.step()
+        if ev is None:
+            self.stats.latencies.append(now - self._arrival)
+            self._interp = None
+            self._state = None
+            self.int_ready = None
+        else:
+            self._state, until = ev
+            self.int_ready = until if until is not None else now
+
+        return now
@@ -0,0 +1,100 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import json
+
+from smartanthill_phc.manifest import get_encoded_size
+
+
+class FieldSize(object):
+
+    '''
+    Worst case encoded size of a request or reply field
+    '''
+
+    def __init__(self, message, name, field_type, size):
+        '''
+        Constructor
+        '''
+        self.txt_message = message
+        self.txt_name = name
+        self.txt_type = field_type
+        self.int_size = size
+
+    def to_dict(self):
+        '''
+        Returns a dictionary with this field size, used for json output
+        '''
+        return {
+            'name': self.txt_name,
+            'type': self.txt_type,
+            'size': self.int_size,
+        }
+
+
+def get_field_sizes(zepto_plugin):
+    '''
+    Returns the list of FieldSize of each request field, followed by
+    each reply field, in manifest order
+    '''
+    result = []
+    for message, fields in [('request', zepto_plugin.get_request_fields()),
+                            ('reply', zepto_plugin.get_response_fields())]:
+        for each in fields:
+            result.append(FieldSize(message, each['name'],
+                                    "".join(each['type'].split()),
+                                    get_encoded_size(each)))
+
+    return result
+
+
+def get_max_size(sizes, message):
+    '''
+    Returns the worst case size in bytes of message, 'request' or 'reply'
+    '''
+    return sum([each.int_size for each in sizes
+                if each.txt_message == message])
+
+
+def format_text(sizes):
+    '''
+    Returns the text report of a list of FieldSize
+    '''
+    lines = ["%-8s %-24s %-20s %4s" % ("message", "field", "type", "size")]
+    for each in sizes:
+        lines.append("%-8s %-24s %-20s %4d" % (
+            each.txt_message, each.txt_name, each.txt_type, each.int_size))
+
+    for message in ['request', 'reply']:
+        lines.append("%-8s %-24s %-20s %4d" % (
+            message, "<max size>", "", get_max_size(sizes, message)))
+
+    return '\n'.join(lines) + '\n'
+
+
+def format_json(sizes):
+    '''
+    Returns the json report of a list of FieldSize
+    '''
+    report = {}
+    for message in ['request', 'reply']:
+        report[message] = {
+            'max_size': get_max_size(sizes, message),
+            'fields': [each.to_dict() for each in sizes
+                       if each.txt_message == message],
+        }
+
+    return json.dumps(report, indent=2, sort_keys=True,
+                      separators=(',', ': ')) + '\n'
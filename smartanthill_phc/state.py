@@ -14,28 +14,78 @@
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 from smartanthill_phc.c_node import CastExprNode, IntTypeDeclNode,\
-    VoidTypeDeclNode
+    VoidTypeDeclNode, FunctionCallStmtNode, IntegerLiteralExprNode,\
+    RefTypeNode
 from smartanthill_phc.common.base import StatementNode, ExpressionNode,\
-    ArgumentListNode, Child, ChildExpr
+    ArgumentListNode, Child, ChildExpr, ChildExprOpt
+from smartanthill_phc.common.child import ChildList
 from smartanthill_phc.common.compiler import BuiltinCtx
 from smartanthill_phc.common.expr import VariableExprNode,\
     FunctionCallExprNode
+from smartanthill_phc.common.lookup import RootScope
 from smartanthill_phc.common.stmt import VariableDeclarationStmtNode
 from smartanthill_phc.common.visitor import visit_node, CodeVisitor,\
     NodeVisitor
+from smartanthill_phc.cost import get_cost_table, get_cost,\
+    get_iteration_cost, get_trip_count
+from smartanthill_phc.overlap import WaitAccess, can_overlap
 from smartanthill_phc.root import NonBlockingData
 
 
 STATE = BuiltinCtx('<state>')
 
 
-def create_states(compiler, root, prefix, split_all):
+_started_wait_for = {
+    "papi_start_sending_spi_command_16": "spi_send",
+    "papi_start_sending_spi_command_32": "spi_send",
+    "papi_start_sending_i2c_command_16": "i2c_send",
+    "papi_start_sending_i2c_command_32": "i2c_send",
+    "papi_start_receiving_spi_data_16": "spi_receive",
+    "papi_start_receiving_spi_data_32": "spi_receive",
+    "papi_start_receiving_i2c_data_16": "i2c_receive",
+    "papi_start_receiving_i2c_data_32": "i2c_receive"
+}
+
+
+def get_split_granularity(split):
+    '''
+    Returns (mode, count) for a split option.
+    Mode is one of 'none', 'statement', 'block', 'loop' or 'every', and
+    count is the number of statements between states for 'every'.
+    For backward compatibility False means 'none' and True 'statement',
+    any other integer means a state every that many statements
+    '''
+    if split is None or split is False or split == 'none':
+        return ('none', 0)
+    elif split is True or split == 'statement':
+        return ('statement', 1)
+    elif split in ('block', 'loop'):
+        return (split, 0)
+    elif isinstance(split, (int, long)) and split > 0:
+        return ('every', split)
+    else:
+        raise ValueError("Invalid split granularity '%s'" % split)
+
+
+def create_states(compiler, root, prefix, split, overlap_waits=False,
+                  overlap_sleeps=False, yield_budget=0, cost_table=None):
     '''
     Creates state machine and state related nodes
+    split sets where debug states are added, besides the ones needed by
+    blocking calls, see get_split_granularity.
+    When overlap_waits is True, adjacent independent blocking calls are
+    started together and share a single state. Sleeps are included only
+    when overlap_sleeps is also True.
+    When yield_budget is not zero, a 'PLUGIN_YIELD' state is added where
+    the estimated cost since last state goes over it, using cost_table
+    entries over the default cost table
     '''
     nb = root.get_scope(NonBlockingData)
     nb.set_prefix(prefix)
-    visitor = StateMachineVisitor(compiler, nb, split_all)
+    visitor = StateMachineVisitor(
+        compiler, nb, get_split_granularity(split), overlap_waits,
+        overlap_sleeps, yield_budget, get_cost_table(cost_table),
+        root.get_scope(RootScope))
     visit_node(visitor, root)
 
     compiler.check_stage('state')
@@ -119,6 +169,24 @@ class DebugStateStmtNode(StatementNode):
         self.int_next_state = None
 
 
+class YieldStateStmtNode(StatementNode):
+
+    '''
+    Statement node class representing state change to let other plugins
+    run, when ref_counter is not None, state change is done only once
+    every int_every times
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(YieldStateStmtNode, self).__init__()
+        self.int_next_state = None
+        self.int_every = 1
+        self.ref_counter = None
+
+
 class BeforeSubStmtNode(StatementNode):
 
     '''
@@ -131,6 +199,7 @@ class BeforeSubStmtNode(StatementNode):
         '''
         super(BeforeSubStmtNode, self).__init__()
         self.int_next_state = None
+        self.ref_function_decl = None
 
 
 class AfterSubStmtNode(StatementNode):
@@ -144,6 +213,7 @@ class AfterSubStmtNode(StatementNode):
         Constructor
         '''
         super(AfterSubStmtNode, self).__init__()
+        self.ref_function_decl = None
 
 
 class FunctionCallSubStmtNode(StatementNode):
@@ -238,6 +308,41 @@ class PapiSleepStmtNode(StatementNode):
         self.argument_list = Child(self, ArgumentListNode)
 
 
+class PapiWaitGroupStmtNode(StatementNode):
+
+    '''
+    Node class representing a group of blocking calls started together,
+    execution continues when all of them are completed
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(PapiWaitGroupStmtNode, self).__init__()
+        self.int_next_state = None
+        self.waits = ChildList(self, StatementNode)
+
+
+class PapiWaitForStmtNode(StatementNode):
+
+    '''
+    Node class representing a papi_wait_for_all or papi_wait_for_any call,
+    waiting for operations started by preceding papi_start_* calls
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(PapiWaitForStmtNode, self).__init__()
+        self.int_next_state = None
+        self.bool_any = False
+        self.refs_starts = []
+        self.txts_wait_for = []
+        self.completed = ChildExprOpt(self)
+
+
 class LoopsHelper(object):
     '''
     Helper class to detect which variables are accessed inside loops
@@ -325,6 +430,13 @@ class DeclsHelper(object):
         # Still may need to be moved because of loops
         self._loops.add_var_ref(e.ref_declaration)
 
+    def add_moved_var_decl(self, decl):
+        '''
+        Adds a variable declaration that must always be moved
+        '''
+        assert decl not in self._to_be_moved
+        self._to_be_moved.append(decl)
+
     def begin_loop(self, st):
         '''
         A loop begins, put a mark with state number
@@ -407,6 +519,8 @@ def _skip_statements(stmt_list):
 
         if not isinstance(s, VariableDeclarationStmtNode):
             return i
+        if s.bool_recomputed:
+            continue
         if not isinstance(s.initializer_expression.get(), CastExprNode):
             return i
         if not isinstance(s.initializer_expression.get().expression.get(),
@@ -418,14 +532,30 @@ def _skip_statements(stmt_list):
 
 class StateMachineVisitor(NodeVisitor):
 
-    def __init__(self, compiler, nb, split_all):
+    def __init__(self, compiler, nb, split, overlap_waits=False,
+                 overlap_sleeps=False, yield_budget=0, cost_table=None,
+                 scope=None):
         '''
         Constructor
         '''
         super(StateMachineVisitor, self).__init__()
         self._c = compiler
         self._nb = nb
-        self._split_all = split_all
+        self._split = split
+        self._overlap_waits = overlap_waits
+        self._overlap_sleeps = overlap_sleeps
+        self._yield_budget = yield_budget
+        self._cost_table = cost_table
+        self._scope = scope
+
+    def _make_statements_visitor(self):
+        '''
+        Returns a new visitor for function statements
+        '''
+        return _StatementsVisitor(self._c, self._nb, self._split,
+                                  self._overlap_waits, self._overlap_sleeps,
+                                  self._yield_budget, self._cost_table,
+                                  self._scope)
 
     def default_visit(self, node):
         '''
@@ -495,7 +625,7 @@ class StateMachineVisitor(NodeVisitor):
         else:
             ctx = stmt_list.statements.at(i - 1).get().ctx.stop
 
-        v = _StatementsVisitor(self._c, self._nb, self._split_all)
+        v = self._make_statements_visitor()
         v.visit_stmt_list(stmt_list, i)
 
         if v.has_states():
@@ -539,7 +669,7 @@ class StateMachineVisitor(NodeVisitor):
         else:
             ctx = stmt_list.statements.at(i - 1).get().ctx.stop
 
-        v = _StatementsVisitor(self._c, self._nb, self._split_all)
+        v = self._make_statements_visitor()
         v.visit_stmt_list(stmt_list, i)
 
         if v.has_states():
@@ -576,16 +706,28 @@ class _StatementsVisitor(CodeVisitor):
     segments
     '''
 
-    def __init__(self, compiler, nb, split_all):
+    def __init__(self, compiler, nb, split, overlap_waits=False,
+                 overlap_sleeps=False, yield_budget=0, cost_table=None,
+                 scope=None):
         '''
         Constructor
         '''
+        # pylint: disable=too-many-arguments
         super(_StatementsVisitor, self).__init__()
         self._c = compiler
         self._sc = _StateCountHelper()
         self._nb = nb
         self._h = DeclsHelper()
-        self._split_all = split_all
+        self._split_mode, self._split_count = split
+        self._split_left = self._split_count
+        self._split_state = 0
+        self._yield_budget = yield_budget
+        self._cost_table = cost_table
+        self._scope = scope
+        self._cost = 0
+        self._cost_state = 0
+        self._overlap_waits = overlap_waits
+        self._overlap_sleeps = overlap_sleeps
 
     def get_moved_vars(self):
         return self._h.get_decls_to_be_moved()
@@ -604,15 +746,126 @@ class _StatementsVisitor(CodeVisitor):
         nxt.int_next_state = self._sc.increment_state()
         self.insert_after_current(nxt)
 
-    def _substates_around_current(self, ctx):
+    def _split_after_current(self, ctx):
+        '''
+        Adds 'PLUGIN_DEBUG' state change after current simple statement,
+        when split granularity asks for it
+        '''
+        if self._split_mode in ('statement', 'every'):
+            if self._split_state != self._sc.get_last_state():
+                # a state was added since we started counting
+                self._split_left = self._split_count
+                self._split_state = self._sc.get_last_state()
+
+            self._split_left -= 1
+            if self._split_left == 0:
+                self._split_left = self._split_count
+                self._debug_after_current(ctx)
+                self._split_state = self._sc.get_last_state()
+
+    def _budget_before_current(self, node, cost=None):
+        '''
+        Adds 'PLUGIN_YIELD' state change before current statement, when
+        its cost added to the cost since last state goes over budget
+        '''
+        if self._yield_budget <= 0:
+            return
+
+        if self._cost_state != self._sc.get_last_state():
+            # a state was added since we started counting
+            self._cost = 0
+            self._cost_state = self._sc.get_last_state()
+
+        if cost is None:
+            cost = get_cost(node, self._cost_table)
+        if self._cost != 0 and self._cost + cost > self._yield_budget:
+            y = self._c.init_node(YieldStateStmtNode(), node.ctx)
+            y.int_next_state = self._sc.increment_state()
+            self.insert_before_current(y)
+
+            self._cost = 0
+            self._cost_state = self._sc.get_last_state()
+
+        self._cost += cost
+
+    def _budget_loop(self, node):
+        '''
+        Adds 'PLUGIN_YIELD' state change at the end of a loop body without
+        states, once every as many iterations as fit in the budget.
+        The iteration counter is a new variable, always moved to the state
+        '''
+        cost = get_iteration_cost(node, self._cost_table)
+        every = max(1, self._yield_budget / max(1, cost))
+
+        y = self._c.init_node(YieldStateStmtNode(), node.ctx)
+        y.int_next_state = self._sc.increment_state()
+        y.int_every = every
+
+        if every > 1:
+            d = self._c.init_node(VariableDeclarationStmtNode(), node.ctx)
+            d.txt_name = "sa_yield_%s" % y.int_next_state
+
+            t = self._c.init_node(RefTypeNode(), node.ctx)
+            t.set_type(self._scope.types.lookup(
+                "uint8_t" if every <= 0xff else "uint16_t"))
+            d.declaration_type.set(t)
+
+            e = self._c.init_node(IntegerLiteralExprNode(), node.ctx)
+            e.txt_literal = "0"
+            d.initializer_expression.set(e)
+
+            d.begin_resolution()
+            d.set_type(t.get_type())
+
+            self.insert_before_current(d)
+            self._h.add_moved_var_decl(d)
+            y.ref_counter = d
+
+        node.statement_list.get().statements.add(y)
+
+        self._cost = every * cost
+        self._cost_state = self._sc.get_last_state()
+
+    def _get_previous_statement(self):
+        '''
+        Returns the statement before current one, None if current is first
+        '''
+        if self._index[-1] == 0:
+            return None
+
+        return self._stmt_list[-1].statements.at(self._index[-1] - 1).get()
+
+    def _split_end_of_block(self, stmt_list):
+        '''
+        Adds 'PLUGIN_DEBUG' state change at the end of stmt_list,
+        unless it is empty, never reaches its end, or already ends
+        with a state change
+        '''
+        stmts = stmt_list.statements
+        if stmts.get_size() == 0 or stmt_list.is_closed_stmt():
+            return
+
+        last = stmts.at(stmts.get_size() - 1).get()
+        if isinstance(last, (DebugStateStmtNode, YieldStateStmtNode,
+                             PapiWaitStmtNode, PapiSleepStmtNode,
+                             PapiWaitGroupStmtNode, PapiWaitForStmtNode)):
+            return
+
+        nxt = self._c.init_node(DebugStateStmtNode(), last.ctx)
+        nxt.int_next_state = self._sc.increment_state()
+        stmts.add(nxt)
+
+    def _substates_around_current(self, ctx, func_decl):
         '''
         Adds before and after statements for sub states function calls
         '''
         bef = self._c.init_node(BeforeSubStmtNode(), ctx)
         bef.int_next_state = self._sc.increment_state()
+        bef.ref_function_decl = func_decl
         self.insert_before_current(bef)
 
         aft = self._c.init_node(AfterSubStmtNode(), ctx)
+        aft.ref_function_decl = func_decl
         self.insert_after_current(aft)
 
     def visit_StmtListNode(self, node):
@@ -624,6 +877,7 @@ class _StatementsVisitor(CodeVisitor):
 
     def visit_VariableDeclarationStmtNode(self, node):
 
+        self._budget_before_current(node)
         self._h.add_var_decl(node, self._sc.get_last_state())
 
         if not node.initializer_expression.is_none() and\
@@ -639,19 +893,19 @@ class _StatementsVisitor(CodeVisitor):
                     StatefullCallArgumentExprNode(), init_expr.ctx)
                 init_expr.argument_list.get().arguments.insert_at(0, a)
 
-                self._substates_around_current(node.ctx)
+                self._substates_around_current(
+                    node.ctx, init_expr.ref_declaration)
                 return
 
         self.visit_childs(node)
 
-        if self._split_all:
-            self._debug_after_current(node.ctx)
+        self._split_after_current(node.ctx)
 
     def visit_ExpressionStmtNode(self, node):
+        self._budget_before_current(node)
         self.visit_childs(node)
 
-        if self._split_all:
-            self._debug_after_current(node.ctx)
+        self._split_after_current(node.ctx)
 
     def visit_FunctionCallStmtNode(self, node):
 
@@ -661,50 +915,192 @@ class _StatementsVisitor(CodeVisitor):
             a = self._c.init_node(
                 StatefullCallArgumentExprNode(), node.expression.get().ctx)
             node.expression.get().argument_list.get().arguments.insert_at(0, a)
-            self._substates_around_current(node.ctx)
+            self._substates_around_current(
+                node.ctx, node.expression.get().ref_declaration)
+
+        elif node.expression.get().txt_name in ("papi_wait_for_all",
+                                                "papi_wait_for_any"):
+            s = self._make_wait_for_stmt(node)
+            s.int_next_state = self._sc.increment_state()
+
+            self._visit_after_wait(s)
+
+            old = self.replace_current_statement(s)
+            self._c.remove_nodes(old)
 
         elif node.expression.get().bool_is_blocking:
-            d = node.expression.get().ref_declaration
-            n = d.txt_name
-            if n == "papi_sleep":
-                s = self._c.init_node(PapiSleepStmtNode(), node.ctx)
+            group = self._get_overlapped_calls(node)
+            if len(group) == 1:
+                s = self._make_blocking_stmt(node)
+                s.int_next_state = self._sc.increment_state()
             else:
-                if n == "papi_wait_for_spi_send":
-                    f = u"papi_start_sending_spi_command_16"
-                    w = u"spi_send"
-                elif n == "papi_wait_for_i2c_send":
-                    f = u"papi_start_sending_i2c_command_16"
-                    w = u"i2c_send"
-                elif n == "papi_wait_for_spi_receive":
-                    f = u"papi_start_receiving_spi_data_16"
-                    w = u"spi_receive"
-                elif n == "papi_wait_for_i2c_receive":
-                    f = u"papi_start_receiving_i2c_data_16"
-                    w = u"i2c_receive"
-                else:
-                    assert False
-
-                s = self._c.init_node(PapiWaitStmtNode(), node.ctx)
-                s.txt_name = f
-                s.txt_wait_for = w
-                s.ctx_function_name = node.expression.get().ctx.\
-                    unaryExpression().Identifier()
-
-            s.argument_list.set(node.expression.get().argument_list.clear())
-            s.int_next_state = self._sc.increment_state()
+                s = self._c.init_node(PapiWaitGroupStmtNode(), node.ctx)
+                for each in group:
+                    s.waits.add(self._make_blocking_stmt(each))
+                    if each != node:
+                        self._c.remove_nodes(each)
+                s.int_next_state = self._sc.increment_state()
+
+            self._visit_after_wait(s)
 
             old = self.replace_current_statement(s)
             self._c.remove_nodes(old)
 
-        elif self._split_all:
-            self._debug_after_current(node.ctx)
+        else:
+            self._budget_before_current(node)
+            self._split_after_current(node.ctx)
+
+    def _make_blocking_stmt(self, node):
+        '''
+        Returns the papi wait or sleep statement node,
+        replacing blocking function call statement node
+        '''
+        d = node.expression.get().ref_declaration
+        n = d.txt_name
+        if n == "papi_sleep":
+            s = self._c.init_node(PapiSleepStmtNode(), node.ctx)
+        else:
+            if n == "papi_wait_for_spi_send":
+                f = u"papi_start_sending_spi_command_16"
+                w = u"spi_send"
+            elif n == "papi_wait_for_i2c_send":
+                f = u"papi_start_sending_i2c_command_16"
+                w = u"i2c_send"
+            elif n == "papi_wait_for_spi_receive":
+                f = u"papi_start_receiving_spi_data_16"
+                w = u"spi_receive"
+            elif n == "papi_wait_for_i2c_receive":
+                f = u"papi_start_receiving_i2c_data_16"
+                w = u"i2c_receive"
+            else:
+                assert False
+
+            s = self._c.init_node(PapiWaitStmtNode(), node.ctx)
+            s.txt_name = f
+            s.txt_wait_for = w
+            s.ctx_function_name = node.expression.get().ctx.\
+                unaryExpression().Identifier()
+
+        s.argument_list.set(node.expression.get().argument_list.clear())
+
+        return s
+
+    def _make_wait_for_stmt(self, node):
+        '''
+        Returns the papi wait for all or any statement node,
+        waits are the contiguous papi_start_* calls preceding node
+        '''
+        s = self._c.init_node(PapiWaitForStmtNode(), node.ctx)
+        s.bool_any = node.expression.get().txt_name == "papi_wait_for_any"
+
+        stmts = self._stmt_list[-1].statements
+        i = self._index[-1] - 1
+        while i >= 0:
+            p = stmts.at(i).get()
+            i -= 1
+            if isinstance(p, DebugStateStmtNode):
+                continue
+            if not isinstance(p, FunctionCallStmtNode) or\
+                    p.expression.get().txt_name not in _started_wait_for:
+                break
+
+            s.refs_starts.insert(0, p.expression.get())
+            s.txts_wait_for.insert(
+                0, _started_wait_for[p.expression.get().txt_name])
+
+        if len(s.refs_starts) == 0:
+            self._c.report_error(
+                node.ctx, "'%s' must follow papi_start_* calls" %
+                node.expression.get().txt_name)
+
+        if s.bool_any:
+            args = node.expression.get().argument_list.get().arguments
+            s.completed.set(args.remove_at(0))
+
+        return s
+
+    def _get_overlapped_calls(self, node):
+        '''
+        Returns the list of blocking call statements, starting with node,
+        that can be started together.
+        Following statements in the list are removed from current
+        statement list
+        '''
+        group = [node]
+        if not self._overlap_waits:
+            return group
+
+        accesses = [WaitAccess(node.expression.get())]
+        stmts = self._stmt_list[-1].statements
+        i = self._index[-1] + 1
+        while i < stmts.get_size():
+            s = stmts.at(i).get()
+            if not isinstance(s, FunctionCallStmtNode) or\
+                    not s.expression.get().bool_is_blocking or\
+                    s.expression.get().txt_name in ("papi_wait_for_all",
+                                                    "papi_wait_for_any"):
+                break
+
+            a = WaitAccess(s.expression.get())
+            if not can_overlap(accesses, a, self._overlap_sleeps):
+                break
+
+            accesses.append(a)
+            group.append(s)
+            i += 1
+
+        for each in group[1:]:
+            stmts.remove_at(self._index[-1] + 1)
+            self.visit(each.expression.get().argument_list)
+
+        return group
+
+    def _visit_after_wait(self, node):
+        '''
+        First argument of each wait is used again after the wait,
+        when checking if it completed
+        '''
+        if isinstance(node, PapiWaitStmtNode):
+            self.visit(node.argument_list.get().arguments.at(0))
+        elif isinstance(node, PapiWaitGroupStmtNode):
+            for each in node.waits:
+                self._visit_after_wait(each.get())
+        elif isinstance(node, PapiWaitForStmtNode):
+            for each in node.refs_starts:
+                self.visit(each.argument_list.get().arguments.at(0))
+            self.visit(node.completed)
 
     def visit_LoopStmtNode(self, node):
 
-        self._h.begin_loop(self._sc.get_last_state())
+        budget = self._yield_budget
+        if budget > 0:
+            count = get_trip_count(node, self._get_previous_statement())
+            if count is not None:
+                cost = self._cost_table['<statement>'] + count *\
+                    get_iteration_cost(node, self._cost_table)
+                if cost <= budget:
+                    # whole loop fits in budget, nothing to do inside
+                    self._budget_before_current(node, cost)
+                    self._yield_budget = 0
+
+        st = self._sc.get_last_state()
+
+        self._h.begin_loop(st)
         self.visit_childs(node)
+        if self._split_mode in ('block', 'loop'):
+            self._split_end_of_block(node.statement_list.get())
+
+        if self._yield_budget > 0 and st == self._sc.get_last_state() and\
+                not node.statement_list.get().is_closed_stmt():
+            self._budget_loop(node)
+
+        self._yield_budget = budget
+
         self._h.end_loop(self._sc.get_last_state())
 
+        if self._split_mode == 'block' and not node.is_closed_stmt():
+            self._debug_after_current(node.ctx)
+
     def visit_ReturnStmtNode(self, node):
         self.visit_childs(node)
 
@@ -720,6 +1116,9 @@ class _StatementsVisitor(CodeVisitor):
     def visit_IfElseStmtNode(self, node):
         self.visit_childs(node)
 
+        if self._split_mode == 'block' and not node.is_closed_stmt():
+            self._debug_after_current(node.ctx)
+
     def visit_TypeNode(self, node):
         pass
 
@@ -0,0 +1,221 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import json
+import struct
+
+from smartanthill_phc.cost_report import get_state_costs
+from smartanthill_phc.root import NonBlockingData
+
+# Trace buffer records, as written by SA_TRACE_* macros of the runtime.
+# Each record is 8 bytes, little endian, uint32 time, uint16 state or
+# callee state machine index, uint8 state machine index, and uint8 event,
+# with the returned result in the high nibble for 'yield'
+RECORD = struct.Struct('<IHBB')
+
+EVENT_STATE_ENTER = 1
+EVENT_YIELD = 2
+EVENT_SUB_ENTER = 3
+EVENT_SUB_EXIT = 4
+EVENT_RETURN = 5
+
+# Handler results as defined at papi.h
+RESULTS = {
+    1: 'PLUGIN_WAITING',
+    2: 'PLUGIN_DEBUG',
+    3: 'PLUGIN_YIELD',
+}
+
+
+def get_state_map(root, prefix, table):
+    '''
+    Returns the state map of a tree processed by create_states, used to
+    decode trace buffers. It has the index, as used by trace macros, and
+    the function name of each state machine, and the source line and
+    estimated cost of each state, as computed with table
+    '''
+    nb = root.get_scope(NonBlockingData)
+
+    machines = []
+    for i, each in enumerate(nb.functions_with_states):
+        machines.append({
+            'index': i,
+            'function': each.ref_function_decl.txt_name,
+            'main': each.ref_state_machine.is_main_machine()})
+
+    states = []
+    for each in get_state_costs(root, table):
+        d = each.to_dict()
+        states.append({'function': d['function'], 'state': d['state'],
+                       'line': d['line'], 'cost': d['cost']})
+
+    return {'prefix': prefix, 'machines': machines, 'states': states}
+
+
+def format_state_map(state_map):
+    '''
+    Returns the json text of a state map
+    '''
+    return json.dumps(state_map, indent=2, sort_keys=True,
+                      separators=(',', ': ')) + '\n'
+
+
+class StateTrace(object):
+
+    '''
+    Decoded trace of a state, times it was entered, the time taken by each
+    entry, including sub state machines called, as a histogram of power of
+    two buckets, the results returned when leaving it, and the times each
+    sub state machine was entered and exited from it
+    '''
+
+    def __init__(self, function, state, line):
+        '''
+        Constructor
+        '''
+        self.txt_function = function
+        self.int_state = state
+        self.int_line = line
+        self.int_entries = 0
+        self.int_total = 0
+        self.int_max = 0
+        self.histogram = {}
+        self.results = {}
+        self.subs = {}
+
+    def add_time(self, value):
+        '''
+        Adds the time taken by an entry
+        '''
+        self.int_total += value
+        self.int_max = max(self.int_max, value)
+        bucket = value.bit_length()
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+
+def decode(data, state_map):
+    '''
+    Decodes a trace buffer, and returns the list of StateTrace of each
+    state entered, sorted by state machine and state.
+    Entries of a state last until the handler yields or returns, so time
+    of states calling sub state machines includes the time of them
+    '''
+    machines = dict((each['index'], each['function'])
+                    for each in state_map['machines'])
+    main = [each['index'] for each in state_map['machines'] if each['main']]
+    lines = dict(((each['function'], each['state']), each['line'])
+                 for each in state_map['states'])
+
+    states = {}
+    open_entries = {}
+
+    def get(machine, state):
+        function = machines.get(machine, str(machine))
+        key = (function, state)
+        if key not in states:
+            states[key] = StateTrace(function, state, lines.get(key))
+        return states[key]
+
+    def close(machine_list, time):
+        for m in machine_list:
+            st, start = open_entries.pop(m)
+            st.add_time(time - start)
+
+    for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+        time, value, machine, event = RECORD.unpack_from(data, offset)
+        result = event >> 4
+        event = event & 0xf
+
+        if event == EVENT_STATE_ENTER:
+            if machine in open_entries:
+                close([machine], time)
+            st = get(machine, value)
+            st.int_entries += 1
+            open_entries[machine] = (st, time)
+
+        elif event == EVENT_YIELD:
+            if machine in open_entries:
+                st = open_entries[machine][0]
+                name = RESULTS.get(result, str(result))
+                st.results[name] = st.results.get(name, 0) + 1
+            close(list(open_entries.keys()), time)
+
+        elif event in (EVENT_SUB_ENTER, EVENT_SUB_EXIT):
+            if machine in open_entries:
+                st = open_entries[machine][0]
+                name = machines.get(value, str(value))
+                counts = st.subs.setdefault(name, [0, 0])
+                counts[0 if event == EVENT_SUB_ENTER else 1] += 1
+
+        elif event == EVENT_RETURN:
+            if machine in main:
+                close(list(open_entries.keys()), time)
+            elif machine in open_entries:
+                close([machine], time)
+
+    return [states[k] for k in sorted(states.keys())]
+
+
+def format_text(traces):
+    '''
+    Returns the text report of a list of StateTrace
+    '''
+    lines = ["%-32s %5s %5s %7s %7s %7s" % (
+        "function", "state", "line", "entries", "total", "max")]
+    for each in traces:
+        lines.append("%-32s %5d %5s %7d %7d %7d" % (
+            each.txt_function, each.int_state,
+            each.int_line if each.int_line is not None else '-',
+            each.int_entries, each.int_total, each.int_max))
+
+        if len(each.histogram) != 0:
+            lines.append("    time: " + ", ".join(
+                "%s:%d" % (_bucket_name(k), each.histogram[k])
+                for k in sorted(each.histogram.keys())))
+        if len(each.results) != 0:
+            lines.append("    left: " + ", ".join(
+                "%s:%d" % (k, each.results[k])
+                for k in sorted(each.results.keys())))
+        for k in sorted(each.subs.keys()):
+            lines.append("    sub %s: entered %d, exited %d" % (
+                k, each.subs[k][0], each.subs[k][1]))
+
+    return '\n'.join(lines) + '\n'
+
+
+def format_profile(traces):
+    '''
+    Returns the json profile of a list of StateTrace, a map of function
+    name to a map of state number to times it was entered
+    '''
+    profile = {}
+    for each in traces:
+        counts = profile.setdefault(each.txt_function, {})
+        counts[str(each.int_state)] = each.int_entries
+
+    return json.dumps(profile, indent=2, sort_keys=True,
+                      separators=(',', ': ')) + '\n'
+
+
+def _bucket_name(bucket):
+    '''
+    Returns the range of times of a histogram bucket
+    '''
+    if bucket == 0:
+        return "0"
+
+    lo = 1 << (bucket - 1)
+    hi = (1 << bucket) - 1
+    return str(lo) if lo == hi else "%d-%d" % (lo, hi)
@@ -16,18 +16,192 @@
 from antlr4.ParserRuleContext import ParserRuleContext
 from antlr4.tree.Tree import TerminalNodeImpl
 
-from smartanthill_phc import banner
+from smartanthill_phc import banner, state
 from smartanthill_phc.c_node import VoidTypeDeclNode, IntTypeDeclNode
 from smartanthill_phc.common import antlr_helper, decl
-from smartanthill_phc.common.visitor import visit_node, NodeVisitor
+from smartanthill_phc.common.expr import FunctionCallExprNode,\
+    TrivialCastExprNode
+from smartanthill_phc.common.visitor import visit_node, NodeVisitor,\
+    NodeWalker
+from smartanthill_phc.manifest import ComposerStmtNode, ParserStmtNode
 from smartanthill_phc.root import NonBlockingData
 
-
-def write_code(compiler, root, source_file):
+# State machines with more states use a switch for each group of states
+_GROUP_DISPATCH_STATES = 1024
+
+# States at each group, dispatched on the low byte of sa_next
+_GROUP_SIZE = 0x100
+
+
+# States run less than this fraction of the function entries are cold
+_COLD_RATIO = 100
+
+# States resumed at least this fraction of times are checked before switch
+_HOT_RATIO = 4
+
+# Most states checked before switch
+_HOT_CHECKS = 2
+
+# Cold attributes, gcc also supports them at labels
+_COLD_MACROS = [
+    "#if !defined SA_COLD",
+    "#if defined __GNUC__",
+    "#define SA_COLD __attribute__((cold))",
+    "#else",
+    "#define SA_COLD",
+    "#endif",
+    "#endif",
+    "#if !defined SA_COLD_LABEL",
+    "#if defined __GNUC__ && !defined __clang__",
+    "#define SA_COLD_LABEL __attribute__((cold))",
+    "#else",
+    "#define SA_COLD_LABEL",
+    "#endif",
+    "#endif",
+]
+
+# Helpers shared by many waits are cheaper when never inlined
+_NOINLINE_MACROS = [
+    "#if !defined SA_NOINLINE",
+    "#if defined __GNUC__",
+    "#define SA_NOINLINE __attribute__((noinline))",
+    "#else",
+    "#define SA_NOINLINE",
+    "#endif",
+    "#endif",
+]
+
+# Trace macros, empty unless defined before including the state header
+_TRACE_MACROS = [
+    "#if !defined SA_TRACE_STATE_ENTER",
+    "#define SA_TRACE_STATE_ENTER(plugin, machine, state)",
+    "#define SA_TRACE_YIELD(plugin, machine, state, reason)",
+    "#define SA_TRACE_SUB_ENTER(plugin, machine, callee)",
+    "#define SA_TRACE_SUB_EXIT(plugin, machine, callee)",
+    "#define SA_TRACE_RETURN(plugin, machine)",
+    "#endif",
+]
+
+# Bytes addressed by field table offsets
+_MAX_FIELDS_BYTES = 0x100
+
+# Field encodings of request and reply field tables, by type name
+_FIELD_ENCODINGS = {
+    'uint8_t': 'SA_FIELD_BYTE',
+    'uint16_t': 'SA_FIELD_ENCODED_UINT16',
+    'int16_t': 'SA_FIELD_ENCODED_SIGNED_INT16',
+}
+
+# Field descriptor type, shared by all field tables of a translation unit
+_FIELD_TABLE_LINES = [
+    "#include <stddef.h>",
+    "",
+    "#if !defined __SA_FIELD_TABLE__",
+    "#define __SA_FIELD_TABLE__",
+    "",
+    "#define SA_FIELD_BYTE 0",
+    "#define SA_FIELD_ENCODED_UINT16 1",
+    "#define SA_FIELD_ENCODED_SIGNED_INT16 2",
+    "",
+    "typedef struct _sa_field",
+    "{",
+    "uint8_t offset;",
+    "uint8_t encoding;",
+    "} sa_field;",
+    "",
+    "#endif // __SA_FIELD_TABLE__",
+    "",
+]
+
+# Loop parsing a request with a field table, shared by all parsers of a
+# translation unit
+_FIELD_PARSER_LINES = [
+    "#if !defined __SA_FIELD_PARSER__",
+    "#define __SA_FIELD_PARSER__",
+    "static void sa_parser_read_fields(ZEPTO_PARSER* sa_po, void* sa_data, "
+    "const sa_field* sa_fields, uint8_t sa_count)",
+    "{",
+    "uint8_t sa_i;",
+    "for(sa_i = 0; sa_i != sa_count; ++sa_i) {",
+    "uint8_t* sa_p = (uint8_t*)sa_data + sa_fields[sa_i].offset;",
+    "switch(sa_fields[sa_i].encoding) {",
+    "case SA_FIELD_BYTE: *sa_p = papi_parser_read_byte(sa_po); break;",
+    "case SA_FIELD_ENCODED_UINT16: *(uint16_t*)sa_p = "
+    "papi_parser_read_encoded_uint16(sa_po); break;",
+    "default: *(int16_t*)sa_p = "
+    "papi_parser_read_encoded_signed_int16(sa_po); break;",
+    "}",
+    "}",
+    "}",
+    "#endif // __SA_FIELD_PARSER__",
+]
+
+# Loop composing a reply with a field table, shared by all composers of a
+# translation unit
+_FIELD_COMPOSER_LINES = [
+    "#if !defined __SA_FIELD_COMPOSER__",
+    "#define __SA_FIELD_COMPOSER__",
+    "static void sa_reply_write_fields(REPLY_HANDLE sa_rh, "
+    "const void* sa_data, const sa_field* sa_fields, uint8_t sa_count)",
+    "{",
+    "uint8_t sa_i;",
+    "for(sa_i = 0; sa_i != sa_count; ++sa_i) {",
+    "const uint8_t* sa_p = (const uint8_t*)sa_data + "
+    "sa_fields[sa_i].offset;",
+    "switch(sa_fields[sa_i].encoding) {",
+    "case SA_FIELD_BYTE: papi_reply_write_byte(sa_rh, *sa_p); break;",
+    "case SA_FIELD_ENCODED_UINT16: papi_reply_write_encoded_uint16(sa_rh, "
+    "*(const uint16_t*)sa_p); break;",
+    "default: papi_reply_write_encoded_signed_int16(sa_rh, "
+    "*(const int16_t*)sa_p); break;",
+    "}",
+    "}",
+    "}",
+    "#endif // __SA_FIELD_COMPOSER__",
+]
+
+# Arguments of papi_start_* call of each kind of wait, the first one is
+# also the id given to the wait handler
+_SEND_ARGS = [("uint8_t", "sa_id"), ("uint16_t", "sa_addr"),
+              ("uint8_t", "sa_addr_sz"), ("uint16_t", "sa_command"),
+              ("uint8_t", "sa_command_sz")]
+_RECEIVE_ARGS = [("uint8_t", "sa_id"), ("uint16_t", "sa_addr"),
+                 ("uint8_t", "sa_addr_sz"), ("uint16_t*", "sa_data")]
+_WAIT_ARGS = {
+    'spi_send': _SEND_ARGS,
+    'i2c_send': _SEND_ARGS,
+    'spi_receive': _RECEIVE_ARGS,
+    'i2c_receive': _RECEIVE_ARGS,
+}
+
+
+def write_code(compiler, root, source_file, computed_goto=False,
+               trace=False, profile=None, fast_polls=0, parse_in_place=False,
+               outline_waits=0):
     '''
     Writes code tree
+    When computed_goto is True, state dispatch uses a table of label
+    addresses on compilers supporting it, with switch as fallback.
+    When trace is True, SA_TRACE_* macros are called at each state entry,
+    yield, return, and sub state machine entry and exit.
+    profile maps function names to the times each state was run, see
+    get_profile_counts, and is used to dispatch first the states resumed
+    most often, and to mark as cold states and sub state machines that
+    are rarely run.
+    fast_polls is the number of times a spi or i2c wait is checked right
+    after the operation is started, continuing without yielding when it is
+    already completed, zero disables it
+    When parse_in_place is True, a request variable initialized with the
+    plugin parser is filled by the in place parser instead, with the
+    address of its final storage, the state struct when it is moved
+    outline_waits is the number of waits of the same kind, spi or i2c send
+    or receive, from which the start of the operation and its registration
+    in the wait handler are a call to a static helper, written before the
+    first function using it, zero disables it
     '''
-    visitor = _WriterVisitor(compiler, source_file)
+    visitor = _WriterVisitor(compiler, source_file, computed_goto, trace,
+                             profile, fast_polls, parse_in_place,
+                             outline_waits)
     visit_node(visitor, root)
 
     text = visitor.get_text()
@@ -37,11 +211,67 @@ def write_code(compiler, root, source_file):
     return text
 
 
-def write_header(compiler, root, source_file):
+def get_profile_counts(profile, function):
+    '''
+    Returns the map of state to times run of function at profile, None
+    when there is no profile of it. Profiles loaded from json have string
+    keys, they are converted to state numbers
+    '''
+    if profile is None or function not in profile:
+        return None
+
+    return dict((int(k), v) for k, v in profile[function].items())
+
+
+def get_dispatch_lines(last_state, counts=None):
+    '''
+    Returns the lines of a switch jumping to the label of current state.
+    Large state machines switch first on the group of states, and then
+    on the state inside the group, so each switch is small and dense.
+    When counts of times each state was run are given, states resumed
+    most often are checked before the switch, and cases are ordered
+    from most to least run
+    '''
+    lines = []
+    order = range(1, last_state + 1)
+    if counts is not None:
+        order = sorted(order, key=lambda x: -counts.get(x, 0))
+        total = sum(counts.get(i, 0) for i in order)
+        for i in order[:_HOT_CHECKS]:
+            if total != 0 and counts.get(i, 0) * _HOT_RATIO >= total:
+                lines.append(
+                    "if(sa_state->sa_next == %s) goto label_%s;" % (i, i))
+
+    if last_state < _GROUP_DISPATCH_STATES:
+        lines += ["switch(sa_state->sa_next) {", "case 0: break;"]
+        for i in order:
+            lines.append("case %s: goto label_%s;" % (i, i))
+        lines += ["default: ZEPTO_ASSERT(0);", "}"]
+        return lines
+
+    lines.append("switch(sa_state->sa_next / %s) {" % _GROUP_SIZE)
+    for group in range(0, last_state // _GROUP_SIZE + 1):
+        lines.append("case %s:" % group)
+        lines.append("switch(sa_state->sa_next %% %s) {" % _GROUP_SIZE)
+        first = group * _GROUP_SIZE
+        for i in range(first, min(first + _GROUP_SIZE, last_state + 1)):
+            if i == 0:
+                lines.append("case 0: break;")
+            else:
+                lines.append("case %s: goto label_%s;" % (i - first, i))
+        lines += ["default: ZEPTO_ASSERT(0);", "}", "break;"]
+    lines += ["default: ZEPTO_ASSERT(0);", "}"]
+    return lines
+
+
+def write_header(compiler, root, source_file, trace=False, profile=None):
     '''
     Write header file
+    When trace is True, empty SA_TRACE_* macros are defined, unless they
+    were defined before. When profile is given, SA_COLD and SA_COLD_LABEL
+    attribute macros are defined
     '''
-    visitor = _HeaderWriterVisitor(compiler, source_file)
+    visitor = _HeaderWriterVisitor(compiler, source_file, trace, profile)
     visit_node(visitor, root)
 
     text = visitor.get_text()
@@ -50,11 +280,22 @@ def write_header(compiler, root, source_file):
     return text
 
 
-def write_parser(compiler, root):
+def write_parser(compiler, root, fields_table=False, parse_in_place=False,
+                 buffer_sizes=False):
     '''
     Write header file
+    When fields_table is True, request parser and reply composer use a
+    constant table with the offset and encoding of each field, and a loop
+    shared by all of them, instead of a papi call for each field
+    When parse_in_place is True, the request parser is also written as
+    a function filling a struct given by pointer, with the same name
+    followed by '_into', and the parser returning the struct calls it
+    When buffer_sizes is True, the worst case encoded size of request and
+    reply are defined as <PREFIX>_PLUGIN_REQUEST_MAX_SIZE and
+    <PREFIX>_PLUGIN_REPLY_MAX_SIZE, so buffers can be allocated exactly
     '''
-    visitor = _ParserWriterVisitor(compiler, None)
+    visitor = _ParserWriterVisitor(compiler, None, fields_table,
+                                   parse_in_place, buffer_sizes)
     visit_node(visitor, root)
 
     text = visitor.get_text()
@@ -63,6 +304,13 @@ def write_parser(compiler, root):
     return text
 
 
+def _promoted_name(decl):
+    '''
+    Returns the name of the local keeping a promoted variable
+    '''
+    return "sa_v_%s" % decl.txt_name
+
+
 def _map_parser_type_name(name):
 
     if name == 'uint8_t':
@@ -81,13 +329,27 @@ class _WriterVisitor(NodeVisitor):
     Visitor class for plugin rewrite
     '''
 
-    def __init__(self, compiler, source_file):
+    def __init__(self, compiler, source_file, computed_goto=False,
+                 trace=False, profile=None, fast_polls=0,
+                 parse_in_place=False, outline_waits=0):
         '''
         Constructor
         '''
         super(_WriterVisitor, self).__init__()
         self._c = compiler
         self._w = _Writer(source_file)
+        self._computed_goto = computed_goto
+        self._trace = trace
+        self._profile = profile
+        self._fast_polls = fast_polls
+        self._parse_in_place = parse_in_place
+        self._outline_waits = outline_waits
+        self._outlined_kinds = set()
+        self._outlined = set()
+        self._fields_table = False
+        self._parser_name = None
+        self._counts = None
+        self._prefix = None
         self._nb = None
         self._sm = None
         self._func = None
@@ -120,6 +382,86 @@ class _WriterVisitor(NodeVisitor):
             self._w.write_line("*sa_result = %s;" % txt_result)
             self._write_func_return()
 
+    def _write_yield(self, state, txt_result):
+        '''
+        Writes the return of handler, to be entered again at state
+        '''
+        self._write_trace("YIELD", state, txt_result)
+        self._write_result_return(txt_result)
+
+    def _write_trace(self, event, *args):
+        '''
+        Writes a trace macro call, with plugin prefix and state machine
+        index as first arguments
+        '''
+        if self._trace:
+            # a label may be pending at current line
+            self._w.end_of_statement(None)
+            args = [self._prefix,
+                    self._nb.functions_with_states.index(self._sm)] +\
+                list(args)
+            self._w.write_line("SA_TRACE_%s(%s);" % (
+                event, ", ".join(str(each) for each in args)))
+
+    def _write_loads(self):
+        '''
+        Writes the declaration of a local for each promoted variable,
+        loaded from the state struct
+        '''
+        for v in self._sm.refs_promoted_vars:
+            self._w.write_line("%s %s = sa_state->%s;" % (
+                v.declaration_type.get().get_type().txt_name,
+                _promoted_name(v), v.txt_name))
+
+    def _write_stores(self):
+        '''
+        Writes back to the state struct the promoted variables written,
+        before a state change
+        '''
+        if self._sm is not None:
+            for v in self._sm.refs_stored_vars:
+                self._w.write_line("sa_state->%s = %s;" % (
+                    v.txt_name, _promoted_name(v)))
+
+    def _write_label(self, state, txt=""):
+        '''
+        Writes the label of a state, with txt after it, states rarely run
+        are marked as cold
+        '''
+        if self._counts is not None and self._is_cold(state):
+            self._w.write("label_%s: SA_COLD_LABEL ;%s" % (state, txt))
+        else:
+            self._w.write("label_%s:%s" % (state, txt))
+
+    def _is_cold(self, number):
+        '''
+        Returns True if state number of current function is run less than
+        1/_COLD_RATIO of the function entries
+        '''
+        total = sum(self._counts.values())
+        return self._counts.get(number, 0) * _COLD_RATIO < total
+
+    def _is_cold_function(self, func_decl):
+        '''
+        Returns True if a sub state machine function is run less than
+        1/_COLD_RATIO of main state machine entries
+        '''
+        counts = get_profile_counts(self._profile, func_decl.txt_name)
+        main = get_profile_counts(self._profile, self._nb.handler_name)
+        if main is None:
+            return False
+
+        total = sum(counts.values()) if counts is not None else 0
+        return total * _COLD_RATIO < sum(main.values())
+
+    def _get_machine_index(self, func_decl):
+        '''
+        Returns the index of the state machine of a function, used to
+        identify it at trace macros
+        '''
+        return self._nb.functions_with_states.index(
+            self._nb.get_state_machine_data(func_decl))
+
     def get_text(self):
         return self._w.get_text()
 
@@ -136,6 +478,9 @@ class _WriterVisitor(NodeVisitor):
         self.visit(node.source)
 
     def visit_PluginSourceNode(self, node):
+        self._prefix = node.txt_prefix
+        if self._outline_waits != 0:
+            self._select_outlined_waits(node)
         self._w.write_line('#include "%s_state.h"' % node.txt_prefix)
         self.visit_childs(node)
 
@@ -166,8 +511,51 @@ class _WriterVisitor(NodeVisitor):
         self._w.end_of_statement(node.ctx)
 
     def visit_FunctionDefinitionNode(self, node):
+        if len(self._outlined_kinds) != 0:
+            self._write_wait_helpers(node)
+
         self.visit_childs(node)
 
+    def _select_outlined_waits(self, node):
+        '''
+        Selects the kinds of wait used at least _outline_waits times in
+        plugin source node
+        '''
+        w = _WaitsWalker()
+        w.walk_node(node)
+        kinds = [each.txt_wait_for for each in w.waits]
+        self._outlined_kinds = set(
+            [k for k in kinds if kinds.count(k) >= self._outline_waits])
+
+    def _write_wait_helpers(self, node):
+        '''
+        Writes the static helpers starting each outlined kind of wait used
+        at function node, not written yet
+        '''
+        w = _WaitsWalker()
+        w.walk_node(node.statement_list.get())
+        for each in w.waits:
+            if each.txt_wait_for not in self._outlined_kinds or\
+                    each.txt_wait_for in self._outlined:
+                continue
+
+            if len(self._outlined) == 0:
+                for line in _NOINLINE_MACROS:
+                    self._w.write_line(line)
+
+            self._outlined.add(each.txt_wait_for)
+            args = _WAIT_ARGS[each.txt_wait_for]
+            self._w.write_line(
+                "static SA_NOINLINE void sa_wait_%s(waiting_for* sa_wf, %s)" %
+                (each.txt_wait_for, ", ".join(["%s %s" % a for a in args])))
+            self._w.write_line("{")
+            self._w.write_line("%s(%s);" % (each.txt_name, ", ".join(
+                [a[1] for a in args])))
+            self._w.write_line(
+                "papi_wait_handler_add_wait_for_%s(sa_wf, %s);" %
+                (each.txt_wait_for, args[0][1]))
+            self._w.write_line("}")
+
     def visit_FunctionDeclNode(self, node):
 
         self._func = node
@@ -176,6 +564,14 @@ class _WriterVisitor(NodeVisitor):
         else:
             self._sm = None
 
+        self._counts = None
+        if self._sm is not None:
+            self._counts = get_profile_counts(self._profile, node.txt_name)
+            if self._profile is not None and\
+                    not self._sm.ref_state_machine.is_main_machine() and\
+                    self._is_cold_function(node):
+                self._w.write("SA_COLD ")
+
         if node.bool_static:
             self._w.write("static ")
 
@@ -244,12 +640,19 @@ class _WriterVisitor(NodeVisitor):
 
     def visit_VariableDeclarationStmtNode(self, node):
 
-        if self._sm is not None and\
+        call = self._get_parser_call(node)
+        if call is not None:
+            self._write_parse_in_place(node, call)
+
+        elif self._sm is not None and\
                 self._sm.is_moved_var_decl(node):
             if not node.initializer_expression.is_none():
 
-                self._w.write('sa_state->')
-                self._w.write(node.txt_name)
+                if self._sm.is_promoted_var(node):
+                    self._w.write(_promoted_name(node))
+                else:
+                    self._w.write('sa_state->')
+                    self._w.write(node.txt_name)
 
                 self._w.write(' = ')
                 self.write_expr(node.initializer_expression)
@@ -268,12 +671,69 @@ class _WriterVisitor(NodeVisitor):
             self._w.write(';')
             self._w.end_of_statement(node.ctx)
 
+    def _get_parser_call(self, node):
+        '''
+        Returns the call to the request parser initializing declaration
+        node, when it is written with the in place parser, None otherwise
+        '''
+        if not self._parse_in_place or node.initializer_expression.is_none():
+            return None
+
+        e = node.initializer_expression.get()
+        if isinstance(e, TrivialCastExprNode):
+            e = e.expression.get()
+
+        if isinstance(e, FunctionCallExprNode) and\
+                e.txt_name == "%s_plugin_parser_read" % self._prefix:
+            return e
+
+        return None
+
+    def _write_parse_in_place(self, node, call):
+        '''
+        Writes request variable node decoded by the in place parser,
+        straight into the state struct when it is moved, so the request
+        struct is neither returned nor copied
+        '''
+        if self._sm is not None and self._sm.is_moved_var_decl(node):
+            target = "sa_state->%s" % node.txt_name
+        else:
+            self.visit(node.declaration_type)
+            self._w.write(' ')
+            self._w.write(node.txt_name)
+            self._w.write(';')
+            self._w.end_of_statement(None)
+            target = node.txt_name
+
+        self._w.write(call.txt_name)
+        self._w.write('_into(')
+        for each in call.argument_list.get().arguments:
+            self.write_expr(each)
+            self._w.write(', ')
+
+        self._w.write('&')
+        self._w.write(target)
+        self._w.write(');')
+        self._w.end_of_statement(node.ctx)
+
     def visit_ExpressionStmtNode(self, node):
         self.write_expr(node.expression)
         self._w.write(';')
         self._w.end_of_statement(node.ctx)
 
     def visit_FunctionCallStmtNode(self, node):
+        if node.expression.get().bool_micro_sleep:
+            self._w.write_line('{')
+            self._w.write("SA_TIME_VAL sa_tv = ")
+            self.write_expr(
+                node.expression.get().argument_list.get().arguments.at(0))
+            self._w.write(';')
+            self._w.end_of_statement(node.ctx)
+            self._w.write_line(
+                "papi_gravely_power_inefficient_micro_sleep(&sa_tv);")
+            self._w.write_line('}')
+            return
+
         self.write_expr(node.expression)
         self._w.write(';')
         self._w.end_of_statement(node.ctx)
@@ -282,69 +742,177 @@ class _WriterVisitor(NodeVisitor):
             assert False
 
     def visit_PapiWaitStmtNode(self, node):
-        self._w.write(node.txt_name)
-        self._writeArgumentListNode(node.argument_list.get())
-        self._w.write(';')
-        self._w.end_of_statement(node.ctx)
+        self._write_waits([node], node.int_next_state)
 
-        self._w.write("papi_wait_handler_add_wait_for_")
-        self._w.write(node.txt_wait_for)
-        self._w.write("(sa_wf, ")
-        self.write_expr(node.argument_list.get().arguments.at(0))
-        self._w.write(')')
-        self._w.write(';')
-        self._w.end_of_statement(None)
+    def visit_PapiSleepStmtNode(self, node):
+        self._write_waits([node], node.int_next_state)
+
+    def visit_PapiWaitGroupStmtNode(self, node):
+        self._write_waits([each.get() for each in node.waits],
+                          node.int_next_state)
+
+    def visit_PapiWaitForStmtNode(self, node):
+        for i in range(len(node.refs_starts)):
+            self._w.write("papi_wait_handler_add_wait_for_")
+            self._w.write(node.txts_wait_for[i])
+            self._w.write("(sa_wf, ")
+            self.write_expr(
+                node.refs_starts[i].argument_list.get().arguments.at(0))
+            self._w.write(')')
+            self._w.write(';')
+            self._w.end_of_statement(node.ctx)
 
+        self._write_stores()
         self._w.write_line("sa_state->sa_next = %s;" % node.int_next_state)
-        self._write_result_return("PLUGIN_WAITING")
-
-        self._w.write("label_%s:" % node.int_next_state)
+        self._write_yield(node.int_next_state, "PLUGIN_WAITING")
+
+        self._write_label(node.int_next_state)
+        self._write_trace("STATE_ENTER", node.int_next_state)
+
+        if not node.bool_any:
+            self._w.write("if(")
+            for i in range(len(node.refs_starts)):
+                if i != 0:
+                    self._w.write(" || ")
+                self._write_started_check(node, i)
+            self._w.write(")")
+            self._w.end_of_statement(None)
+        else:
+            for i in range(len(node.refs_starts)):
+                if i != 0:
+                    self._w.write("else ")
+                self._w.write("if(!")
+                self._write_started_check(node, i)
+                self._w.write(")")
+                self._w.end_of_statement(None)
+                self._w.write_line('{')
+                self._w.write("*(")
+                self.write_expr(node.completed)
+                self._w.write(") = %s;" % i)
+                self._w.end_of_statement(None)
+                self._w.write_line('}')
+            self._w.write_line("else")
 
-        self._w.write("if(papi_wait_handler_is_waiting_for_")
-        self._w.write(node.txt_wait_for)
-        self._w.write("(sa_wf, ")
-        self.write_expr(node.argument_list.get().arguments.at(0))
-        self._w.write('))')
-        self._w.end_of_statement(None)
         self._w.write_line('{')
 
-        self._write_result_return("PLUGIN_WAITING")
+        self._write_yield(node.int_next_state, "PLUGIN_WAITING")
 
         self._w.write_line('}')
 
+    def _write_started_check(self, node, i):
+        '''
+        Writes the condition that is true while the operation started
+        by i-th papi_start_* call is not completed
+        '''
+        self._w.write("papi_wait_handler_is_waiting_for_")
+        self._w.write(node.txts_wait_for[i])
+        self._w.write("(sa_wf, ")
+        self.write_expr(
+            node.refs_starts[i].argument_list.get().arguments.at(0))
+        self._w.write(')')
 
-#         if node.ctx.stop.line is not None:
-#             txt += u"//#line %s\n" % node.ctx.stop.line
-
-    def visit_PapiSleepStmtNode(self, node):
-        #         self._w.write('')
-        #         self.write_expr(node.child_expression)
-        #         self._w.write(';')
-        #         self._w.end_of_statement()
+    def _write_waits(self, waits, next_state):
+        '''
+        Starts all waits, and yields until all of them are completed.
+        With fast polls, waits not including a sleep are checked a few
+        times before yielding, and jump to the continuation when completed
+        '''
+        for each in waits:
+            self._write_wait_start(each)
 
-        self._w.write("papi_wait_handler_add_wait_for_timeout(sa_wf, ")
-        self.write_expr(node.argument_list.get().arguments.at(0))
-        self._w.write(')')
-        self._w.write(';')
-        self._w.end_of_statement(node.ctx)
+        self._write_stores()
+        self._w.write_line("sa_state->sa_next = %s;" % next_state)
 
-        self._w.write_line("sa_state->sa_next = %s;" % node.int_next_state)
+        if self._fast_polls != 0 and not any(
+                isinstance(each, state.PapiSleepStmtNode)
+                for each in waits):
+            self._w.write_line('{')
+            self._w.write_line("uint8_t sa_poll;")
+            self._w.write_line(
+                "for(sa_poll = 0; sa_poll != %s; ++sa_poll)" %
+                self._fast_polls)
+            self._w.write_line('{')
+            self._w.write("if(!(")
+            self._write_waits_condition(waits)
+            self._w.write(")) goto label_%s;" % next_state)
+            self._w.end_of_statement(None)
+            self._w.write_line('}')
+            self._w.write_line('}')
 
-        self._write_result_return("PLUGIN_WAITING")
+        self._write_yield(next_state, "PLUGIN_WAITING")
 
-        self._w.write("label_%s:" % node.int_next_state)
+        self._write_label(next_state)
+        self._write_trace("STATE_ENTER", next_state)
 
-        self._w.write("if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))")
+        self._w.write("if(")
+        self._write_waits_condition(waits)
+        self._w.write(")")
         self._w.end_of_statement(None)
         self._w.write_line('{')
 
-        self._write_result_return("PLUGIN_WAITING")
+        self._write_yield(next_state, "PLUGIN_WAITING")
 
         self._w.write_line('}')
 
+    def _write_waits_condition(self, waits):
+        '''
+        Writes the condition that is true while any of waits is not
+        completed
+        '''
+        for i, each in enumerate(waits):
+            if i != 0:
+                self._w.write(" || ")
+            self._write_wait_check(each)
 
-#         if node.ctx.stop.line is not None:
-#             txt += u"//#line %s\n" % node.ctx.stop.line
+    def _write_wait_start(self, node):
+        '''
+        Writes the start of a blocking operation, and registers it
+        in the wait handler
+        '''
+        if isinstance(node, state.PapiSleepStmtNode):
+            self._w.write("papi_wait_handler_add_wait_for_timeout(sa_wf, ")
+            self.write_expr(node.argument_list.get().arguments.at(0))
+            self._w.write(')')
+            self._w.write(';')
+            self._w.end_of_statement(node.ctx)
+            return
+
+        if node.txt_wait_for in self._outlined_kinds:
+            self._w.write("sa_wait_%s(sa_wf" % node.txt_wait_for)
+            for each in node.argument_list.get().arguments:
+                self._w.write(', ')
+                self.write_expr(each)
+            self._w.write(');')
+            self._w.end_of_statement(node.ctx)
+            return
+
+        self._w.write(node.txt_name)
+        self._writeArgumentListNode(node.argument_list.get())
+        self._w.write(';')
+        self._w.end_of_statement(node.ctx)
+
+        self._w.write("papi_wait_handler_add_wait_for_")
+        self._w.write(node.txt_wait_for)
+        self._w.write("(sa_wf, ")
+        self.write_expr(node.argument_list.get().arguments.at(0))
+        self._w.write(')')
+        self._w.write(';')
+        self._w.end_of_statement(None)
+
+    def _write_wait_check(self, node):
+        '''
+        Writes the condition that is true while a blocking operation
+        is not completed
+        '''
+        if isinstance(node, state.PapiSleepStmtNode):
+            self._w.write("papi_wait_handler_is_waiting_for_timeout(0, sa_wf)")
+            return
+
+        self._w.write("papi_wait_handler_is_waiting_for_")
+        self._w.write(node.txt_wait_for)
+        self._w.write("(sa_wf, ")
+        self.write_expr(node.argument_list.get().arguments.at(0))
+        self._w.write(')')
 
     def visit_WhileStmtNode(self, node):
         self._w.write('while')
@@ -415,16 +983,43 @@ class _WriterVisitor(NodeVisitor):
 
     def visit_StateMachineStmtNode(self, node):
 
-        self._w.write_line("switch(sa_state->sa_next) {")
+        self._write_loads()
 
-        self._w.write_line("case 0: break;")
-        for i in range(1, node.int_last_state + 1):
-            self._w.write_line(
-                "case %s: goto label_%s;" % (str(i), str(i)))
-#            visit_node(self, each.child_statement_list)
+        if self._computed_goto:
+            self._write_computed_goto(node)
+        else:
+            self._write_switch(node)
 
-        self._w.write_line("default: ZEPTO_ASSERT(0);")
-        self._w.write_line('}')
+        # only reached when entering state 0
+        self._write_trace("STATE_ENTER", 0)
+
+    def _write_computed_goto(self, node):
+        '''
+        Writes state dispatch as a single indirect jump, using gcc
+        labels as values extension. Switch is kept for other compilers.
+        State is checked before the jump, as switch default does
+        '''
+        self._w.write_line("#if defined __GNUC__")
+        self._w.write_line("{")
+        self._w.write_line("static void* const sa_labels[] = {")
+        for i in range(0, node.int_last_state + 1):
+            self._w.write_line("&&label_%s," % str(i))
+        self._w.write_line("};")
+        self._w.write_line("ZEPTO_ASSERT(sa_state->sa_next < %s);" %
+                           str(node.int_last_state + 1))
+        self._w.write_line("goto *sa_labels[sa_state->sa_next];")
+        self._w.write_line("}")
+        self._w.write_line("label_0: ;")
+        self._w.write_line("#else")
+        self._write_switch(node)
+        self._w.write_line("#endif")
+
+    def _write_switch(self, node):
+        '''
+        Writes state dispatch as a switch
+        '''
+        for each in get_dispatch_lines(node.int_last_state, self._counts):
+            self._w.write_line(each)
 
 #             if node.ctx.line is not None:
 #                 txt += u"\n//#line %s\n" % node.ctx.line
@@ -432,39 +1027,72 @@ class _WriterVisitor(NodeVisitor):
     def visit_DebugStateStmtNode(self, node):
 
         nxt = str(node.int_next_state)
+        self._write_stores()
         self._w.write_line("sa_state->sa_next = %s;" % nxt)
 
-        self._write_result_return("PLUGIN_DEBUG")
+        self._write_yield(nxt, "PLUGIN_DEBUG")
 
         # we add a nop here, because C compiler will complain if next
         # statement is a declaration.
         # Only pure statements allowed right after a label
         # Adding a NOP will silence it
-        self._w.write_line("label_%s: /* nop */ ;" % nxt)
+        self._write_label(nxt, " /* nop */ ;")
+        self._w.end_of_statement(None)
+        self._write_trace("STATE_ENTER", nxt)
 
 #         if node.ctx.stop.line is not None:
 #             txt += u"\n//#line %s\n" % node.ctx.stop.line
 #
 #         self._w.insertAfterToken(node.ctx.stop, txt)
 
+    def visit_YieldStateStmtNode(self, node):
+
+        nxt = str(node.int_next_state)
+        if node.ref_counter is not None:
+            self._w.write_line("if(++sa_state->%s == %s) {" % (
+                node.ref_counter.txt_name, node.int_every))
+            self._w.write_line(
+                "sa_state->%s = 0;" % node.ref_counter.txt_name)
+
+        self._write_stores()
+        self._w.write_line("sa_state->sa_next = %s;" % nxt)
+
+        self._write_yield(nxt, "PLUGIN_YIELD")
+
+        if node.ref_counter is not None:
+            self._w.write_line("}")
+
+        self._write_label(nxt, " /* nop */ ;")
+        self._w.end_of_statement(None)
+        self._write_trace("STATE_ENTER", nxt)
+
     def visit_BeforeSubStmtNode(self, node):
 
         nxt = str(node.int_next_state)
-        self._w.write_line("*(uint8_t*)(sa_state + 1) = 0;")
+        self._write_stores()
+        self._w.write_line("*(%s*)(sa_state + 1) = 0;" %
+                           self._nb.get_next_type(node.ref_function_decl))
         self._w.write_line("sa_state->sa_next = %s;" % nxt)
-        self._w.write_line("label_%s: " % nxt)
+        self._write_label(nxt, " ")
+        self._w.end_of_statement(None)
+        self._write_trace("STATE_ENTER", nxt)
+        self._write_trace("SUB_ENTER",
+                          self._get_machine_index(node.ref_function_decl))
 
 #         self._w.insertBeforeToken(node.ctx.start, txt)
 
     def visit_AfterSubStmtNode(self, node):
-        # pylint: disable=unused-argument
-        self._w.write_line("if(*(uint8_t*)(sa_state + 1) != 0) ")
+        self._w.write_line("if(*(%s*)(sa_state + 1) != 0) " %
+                           self._nb.get_next_type(node.ref_function_decl))
 
         if self._sm.ref_state_machine.is_main_machine():
             self._w.write_line("return *sa_result;")
         else:
             self._write_func_return()
 
+        self._write_trace("SUB_EXIT",
+                          self._get_machine_index(node.ref_function_decl))
+
 #         self._w.insertAfterToken(node.ctx.stop, txt)
 
     def visit_FunctionCallSubStmtNode(self, node):
@@ -476,9 +1104,16 @@ class _WriterVisitor(NodeVisitor):
         #        self._w.insertAfterToken(args.ctx.symbol, txt_args)
 
         nxt = str(node.int_next_state)
-        self._w.write_line("*(uint8_t*)(sa_state + 1) = 0;")
+        next_type = self._nb.get_next_type(
+            node.expression.get().ref_declaration)
+        self._write_stores()
+        self._w.write_line("*(%s*)(sa_state + 1) = 0;" % next_type)
         self._w.write_line("sa_state->sa_next = %s;" % nxt)
-        self._w.write_line("label_%s: ;/*nop*/" % nxt)
+        self._write_label(nxt, " ;/*nop*/")
+        self._w.end_of_statement(None)
+        self._write_trace("STATE_ENTER", nxt)
+        self._write_trace("SUB_ENTER", self._get_machine_index(
+            node.expression.get().ref_declaration))
 
         self.visit(node.expression.get().ref_declaration.return_type)
         self._w.write(' ')
@@ -488,22 +1123,27 @@ class _WriterVisitor(NodeVisitor):
         self._w.write(';')
         self._w.end_of_statement(node.ctx)
 
-        self._w.write_line("if(*(uint8_t*)(sa_state + 1) != 0)")
+        self._w.write_line("if(*(%s*)(sa_state + 1) != 0)" % next_type)
 
         if self._sm.ref_state_machine.is_main_machine():
             self._w.write_line("return *sa_result;")
         else:
             self._write_func_return()
 
+        self._write_trace("SUB_EXIT", self._get_machine_index(
+            node.expression.get().ref_declaration))
+
 #        self._w.insertBeforeToken(node.ctx.start, txt)
 
     def visit_InitFirstStmtNode(self, node):
-        self._w.write_line("*(uint8_t*)%s = 0;" % node.txt_arg1)
+        self._w.write_line("*(%s*)%s = 0;" % (self._nb.get_next_type(),
+                                              node.txt_arg1))
 #        self._w.insertAfterToken(node.ctx, txt)
 
     def visit_BeforeReturnStmtNode(self, node):
         # pylint: disable=unused-argument
         self._w.write_line("sa_state->sa_next = 0;")
+        self._write_trace("RETURN")
 #         self._w.insertBeforeToken(node.ctx, txt)
 
     def visit_MainFirstStmtNode(self, node):
@@ -531,19 +1171,70 @@ class _WriterVisitor(NodeVisitor):
         self._w.write(" sa_res;")
         self._w.end_of_statement(None)
 
-        for each in node.parser_elements:
-            pn = _map_parser_type_name(each.c_type)
-            self._w.write_line("sa_res.%s = papi_parser_read_%s(sa_po);" %
-                               (each.name, pn))
+        if self._parse_in_place:
+            self._w.write_line("%s_into(sa_po, &sa_res);" %
+                               self._parser_name)
+        else:
+            self._write_parser_fields(node, "sa_res.", "&sa_res")
 
         self._w.write_line("return sa_res;")
 
+    def _write_parser_fields(self, node, member, address):
+        '''
+        Writes the read of each request field, member is the prefix used
+        to access a field, and address the expression of struct address
+        '''
+        if self._use_fields_table(node):
+            self._write_fields_table(node.struct_type.get().txt_name,
+                                     node.parser_elements)
+            self._w.write_line(
+                "sa_parser_read_fields(sa_po, %s, sa_fields, %s);" %
+                (address, len(node.parser_elements)))
+        else:
+            for each in node.parser_elements:
+                pn = _map_parser_type_name(each.c_type)
+                self._w.write_line(
+                    "%s%s = papi_parser_read_%s(sa_po);" %
+                    (member, each.name, pn))
+
     def visit_ComposerStmtNode(self, node):
 
-        for each in node.parser_elements:
-            pn = _map_parser_type_name(each.c_type)
-            self._w.write_line("papi_reply_write_%s(sa_rh, %s);" %
-                               (pn, each.name))
+        if self._use_fields_table(node):
+            self._w.write_line("struct sa_reply {")
+            for each in node.parser_elements:
+                self._w.write_line("%s %s;" % (each.c_type, each.name))
+            self._w.write_line("} sa_data;")
+            self._write_fields_table("struct sa_reply", node.parser_elements)
+            for each in node.parser_elements:
+                self._w.write_line("sa_data.%s = %s;" % (each.name,
+                                                         each.name))
+            self._w.write_line(
+                "sa_reply_write_fields(sa_rh, &sa_data, sa_fields, %s);" %
+                len(node.parser_elements))
+        else:
+            for each in node.parser_elements:
+                pn = _map_parser_type_name(each.c_type)
+                self._w.write_line("papi_reply_write_%s(sa_rh, %s);" %
+                                   (pn, each.name))
+
+    def _use_fields_table(self, node):
+        '''
+        Returns True if parser or composer node is written with a field
+        table. Offsets are bytes, so fields must fit in 256 bytes even
+        when each one takes two
+        '''
+        return self._fields_table and\
+            len(node.parser_elements) * 2 <= _MAX_FIELDS_BYTES
+
+    def _write_fields_table(self, struct_name, elements):
+        '''
+        Writes the constant table with offset and encoding of each field
+        '''
+        self._w.write_line("static const sa_field sa_fields[] = {")
+        for each in elements:
+            self._w.write_line("{offsetof(%s, %s), %s}," % (
+                struct_name, each.name, _FIELD_ENCODINGS[each.c_type]))
+        self._w.write_line("};")
 
     def visit_RefTypeNode(self, node):
 
@@ -636,6 +1327,17 @@ class _WriterVisitor(NodeVisitor):
     def visit_VariableExprNode(self, node):
         if node.ref_declaration is not None:
             if self._sm is not None and\
+                    self._sm.is_promoted_var(node.ref_declaration):
+                self._w.write(_promoted_name(node.ref_declaration))
+            elif self._sm is not None and\
+                    self._sm.get_narrowed_type(node.ref_declaration) and\
+                    node not in self._sm.refs_narrowed_writes:
+                # read back as declared type
+                decl = node.ref_declaration
+                self._w.write("((%s)sa_state->%s)" % (
+                    decl.declaration_type.get().get_type().txt_name,
+                    decl.txt_name))
+            elif self._sm is not None and\
                     self._sm.is_moved_var_decl(node.ref_declaration):
                 self._w.write("(sa_state->%s)" % node.ref_declaration.txt_name)
             else:
@@ -683,11 +1385,12 @@ class _HeaderWriterVisitor(_WriterVisitor):
     Visitor class for plugin header write
     '''
 
-    def __init__(self, compiler, source_file):
+    def __init__(self, compiler, source_file, trace=False, profile=None):
         '''
         Constructor
         '''
-        super(_HeaderWriterVisitor, self).__init__(compiler, source_file)
+        super(_HeaderWriterVisitor, self).__init__(
+            compiler, source_file, trace=trace, profile=profile)
 
     def visit_RootNode(self, node):
 
@@ -701,24 +1404,62 @@ class _HeaderWriterVisitor(_WriterVisitor):
         self._w.write_line("")
         self._w.write_line("")
 
+        if self._trace:
+            for each in _TRACE_MACROS:
+                self._w.write_line(each)
+            self._w.write_line("")
+
+        if self._profile is not None:
+            for each in _COLD_MACROS:
+                self._w.write_line(each)
+            self._w.write_line("")
+
+        narrowed = None
+        packed = False
         for f in nb.functions_with_states:
 
             self._w.write_line("typedef struct _%s {" % f.txt_struct_name)
 
-            self._w.write_line("uint8_t sa_next;")
+            self._w.write_line("%s sa_next;" % f.get_next_type())
 
             for v in f.refs_moved_var_decls:
 
-                self.visit(v.declaration_type)
+                if f.get_packed_bits(v) is not None:
+                    continue
+
+                if f.get_narrowed_type(v) is not None:
+                    self._w.write(f.get_narrowed_type(v))
+                else:
+                    self.visit(v.declaration_type)
                 self._w.write(' ')
                 self._w.write(v.txt_name)
 
                 self._w.write(';')
                 self._w.end_of_statement(v.ctx)
 
+            # bit fields last, in the order they were grouped in bytes
+            for v in f.refs_packed_vars:
+                self._w.write("%s %s : %d;" % (f.get_narrowed_type(v),
+                                               v.txt_name,
+                                               f.get_packed_bits(v)))
+                self._w.end_of_statement(v.ctx)
+
             self._w.write_line("} %s;" % f.txt_struct_name)
             self._w.write_line("")
 
+            if f.narrowed_types is not None:
+                narrowed = (narrowed or 0) + f.int_narrowed_bytes
+                packed = packed or f.packed_bits is not None
+
+        if packed:
+            self._w.write_line(
+                "// range narrowing and bit packing saved %d bytes of state"
+                % narrowed)
+        elif narrowed is not None:
+            self._w.write_line(
+                "// range narrowing saved %d bytes of state" % narrowed)
+            self._w.write_line("")
+
         self._w.write_line("#endif // %s" % nb.include_guard)
 
 
@@ -728,15 +1469,49 @@ class _ParserWriterVisitor(_WriterVisitor):
     Visitor class for plugin header write
     '''
 
-    def __init__(self, compiler, source_file):
+    def __init__(self, compiler, source_file, fields_table=False,
+                 parse_in_place=False, buffer_sizes=False):
         '''
         Constructor
         '''
-        super(_ParserWriterVisitor, self).__init__(compiler, source_file)
+        super(_ParserWriterVisitor, self).__init__(
+            compiler, source_file, parse_in_place=parse_in_place)
+        self._fields_table = fields_table
+        self._buffer_sizes = buffer_sizes
 
     def visit_RootNode(self, node):
         self.visit(node.manifest)
 
+    def visit_FunctionDefinitionNode(self, node):
+
+        first = node.statement_list.get().statements.at(0).get()
+        if isinstance(first, (ParserStmtNode, ComposerStmtNode)) and\
+                self._use_fields_table(first):
+            if isinstance(first, ParserStmtNode):
+                for each in _FIELD_PARSER_LINES:
+                    self._w.write_line(each)
+            else:
+                for each in _FIELD_COMPOSER_LINES:
+                    self._w.write_line(each)
+
+        if isinstance(first, ParserStmtNode) and self._parse_in_place:
+            self._parser_name = node.declaration.get().txt_name
+            self._write_parser_into(first)
+
+        self.visit_childs(node)
+
+    def _write_parser_into(self, node):
+        '''
+        Writes the in place parser, filling the struct at sa_res
+        '''
+        struct_name = node.struct_type.get().txt_name
+        self._w.write_line(
+            "static inline void %s_into(ZEPTO_PARSER* sa_po, %s* sa_res)" %
+            (self._parser_name, struct_name))
+        self._w.write_line("{")
+        self._write_parser_fields(node, "sa_res->", "sa_res")
+        self._w.write_line("}")
+
     def visit_PluginManifestNode(self, node):
 
         include_guard = "__SA_%s_PLUGIN_H__" % node.txt_prefix.upper()
@@ -749,6 +1524,17 @@ class _ParserWriterVisitor(_WriterVisitor):
         self._w.write_line("#include \"papi.h\"")
         self._w.write_line("")
 
+        if self._buffer_sizes:
+            self._w.write_line("#define %s_PLUGIN_REQUEST_MAX_SIZE %d" % (
+                node.txt_prefix.upper(), node.int_request_size))
+            self._w.write_line("#define %s_PLUGIN_REPLY_MAX_SIZE %d" % (
+                node.txt_prefix.upper(), node.int_reply_size))
+            self._w.write_line("")
+
+        if self._fields_table:
+            for each in _FIELD_TABLE_LINES:
+                self._w.write_line(each)
+
         self.visit_childs(node)
 
         self._w.write_line("")
@@ -785,6 +1571,27 @@ class _ParserWriterVisitor(_WriterVisitor):
         self._w.write_line("#endif // %s" % include_guard)
 
 
+class _WaitsWalker(NodeWalker):
+
+    '''
+    Walker class that collects papi wait statements, in textual order
+    '''
+
+    def __init__(self):
+        '''
+        Constructor
+        '''
+        super(_WaitsWalker, self).__init__()
+        self.waits = []
+
+    def walk_node(self, node):
+
+        if isinstance(node, state.PapiWaitStmtNode):
+            self.waits.append(node)
+
+        self.walk_childs(node)
+
+
 class _Writer(object):
 
     '''
@@ -0,0 +1,388 @@
+# Copyright (C) 2016 OLogN Technologies AG
+#
+# This source file is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License version 2
+# as published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from smartanthill_phc import api
+from smartanthill_phc.parse_write import ZeptoPlugin
+from tests import run
+
+'''
+Compares code size and run time of the code generated with different
+compiler options, for the plugins under tests directory.
+Must be run from the root of the repository, with gcc on the PATH.
+Run time is measured running each handler to completion SA_RUNS times,
+with papi stubs that never wait, so it is dominated by state dispatch
+'''
+
+SPLITS = ['none', 'block', 'loop', 4, 2, 'statement']
+
+PLUGINS = [
+    ('blink', False, {}),
+    ('debug', True, {}),
+    ('expression', False, {}),
+    ('fast_poll', False, {'overlap_waits': True}),
+    ('fold', False, {}),
+    ('inline', False, {'inline_threshold': 4}),
+    ('loop', False, {}),
+    ('micro_sleep', False, {}),
+    ('narrow', False, {'narrow_vars': True}),
+    ('outline', False, {}),
+    ('overlap', False, {'overlap_waits': True}),
+    ('pack', False, {'pack_state': True}),
+    ('parse_in_place', False, {}),
+    ('peephole', True, {}),
+    ('promote', False, {}),
+    ('remat', False, {'recompute': True}),
+    ('scalar', False, {'scalar_structs': True}),
+    ('sleep', False, {}),
+    ('split', 'block', {}),
+    ('spi', False, {}),
+    ('stateless', False, {}),
+    ('sub_machine', True, {}),
+    ('sub_machine2', True, {}),
+    ('yield', False, {'yield_budget': 64}),
+]
+
+RUNS = 1000000
+
+FIELD_COUNTS = [1, 8, 64]
+
+FIELD_TYPES = ['encoded-uint[max=1]', 'encoded-uint[max=2]',
+               'encoded-int[max=2]']
+
+
+def generate(dst, prefix, split, **kwargs):
+    '''
+    Writes non blocking code for plugin at tests/prefix into dst directory
+    '''
+    src = os.path.join("tests", prefix)
+    plugin = ZeptoPlugin(os.path.join(src, "manifest.xml"))
+
+    code, header, _, parser = api.process_file(
+        os.path.join(src, "%s.c" % prefix), plugin, prefix, split,
+        False, os.path.join("tests", "papi.h"), **kwargs)
+
+    for name, text in [("%s_non_blocking.c" % prefix, code),
+                       ("%s_state.h" % prefix, header),
+                       ("%s.h" % prefix, parser)]:
+        f = open(os.path.join(dst, name), 'wb')
+        f.write(text)
+        f.close()
+
+
+def code_size(dst, prefix):
+    '''
+    Returns the size of code generated by gcc for plugin object file
+    '''
+    obj = os.path.join(dst, "%s.o" % prefix)
+    cmd = run.gcc_command(prefix, [dst, "tests"],
+                          ["-c", "-o", obj,
+                           os.path.join(dst, "%s_non_blocking.c" % prefix)])
+    subprocess.check_call(cmd)
+
+    out = subprocess.check_output(["size", obj]).splitlines()
+    return int(out[-1].split()[0])
+
+
+def state_count(dst, prefix):
+    '''
+    Returns the number of states in generated code
+    '''
+    f = open(os.path.join(dst, "%s_non_blocking.c" % prefix), 'rb')
+    text = f.read()
+    f.close()
+    return len(re.findall(r"^label_\d+:", text, re.MULTILINE))
+
+
+def state_size(dst, prefix):
+    '''
+    Returns the size in bytes of all state structs of generated code,
+    as laid out by gcc for the host
+    '''
+    f = open(os.path.join(dst, "%s_state.h" % prefix), 'rb')
+    names = re.findall(r"^} (\w+);", f.read(), re.MULTILINE)
+    f.close()
+
+    src = os.path.join(dst, "%s_size.c" % prefix)
+    f = open(src, 'wb')
+    f.write("#include <stdio.h>\n")
+    f.write("#include \"%s_state.h\"\n" % prefix)
+    f.write("int main() { printf(\"%u\", (unsigned)(0")
+    for each in names:
+        f.write(" + sizeof(%s)" % each)
+    f.write(")); return 0; }\n")
+    f.close()
+
+    exe = os.path.join(dst, "%s_size.exe" % prefix)
+    subprocess.check_call(run.gcc_command(prefix, [dst, "tests"],
+                                          ["-o", exe, src]))
+    return int(subprocess.check_output([exe]))
+
+
+def run_time(dst, prefix, runs, repeat=3):
+    '''
+    Returns run time of the runner, in nanoseconds per run,
+    best of repeat executions
+    '''
+    exe = os.path.join(dst, "%s.exe" % prefix)
+    cmd = run.gcc_command(prefix, [dst, "tests"],
+                          ["-DSA_RUNS=%s" % runs, "-o", exe,
+                           os.path.join("tests", "runner.c"),
+                           os.path.join(dst, "%s_non_blocking.c" % prefix)])
+    subprocess.check_call(cmd)
+
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        subprocess.check_call([exe], stdout=open(os.devnull, 'wb'))
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best * 1e9 / runs
+
+
+def handler_entries(dst, prefix):
+    '''
+    Returns the number of times the handler is entered by the runner,
+    to run it to completion once
+    '''
+    exe = os.path.join(dst, "%s_entries.exe" % prefix)
+    cmd = run.gcc_command(prefix, [dst, "tests"],
+                          ["-DSA_COUNT_ENTRIES", "-o", exe,
+                           os.path.join("tests", "runner.c"),
+                           os.path.join(dst, "%s_non_blocking.c" % prefix)])
+    subprocess.check_call(cmd)
+
+    return int(subprocess.check_output([exe]).split()[1])
+
+
+def compare(options_a, options_b, runs=RUNS):
+    '''
+    Prints a table comparing code size and run time of each plugin,
+    when compiled with options_a and with options_b
+    '''
+    print "%-14s %8s %8s %8s %8s" % ("plugin", "size A", "size B",
+                                     "ns A", "ns B")
+    for prefix, split, kwargs in PLUGINS:
+        result = []
+        for options in [options_a, options_b]:
+            dst = tempfile.mkdtemp()
+            try:
+                args = dict(kwargs)
+                args.update(options)
+                generate(dst, prefix, split, **args)
+                result.append(code_size(dst, prefix))
+                result.append(run_time(dst, prefix, runs))
+            finally:
+                shutil.rmtree(dst)
+
+        print "%-14s %8d %8d %8.1f %8.1f" % (
+            prefix, result[0], result[2], result[1], result[3])
+
+
+def compare_entries(options_a, options_b, runs=RUNS):
+    '''
+    Prints a table comparing handler entries and run time of each plugin,
+    when compiled with options_a and with options_b
+    '''
+    print "%-14s %8s %8s %8s %8s" % ("plugin", "entry A", "entry B",
+                                     "ns A", "ns B")
+    for prefix, split, kwargs in PLUGINS:
+        result = []
+        for options in [options_a, options_b]:
+            dst = tempfile.mkdtemp()
+            try:
+                args = dict(kwargs)
+                args.update(options)
+                generate(dst, prefix, split, **args)
+                result.append(handler_entries(dst, prefix))
+                result.append(run_time(dst, prefix, runs))
+            finally:
+                shutil.rmtree(dst)
+
+        print "%-14s %8d %8d %8.1f %8.1f" % (
+            prefix, result[0], result[2], result[1], result[3])
+
+
+def compare_state_sizes(options_a, options_b):
+    '''
+    Prints a table comparing the size of state structs of each plugin,
+    when compiled with options_a and with options_b
+    '''
+    print "%-14s %8s %8s" % ("plugin", "state A", "state B")
+    for prefix, split, kwargs in PLUGINS:
+        result = []
+        for options in [options_a, options_b]:
+            dst = tempfile.mkdtemp()
+            try:
+                args = dict(kwargs)
+                args.update(options)
+                generate(dst, prefix, split, **args)
+                result.append(state_size(dst, prefix))
+            finally:
+                shutil.rmtree(dst)
+
+        print "%-14s %8d %8d" % (prefix, result[0], result[1])
+
+
+def compare_state_counts(options_a, options_b):
+    '''
+    Prints a table comparing the state count of each plugin, when
+    compiled with options_a and with options_b
+    '''
+    print "%-14s %8s %8s %8s" % ("plugin", "states A", "states B",
+                                 "removed")
+    for prefix, split, kwargs in PLUGINS:
+        result = []
+        for options in [options_a, options_b]:
+            dst = tempfile.mkdtemp()
+            try:
+                args = dict(kwargs)
+                args.update(options)
+                generate(dst, prefix, split, **args)
+                result.append(state_count(dst, prefix))
+            finally:
+                shutil.rmtree(dst)
+
+        print "%-14s %8d %8d %8d" % (prefix, result[0], result[1],
+                                     result[0] - result[1])
+
+
+def write_fields_plugin(dst, prefix, count):
+    '''
+    Writes into dst directory the manifest of a plugin with count request
+    and count response fields, and a source using its parser and composer
+    '''
+    fields = []
+    for i in range(count):
+        fields.append('<field name="f%s" type="%s" min="0" max="100" />' %
+                      (i, FIELD_TYPES[i % len(FIELD_TYPES)]))
+
+    f = open(os.path.join(dst, "manifest.xml"), 'wb')
+    f.write('<smartanthill.plugin id="%s" name="%s" version="1.0">\n' %
+            (prefix, prefix))
+    f.write("<description>Fields</description>\n")
+    f.write("<request>\n%s\n</request>\n" % "\n".join(fields))
+    f.write("<response>\n%s\n</response>\n" % "\n".join(fields))
+    f.write("</smartanthill.plugin>\n")
+    f.close()
+
+    f = open(os.path.join(dst, "%s.c" % prefix), 'wb')
+    f.write("void %s_fields(ZEPTO_PARSER* po, REPLY_HANDLE rh)\n" % prefix)
+    f.write("{\n")
+    f.write("%s_plugin_data d = %s_plugin_parser_read(po);\n" %
+            (prefix, prefix))
+    f.write("%s_plugin_reply_write(rh, %s);\n" % (
+        prefix, ", ".join("d.f%s" % i for i in range(count))))
+    f.write("}\n")
+    f.close()
+
+
+def compare_fields_tables(counts=FIELD_COUNTS):
+    '''
+    Prints a table comparing the code size of request parser and reply
+    composer, written with a papi call for each field and with field
+    tables, for manifests with each count of fields
+    '''
+    print "%-14s %8s %8s" % ("fields", "calls", "table")
+    for count in counts:
+        prefix = "fields%s" % count
+        result = []
+        for fields_table in [False, True]:
+            dst = tempfile.mkdtemp()
+            try:
+                write_fields_plugin(dst, prefix, count)
+                plugin = ZeptoPlugin(os.path.join(dst, "manifest.xml"))
+                f = open(os.path.join(dst, "%s.h" % prefix), 'wb')
+                f.write(api.process_manifest(
+                    plugin, prefix, False, os.path.join("tests", "papi.h"),
+                    fields_table))
+                f.close()
+
+                obj = os.path.join(dst, "%s.o" % prefix)
+                subprocess.check_call(run.gcc_command(
+                    prefix, [dst, "tests"],
+                    ["-c", "-o", obj, os.path.join(dst, "%s.c" % prefix)]))
+                out = subprocess.check_output(["size", obj]).splitlines()
+                result.append(int(out[-1].split()[0]))
+            finally:
+                shutil.rmtree(dst)
+
+        print "%-14s %8d %8d" % (count, result[0], result[1])
+
+
+def compare_splits(splits=SPLITS):
+    '''
+    Prints a table with the state count and code size of each plugin,
+    for each split granularity
+    '''
+    print "%-14s" % "plugin",
+    for split in splits:
+        print "%13s" % split,
+    print
+
+    for prefix, _, kwargs in PLUGINS:
+        print "%-14s" % prefix,
+        for split in splits:
+            dst = tempfile.mkdtemp()
+            try:
+                generate(dst, prefix, split, **kwargs)
+                print "%4d %8d" % (state_count(dst, prefix),
+                                   code_size(dst, prefix)),
+            finally:
+                shutil.rmtree(dst)
+        print
+
+
+def main():
+
+    if sys.argv[1:] == ['split']:
+        compare_splits()
+    elif sys.argv[1:] == ['poll']:
+        compare_entries({}, {'fast_polls': 4})
+    elif sys.argv[1:] == ['peephole']:
+        compare_state_counts({}, {'peephole': True})
+    elif sys.argv[1:] == ['micro_sleep']:
+        compare_state_counts({}, {'micro_sleep': 5})
+    elif sys.argv[1:] == ['fields']:
+        compare_fields_tables()
+    elif sys.argv[1:] == ['fold']:
+        compare_state_counts({}, {'fold': True})
+        compare({}, {'fold': True})
+    elif sys.argv[1:] == ['outline']:
+        compare({}, {'outline_waits': 4})
+    elif sys.argv[1:] == ['parse']:
+        compare({}, {'parse_in_place': True})
+    elif sys.argv[1:] == ['promote']:
+        compare({}, {'promote_vars': 4})
+    elif sys.argv[1:] == ['state']:
+        compare_state_sizes({'narrow_vars': False, 'pack_state': False},
+                            {'pack_state': True})
+    else:
+        compare({}, {'computed_goto': True})
+
+
+# temporary entrance
+if __name__ == "__main__":
+    main()
+    sys.exit()
@@ -0,0 +1,127 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#if !defined __SA_FIELDS_TABLE_PLUGIN_H__
+#define __SA_FIELDS_TABLE_PLUGIN_H__
+
+#include <stdint.h>
+#include "papi.h"
+
+#include <stddef.h>
+
+#if !defined __SA_FIELD_TABLE__
+#define __SA_FIELD_TABLE__
+
+#define SA_FIELD_BYTE 0
+#define SA_FIELD_ENCODED_UINT16 1
+#define SA_FIELD_ENCODED_SIGNED_INT16 2
+
+typedef struct _sa_field
+{
+uint8_t offset;
+uint8_t encoding;
+} sa_field;
+
+#endif // __SA_FIELD_TABLE__
+
+struct _fields_table_plugin_data
+{
+uint16_t delay_ms;
+uint8_t total_blinks;
+int16_t offset;
+};
+typedef struct _fields_table_plugin_data fields_table_plugin_data;
+#if !defined __SA_FIELD_PARSER__
+#define __SA_FIELD_PARSER__
+static void sa_parser_read_fields(ZEPTO_PARSER* sa_po, void* sa_data, const sa_field* sa_fields, uint8_t sa_count)
+{
+uint8_t sa_i;
+for(sa_i = 0; sa_i != sa_count; ++sa_i) {
+uint8_t* sa_p = (uint8_t*)sa_data + sa_fields[sa_i].offset;
+switch(sa_fields[sa_i].encoding) {
+case SA_FIELD_BYTE: *sa_p = papi_parser_read_byte(sa_po); break;
+case SA_FIELD_ENCODED_UINT16: *(uint16_t*)sa_p = papi_parser_read_encoded_uint16(sa_po); break;
+default: *(int16_t*)sa_p = papi_parser_read_encoded_signed_int16(sa_po); break;
+}
+}
+}
+#endif // __SA_FIELD_PARSER__
+static inline fields_table_plugin_data fields_table_plugin_parser_read(ZEPTO_PARSER* sa_po)
+{
+fields_table_plugin_data sa_res;
+static const sa_field sa_fields[] = {
+{offsetof(fields_table_plugin_data, delay_ms), SA_FIELD_ENCODED_UINT16},
+{offsetof(fields_table_plugin_data, total_blinks), SA_FIELD_BYTE},
+{offsetof(fields_table_plugin_data, offset), SA_FIELD_ENCODED_SIGNED_INT16},
+};
+sa_parser_read_fields(sa_po, &sa_res, sa_fields, 3);
+return sa_res;
+}
+#if !defined __SA_FIELD_COMPOSER__
+#define __SA_FIELD_COMPOSER__
+static void sa_reply_write_fields(REPLY_HANDLE sa_rh, const void* sa_data, const sa_field* sa_fields, uint8_t sa_count)
+{
+uint8_t sa_i;
+for(sa_i = 0; sa_i != sa_count; ++sa_i) {
+const uint8_t* sa_p = (const uint8_t*)sa_data + sa_fields[sa_i].offset;
+switch(sa_fields[sa_i].encoding) {
+case SA_FIELD_BYTE: papi_reply_write_byte(sa_rh, *sa_p); break;
+case SA_FIELD_ENCODED_UINT16: papi_reply_write_encoded_uint16(sa_rh, *(const uint16_t*)sa_p); break;
+default: papi_reply_write_encoded_signed_int16(sa_rh, *(const int16_t*)sa_p); break;
+}
+}
+}
+#endif // __SA_FIELD_COMPOSER__
+static inline void fields_table_plugin_reply_write(REPLY_HANDLE sa_rh, uint8_t made_blinks, uint16_t elapsed_ms)
+{
+struct sa_reply {
+uint8_t made_blinks;
+uint16_t elapsed_ms;
+} sa_data;
+static const sa_field sa_fields[] = {
+{offsetof(struct sa_reply, made_blinks), SA_FIELD_BYTE},
+{offsetof(struct sa_reply, elapsed_ms), SA_FIELD_ENCODED_UINT16},
+};
+sa_data.made_blinks = made_blinks;
+sa_data.elapsed_ms = elapsed_ms;
+sa_reply_write_fields(sa_rh, &sa_data, sa_fields, 2);
+}
+struct _fields_table_plugin_config
+{
+uint8_t pin_led;
+};
+typedef struct _fields_table_plugin_config fields_table_plugin_config;
+
+typedef struct _fields_table_plugin_persistent_state
+{
+uint8_t sa_dummy;
+} fields_table_plugin_persistent_state;
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+uint8_t fields_table_plugin_handler_init( const void* plugin_config, void* plugin_state );
+uint8_t fields_table_plugin_exec_init( const void* plugin_config, void* plugin_state );
+uint8_t fields_table_plugin_handler( const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte );
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // __SA_FIELDS_TABLE_PLUGIN_H__
@@ -0,0 +1,78 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+#include "papi.h"
+#include "inline.h"
+#include "inline_state.h"
+
+uint8_t inline_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t inline_plugin_handler_init(const void* plugin_config,
+                                    void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+void send_command(uint8_t spi_id, uint16_t command)
+{
+    /* small helper, will be inlined */
+    papi_wait_for_spi_send(spi_id, 0x0003, 0x08, command, 0x02);
+    papi_sleep( 10 );
+}
+
+void wait_response(uint8_t spi_id, uint16_t* response)
+{
+    /* small helper, will be inlined */
+    uint16_t value = 0;
+    papi_wait_for_spi_receive( spi_id,  0x0000, 0x08, &value );
+    *response = value;
+
+    return;
+}
+
+uint8_t read_twice(uint8_t spi_id)
+{
+    /* returns a value, so it keeps its own state machine */
+    uint16_t response = 0;
+    send_command(spi_id, 0x0001);
+    wait_response(spi_id, &response);
+    return (uint8_t)response;
+}
+
+uint8_t inline_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    const inline_plugin_config* pc = (const inline_plugin_config*) plugin_config;
+
+    uint16_t data = papi_parser_read_encoded_uint16( command );
+    send_command(pc->spi_id, data);
+
+    uint16_t response = 0;
+    wait_response(pc->spi_id, &response);
+
+    uint8_t value = read_twice(pc->spi_id);
+    if(value != 0) {
+        send_command(pc->spi_id, response);
+    }
+
+    papi_reply_write_encoded_uint16( reply, response );
+
+    return PLUGIN_OK;
+}
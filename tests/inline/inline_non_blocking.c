@@ -0,0 +1,204 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "inline_state.h"
+#include "papi.h"
+#include "inline.h"
+#include "inline_state.h"
+#line 21 "inline.c"
+uint8_t inline_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 23 "inline.c"
+return PLUGIN_OK;
+}
+
+uint8_t inline_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+#line 49 "inline.c"
+uint8_t read_twice(void* sa_state0, waiting_for* sa_wf, uint8_t* sa_result, uint8_t spi_id)
+{
+inline_plugin_state1* sa_state = (inline_plugin_state1*)sa_state0;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+default: ZEPTO_ASSERT(0);
+}
+#line 52 "inline.c"
+sa_state->response = 0;
+{
+#line 53 "inline.c"
+sa_state->sa_send_command_spi_id = spi_id;
+#line 53 "inline.c"
+uint16_t sa_send_command_command = 0x0001;
+#line 35 "inline.c"
+papi_start_sending_spi_command_16((sa_state->sa_send_command_spi_id), 0x0003, 0x08, sa_send_command_command, 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, (sa_state->sa_send_command_spi_id));
+sa_state->sa_next = 1;
+*sa_result = PLUGIN_WAITING;
+return 0;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, (sa_state->sa_send_command_spi_id)))
+{
+*sa_result = PLUGIN_WAITING;
+return 0;
+}
+#line 36 "inline.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, 10);
+sa_state->sa_next = 2;
+*sa_result = PLUGIN_WAITING;
+return 0;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+*sa_result = PLUGIN_WAITING;
+return 0;
+}
+}
+{
+#line 54 "inline.c"
+sa_state->sa_wait_response_spi_id = spi_id;
+#line 54 "inline.c"
+sa_state->sa_wait_response_response = &(sa_state->response);
+#line 42 "inline.c"
+sa_state->sa_wait_response_value = 0;
+papi_start_receiving_spi_data_16((sa_state->sa_wait_response_spi_id), 0x0000, 0x08, &(sa_state->sa_wait_response_value));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, (sa_state->sa_wait_response_spi_id));
+sa_state->sa_next = 3;
+*sa_result = PLUGIN_WAITING;
+return 0;
+label_3:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, (sa_state->sa_wait_response_spi_id)))
+{
+*sa_result = PLUGIN_WAITING;
+return 0;
+}
+#line 44 "inline.c"
+*(sa_state->sa_wait_response_response)=(sa_state->sa_wait_response_value);
+}
+sa_state->sa_next = 0;
+#line 55 "inline.c"
+return (uint8_t)(sa_state->response);
+}
+
+uint8_t inline_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+inline_plugin_state* sa_state = (inline_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+
+uint8_t sa_result0 = PLUGIN_OK;
+
+uint8_t* sa_result = &sa_result0;
+#line 62 "inline.c"
+const inline_plugin_config* pc = (const inline_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+case 4: goto label_4;
+case 5: goto label_5;
+case 6: goto label_6;
+default: ZEPTO_ASSERT(0);
+}
+#line 64 "inline.c"
+uint16_t data = papi_parser_read_encoded_uint16(command);
+{
+#line 65 "inline.c"
+sa_state->sa_send_command_spi_id = pc->spi_id;
+#line 65 "inline.c"
+uint16_t sa_send_command_command = data;
+#line 35 "inline.c"
+papi_start_sending_spi_command_16((sa_state->sa_send_command_spi_id), 0x0003, 0x08, sa_send_command_command, 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, (sa_state->sa_send_command_spi_id));
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, (sa_state->sa_send_command_spi_id)))
+{
+return PLUGIN_WAITING;
+}
+#line 36 "inline.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, 10);
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+#line 67 "inline.c"
+sa_state->response = 0;
+{
+#line 68 "inline.c"
+sa_state->sa_wait_response_spi_id = pc->spi_id;
+#line 68 "inline.c"
+sa_state->sa_wait_response_response = &(sa_state->response);
+#line 42 "inline.c"
+sa_state->sa_wait_response_value = 0;
+papi_start_receiving_spi_data_16((sa_state->sa_wait_response_spi_id), 0x0000, 0x08, &(sa_state->sa_wait_response_value));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, (sa_state->sa_wait_response_spi_id));
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, (sa_state->sa_wait_response_spi_id)))
+{
+return PLUGIN_WAITING;
+}
+#line 44 "inline.c"
+*(sa_state->sa_wait_response_response)=(sa_state->sa_wait_response_value);
+}
+*(uint8_t*)(sa_state + 1) = 0;
+sa_state->sa_next = 4;
+label_4: 
+#line 70 "inline.c"
+sa_state->value = read_twice((void*)(sa_state + 1), sa_wf, sa_result, pc->spi_id);
+if(*(uint8_t*)(sa_state + 1) != 0) 
+return *sa_result;
+#line 71 "inline.c"
+if((sa_state->value)!=0)
+{
+{
+#line 72 "inline.c"
+sa_state->sa_send_command_spi_id1 = pc->spi_id;
+#line 72 "inline.c"
+uint16_t sa_send_command_command = (sa_state->response);
+#line 35 "inline.c"
+papi_start_sending_spi_command_16((sa_state->sa_send_command_spi_id1), 0x0003, 0x08, sa_send_command_command, 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, (sa_state->sa_send_command_spi_id1));
+sa_state->sa_next = 5;
+return PLUGIN_WAITING;
+label_5:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, (sa_state->sa_send_command_spi_id1)))
+{
+return PLUGIN_WAITING;
+}
+#line 36 "inline.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, 10);
+sa_state->sa_next = 6;
+return PLUGIN_WAITING;
+label_6:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+}
+#line 75 "inline.c"
+papi_reply_write_encoded_uint16(reply, (sa_state->response));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
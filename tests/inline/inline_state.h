@@ -0,0 +1,58 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#if !defined __SA_INLINE_PLUGIN_STATE_H__
+#define __SA_INLINE_PLUGIN_STATE_H__
+
+#include <stdint.h>
+
+
+typedef struct _inline_plugin_state1 {
+uint8_t sa_next;
+#line 53 "inline.c"
+uint8_t sa_send_command_spi_id;
+#line 52 "inline.c"
+uint16_t response;
+
+uint8_t sa_wait_response_spi_id;
+#line 54 "inline.c"
+uint16_t* sa_wait_response_response;
+#line 42 "inline.c"
+uint16_t sa_wait_response_value;
+} inline_plugin_state1;
+
+typedef struct _inline_plugin_state {
+uint8_t sa_next;
+#line 65 "inline.c"
+uint8_t sa_send_command_spi_id;
+
+
+uint8_t sa_wait_response_spi_id;
+#line 68 "inline.c"
+uint16_t* sa_wait_response_response;
+#line 42 "inline.c"
+uint16_t sa_wait_response_value;
+#line 70 "inline.c"
+uint8_t value;
+#line 67 "inline.c"
+uint16_t response;
+#line 72 "inline.c"
+uint8_t sa_send_command_spi_id1;
+} inline_plugin_state;
+
+#endif // __SA_INLINE_PLUGIN_STATE_H__
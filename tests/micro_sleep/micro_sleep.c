@@ -0,0 +1,63 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+#include "papi.h"
+#include "micro_sleep.h"
+#include "micro_sleep_state.h"
+
+uint8_t micro_sleep_plugin_exec_init(const void* plugin_config,
+                                     void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t micro_sleep_plugin_handler_init(const void* plugin_config,
+                                        void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+void strobe(uint8_t spi_id)
+{
+    // only short sleeps, no states
+    papi_sleep( 1 );
+    papi_sleep( 2 );
+}
+
+uint8_t micro_sleep_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    const micro_sleep_plugin_config* pc = (const micro_sleep_plugin_config*) plugin_config;
+
+    uint16_t data = papi_parser_read_encoded_uint16( command );
+
+    strobe(pc->spi_id);
+
+    papi_wait_for_spi_send(pc->spi_id, 0x0003, 0x08, data, 0x02);
+
+    // busy wait, no state change
+    papi_sleep( 3 );
+
+    // too long, still a state change
+    papi_sleep( 100 );
+
+    // not a literal, still a state change
+    papi_sleep( data );
+
+    papi_reply_write_encoded_uint16( reply, data );
+
+    return PLUGIN_OK;
+}
@@ -0,0 +1,98 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "micro_sleep_state.h"
+#include "papi.h"
+#include "micro_sleep.h"
+#include "micro_sleep_state.h"
+#line 20 "micro_sleep.c"
+uint8_t micro_sleep_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+return PLUGIN_OK;
+}
+
+uint8_t micro_sleep_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+
+void strobe(uint8_t spi_id)
+{
+{
+SA_TIME_VAL sa_tv = 1;
+papi_gravely_power_inefficient_micro_sleep(&sa_tv);
+}
+{
+#line 36 "micro_sleep.c"
+SA_TIME_VAL sa_tv = 2;
+papi_gravely_power_inefficient_micro_sleep(&sa_tv);
+}
+}
+#line 39 "micro_sleep.c"
+uint8_t micro_sleep_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+micro_sleep_plugin_state* sa_state = (micro_sleep_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+const micro_sleep_plugin_config* pc = (const micro_sleep_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+default: ZEPTO_ASSERT(0);
+}
+#line 45 "micro_sleep.c"
+sa_state->data = papi_parser_read_encoded_uint16(command);
+
+strobe(pc->spi_id);
+
+papi_start_sending_spi_command_16(pc->spi_id, 0x0003, 0x08, (sa_state->data), 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, pc->spi_id);
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+{
+#line 52 "micro_sleep.c"
+SA_TIME_VAL sa_tv = 3;
+papi_gravely_power_inefficient_micro_sleep(&sa_tv);
+}
+papi_wait_handler_add_wait_for_timeout(sa_wf, 100);
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 58 "micro_sleep.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->data));
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 60 "micro_sleep.c"
+papi_reply_write_encoded_uint16(reply, (sa_state->data));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
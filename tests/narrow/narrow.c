@@ -0,0 +1,70 @@
+/*******************************************************************************
+Copyright (C) 2015 OLogN Technologies AG
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*******************************************************************************/
+
+#include "papi.h"
+
+#include "narrow.h"
+
+uint8_t narrow_plugin_handler_init( const void* plugin_config, void* plugin_state )
+{
+	return PLUGIN_OK;
+}
+
+uint8_t narrow_plugin_exec_init( const void* plugin_config, void* plugin_state )
+{
+    return PLUGIN_OK;
+}
+
+uint8_t narrow_plugin_handler( const void* plugin_config, void* plugin_persistent_state,
+    void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply,
+    waiting_for* wf, uint8_t first_byte )
+{
+    narrow_plugin_data req = narrow_plugin_parser_read(command);
+
+    uint16_t count = req.total_blinks;
+    uint16_t delay = req.delay_ms;
+    uint32_t total = delay * 10;
+    int16_t step = 100;
+    uint16_t i = 0;
+
+    for (i = 0; i < count; i++) {
+        papi_sleep(delay);
+    }
+
+    uint16_t left = count;
+    while (left > 0) {
+        papi_sleep(delay);
+        left--;
+    }
+
+    // may wrap around, keeps its type
+    uint16_t n = count;
+    do {
+        n--;
+        papi_sleep(delay);
+    } while (n > 0);
+
+    uint16_t raw = papi_parser_read_encoded_uint16(command);
+    papi_sleep(delay);
+
+    if (step > 0 && total > 5000) {
+        papi_sleep(delay);
+    }
+
+    papi_reply_write_encoded_uint16(reply, i + left + raw);
+    return PLUGIN_OK;
+}
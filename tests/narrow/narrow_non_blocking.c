@@ -0,0 +1,126 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "narrow_state.h"
+#include "papi.h"
+#include "narrow.h"
+#line 22 "narrow.c"
+uint8_t narrow_plugin_handler_init(const void* plugin_config, void* plugin_state)
+{
+return PLUGIN_OK;
+}
+
+uint8_t narrow_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 29 "narrow.c"
+return PLUGIN_OK;
+}
+
+uint8_t narrow_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+narrow_plugin_state* sa_state = (narrow_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+case 4: goto label_4;
+case 5: goto label_5;
+default: ZEPTO_ASSERT(0);
+}
+#line 36 "narrow.c"
+narrow_plugin_data req = narrow_plugin_parser_read(command);
+
+sa_state->count = req.total_blinks;
+sa_state->delay = req.delay_ms;
+sa_state->total = (sa_state->delay)*10;
+sa_state->step = 100;
+sa_state->i = 0;
+
+for((sa_state->i)=0; ((uint16_t)sa_state->i)<((uint16_t)sa_state->count);  (sa_state->i)++)
+{
+#line 45 "narrow.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+#line 48 "narrow.c"
+sa_state->left = ((uint16_t)sa_state->count);
+while(((uint16_t)sa_state->left)>0)
+{
+#line 50 "narrow.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 51 "narrow.c"
+(sa_state->left)--;
+}
+
+
+sa_state->n = ((uint16_t)sa_state->count);
+do
+{
+#line 57 "narrow.c"
+(sa_state->n)--;
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+#line 59 "narrow.c"
+while((sa_state->n)>0);
+
+sa_state->raw = papi_parser_read_encoded_uint16(command);
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 4;
+return PLUGIN_WAITING;
+label_4:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 64 "narrow.c"
+if(((int16_t)sa_state->step)>0&&((uint32_t)sa_state->total)>5000)
+{
+#line 65 "narrow.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 5;
+return PLUGIN_WAITING;
+label_5:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+#line 68 "narrow.c"
+papi_reply_write_encoded_uint16(reply, ((uint16_t)sa_state->i)+((uint16_t)sa_state->left)+(sa_state->raw));
+sa_state->sa_next = 0;
+#line 69 "narrow.c"
+return PLUGIN_OK;
+}
@@ -0,0 +1,46 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#if !defined __SA_NARROW_PLUGIN_STATE_H__
+#define __SA_NARROW_PLUGIN_STATE_H__
+
+#include <stdint.h>
+
+
+typedef struct _narrow_plugin_state {
+uint8_t sa_next;
+#line 42 "narrow.c"
+uint8_t i;
+#line 38 "narrow.c"
+uint8_t count;
+uint16_t delay;
+#line 48 "narrow.c"
+uint8_t left;
+#line 55 "narrow.c"
+uint16_t n;
+#line 41 "narrow.c"
+uint8_t step;
+#line 40 "narrow.c"
+uint16_t total;
+#line 61 "narrow.c"
+uint16_t raw;
+} narrow_plugin_state;
+
+// range narrowing saved 6 bytes of state
+
+#endif // __SA_NARROW_PLUGIN_STATE_H__
@@ -0,0 +1,175 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "outline_state.h"
+#include "papi.h"
+#include "outline.h"
+#include "outline_state.h"
+#line 20 "outline.c"
+uint8_t outline_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 22 "outline.c"
+return PLUGIN_OK;
+}
+
+uint8_t outline_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+#if !defined SA_NOINLINE
+#if defined __GNUC__
+#define SA_NOINLINE __attribute__((noinline))
+#else
+#define SA_NOINLINE
+#endif
+#endif
+static SA_NOINLINE void sa_wait_spi_send(waiting_for* sa_wf, uint8_t sa_id, uint16_t sa_addr, uint8_t sa_addr_sz, uint16_t sa_command, uint8_t sa_command_sz)
+{
+papi_start_sending_spi_command_16(sa_id, sa_addr, sa_addr_sz, sa_command, sa_command_sz);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, sa_id);
+}
+#line 31 "outline.c"
+void write_register(void* sa_state0, waiting_for* sa_wf, uint8_t* sa_result, uint8_t spi_id, uint16_t addr, uint16_t value)
+{
+outline_plugin_state1* sa_state = (outline_plugin_state1*)sa_state0;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+default: ZEPTO_ASSERT(0);
+}
+#line 33 "outline.c"
+sa_wait_spi_send(sa_wf, spi_id, addr, 0x08, value, 0x02);
+sa_state->sa_next = 1;
+*sa_result = PLUGIN_WAITING;
+return;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, spi_id))
+{
+*sa_result = PLUGIN_WAITING;
+return;
+}
+#line 34 "outline.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, 10);
+sa_state->sa_next = 2;
+*sa_result = PLUGIN_WAITING;
+return;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+*sa_result = PLUGIN_WAITING;
+return;
+}
+sa_state->sa_next = 0;
+}
+#line 37 "outline.c"
+uint8_t outline_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+outline_plugin_state* sa_state = (outline_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+
+uint8_t sa_result0 = PLUGIN_OK;
+
+uint8_t* sa_result = &sa_result0;
+#line 41 "outline.c"
+const outline_plugin_config* pc = (const outline_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+case 4: goto label_4;
+case 5: goto label_5;
+case 6: goto label_6;
+case 7: goto label_7;
+case 8: goto label_8;
+default: ZEPTO_ASSERT(0);
+}
+#line 43 "outline.c"
+sa_state->data = papi_parser_read_encoded_uint16(command);
+sa_wait_spi_send(sa_wf, pc->spi_id, 0x0001, 0x08, (sa_state->data), 0x02);
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 45 "outline.c"
+sa_wait_spi_send(sa_wf, pc->spi_id, 0x0002, 0x08, (sa_state->data), 0x02);
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 46 "outline.c"
+sa_wait_spi_send(sa_wf, pc->spi_id, 0x0007, 0x08, (sa_state->data), 0x02);
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 47 "outline.c"
+sa_wait_spi_send(sa_wf, pc->spi_id, 0x0008, 0x08, (sa_state->data), 0x02);
+sa_state->sa_next = 4;
+return PLUGIN_WAITING;
+label_4:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+*(uint8_t*)(sa_state + 1) = 0;
+sa_state->sa_next = 5;
+label_5: 
+#line 48 "outline.c"
+write_register((void*)(sa_state + 1), sa_wf, sa_result, pc->spi_id, 0x0003, (sa_state->data));
+if(*(uint8_t*)(sa_state + 1) != 0) 
+return *sa_result;
+#line 50 "outline.c"
+sa_state->response = 0;
+papi_start_receiving_spi_data_16(pc->spi_id, 0x0004, 0x08, &(sa_state->response));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, pc->spi_id);
+sa_state->sa_next = 6;
+return PLUGIN_WAITING;
+label_6:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 52 "outline.c"
+papi_start_sending_i2c_command_16(pc->spi_id, 0x0005, 0x08, (sa_state->response), 0x02);
+papi_wait_handler_add_wait_for_i2c_send(sa_wf, pc->spi_id);
+sa_state->sa_next = 7;
+return PLUGIN_WAITING;
+label_7:if(papi_wait_handler_is_waiting_for_i2c_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 53 "outline.c"
+papi_start_receiving_spi_data_16(pc->spi_id, 0x0006, 0x08, &(sa_state->response));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, pc->spi_id);
+sa_state->sa_next = 8;
+return PLUGIN_WAITING;
+label_8:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 55 "outline.c"
+papi_reply_write_encoded_uint16(reply, (sa_state->response));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
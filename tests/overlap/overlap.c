@@ -0,0 +1,66 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+#include "papi.h"
+#include "overlap.h"
+#include "overlap_state.h"
+
+uint8_t overlap_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t overlap_plugin_handler_init(const void* plugin_config,
+                                    void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+
+uint8_t overlap_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    const overlap_plugin_config* pc = (const overlap_plugin_config*) plugin_config;
+
+    uint16_t data = papi_parser_read_encoded_uint16( command );
+
+    // different buses, started together
+    papi_wait_for_spi_send(pc->spi_id, 0x0003, 0x08, data, 0x02);
+    papi_wait_for_i2c_send(pc->i2c_id, 0x0003, 0x08, data, 0x02);
+
+    // sleeps are not overlapped by default
+    papi_sleep( 100 );
+
+    uint16_t spi_response = 0;
+    uint16_t i2c_response = 0;
+    papi_wait_for_spi_receive( pc->spi_id, 0x0000, 0x08, &spi_response );
+    papi_wait_for_i2c_receive( pc->i2c_id, 0x0000, 0x08, &i2c_response );
+
+    // same bus, but different known ids
+    papi_wait_for_spi_send(0, 0x0003, 0x08, spi_response, 0x02);
+    papi_wait_for_spi_send(1, 0x0003, 0x08, i2c_response, 0x02);
+
+    // same bus and unknown id, waits for the previous one
+    papi_wait_for_spi_receive( pc->spi_id, 0x0000, 0x08, &spi_response );
+    // reads data written by previous receive
+    papi_wait_for_i2c_send(pc->i2c_id, 0x0003, 0x08, spi_response, 0x02);
+
+    papi_reply_write_encoded_uint16( reply, spi_response );
+    papi_reply_write_encoded_uint16( reply, i2c_response );
+
+    return PLUGIN_OK;
+}
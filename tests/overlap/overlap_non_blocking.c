@@ -0,0 +1,125 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "overlap_state.h"
+#include "papi.h"
+#include "overlap.h"
+#include "overlap_state.h"
+#line 21 "overlap.c"
+uint8_t overlap_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 23 "overlap.c"
+return PLUGIN_OK;
+}
+
+uint8_t overlap_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+
+
+uint8_t overlap_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+overlap_plugin_state* sa_state = (overlap_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+const overlap_plugin_config* pc = (const overlap_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+case 4: goto label_4;
+case 5: goto label_5;
+case 6: goto label_6;
+default: ZEPTO_ASSERT(0);
+}
+#line 39 "overlap.c"
+uint16_t data = papi_parser_read_encoded_uint16(command);
+
+
+papi_start_sending_spi_command_16(pc->spi_id, 0x0003, 0x08, data, 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, pc->spi_id);
+#line 43 "overlap.c"
+papi_start_sending_i2c_command_16(pc->i2c_id, 0x0003, 0x08, data, 0x02);
+papi_wait_handler_add_wait_for_i2c_send(sa_wf, pc->i2c_id);
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id) || papi_wait_handler_is_waiting_for_i2c_send(sa_wf, pc->i2c_id))
+{
+return PLUGIN_WAITING;
+}
+#line 46 "overlap.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, 100);
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 48 "overlap.c"
+sa_state->spi_response = 0;
+sa_state->i2c_response = 0;
+papi_start_receiving_spi_data_16(pc->spi_id, 0x0000, 0x08, &(sa_state->spi_response));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, pc->spi_id);
+#line 51 "overlap.c"
+papi_start_receiving_i2c_data_16(pc->i2c_id, 0x0000, 0x08, &(sa_state->i2c_response));
+papi_wait_handler_add_wait_for_i2c_receive(sa_wf, pc->i2c_id);
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, pc->spi_id) || papi_wait_handler_is_waiting_for_i2c_receive(sa_wf, pc->i2c_id))
+{
+return PLUGIN_WAITING;
+}
+#line 54 "overlap.c"
+papi_start_sending_spi_command_16(0, 0x0003, 0x08, (sa_state->spi_response), 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, 0);
+#line 55 "overlap.c"
+papi_start_sending_spi_command_16(1, 0x0003, 0x08, (sa_state->i2c_response), 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, 1);
+sa_state->sa_next = 4;
+return PLUGIN_WAITING;
+label_4:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, 0) || papi_wait_handler_is_waiting_for_spi_send(sa_wf, 1))
+{
+return PLUGIN_WAITING;
+}
+#line 58 "overlap.c"
+papi_start_receiving_spi_data_16(pc->spi_id, 0x0000, 0x08, &(sa_state->spi_response));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, pc->spi_id);
+sa_state->sa_next = 5;
+return PLUGIN_WAITING;
+label_5:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 60 "overlap.c"
+papi_start_sending_i2c_command_16(pc->i2c_id, 0x0003, 0x08, (sa_state->spi_response), 0x02);
+papi_wait_handler_add_wait_for_i2c_send(sa_wf, pc->i2c_id);
+sa_state->sa_next = 6;
+return PLUGIN_WAITING;
+label_6:if(papi_wait_handler_is_waiting_for_i2c_send(sa_wf, pc->i2c_id))
+{
+return PLUGIN_WAITING;
+}
+#line 62 "overlap.c"
+papi_reply_write_encoded_uint16(reply, (sa_state->spi_response));
+papi_reply_write_encoded_uint16(reply, (sa_state->i2c_response));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
@@ -0,0 +1,60 @@
+/*******************************************************************************
+Copyright (C) 2015 OLogN Technologies AG
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*******************************************************************************/
+
+#include "papi.h"
+
+#include "pack.h"
+
+uint8_t pack_plugin_handler_init( const void* plugin_config, void* plugin_state )
+{
+	return PLUGIN_OK;
+}
+
+uint8_t pack_plugin_exec_init( const void* plugin_config, void* plugin_state )
+{
+    return PLUGIN_OK;
+}
+
+uint8_t pack_plugin_handler( const void* plugin_config, void* plugin_persistent_state,
+    void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply,
+    waiting_for* wf, uint8_t first_byte )
+{
+    const pack_plugin_config* pc = (pack_plugin_config*)plugin_config;
+    pack_plugin_data req = pack_plugin_parser_read(command);
+
+    uint8_t count = req.total_blinks;
+    uint16_t delay = req.delay_ms;
+    bool on = true;
+    bool done = false;
+    uint8_t phase = 0;
+    uint8_t i = 0;
+
+    for (i = 0; i < count; i++) {
+        papi_write_digital_pin(pc->pin_led, on);
+        papi_sleep(delay);
+        on = !on;
+        phase = (phase + 1) % 4;
+    }
+
+    done = true;
+    papi_sleep(delay);
+
+    if (done) {
+        papi_reply_write_encoded_uint16(reply, i + phase);
+    }
+    return PLUGIN_OK;
+}
@@ -0,0 +1,89 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "pack_state.h"
+#include "papi.h"
+#include "pack.h"
+#line 22 "pack.c"
+uint8_t pack_plugin_handler_init(const void* plugin_config, void* plugin_state)
+{
+return PLUGIN_OK;
+}
+
+uint8_t pack_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 29 "pack.c"
+return PLUGIN_OK;
+}
+
+uint8_t pack_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+pack_plugin_state* sa_state = (pack_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+const pack_plugin_config* pc = (pack_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+default: ZEPTO_ASSERT(0);
+}
+#line 37 "pack.c"
+pack_plugin_data req = pack_plugin_parser_read(command);
+
+sa_state->count = req.total_blinks;
+sa_state->delay = req.delay_ms;
+sa_state->on = true;
+sa_state->done = false;
+sa_state->phase = 0;
+sa_state->i = 0;
+
+for((sa_state->i)=0; ((uint8_t)sa_state->i)<((uint8_t)sa_state->count);  (sa_state->i)++)
+{
+#line 47 "pack.c"
+papi_write_digital_pin(pc->pin_led, ((bool)sa_state->on));
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 49 "pack.c"
+(sa_state->on)=!((bool)sa_state->on);
+(sa_state->phase)=(((uint8_t)sa_state->phase)+1)%4;
+}
+
+(sa_state->done)=true;
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 56 "pack.c"
+if(((bool)sa_state->done))
+{
+#line 57 "pack.c"
+papi_reply_write_encoded_uint16(reply, ((uint8_t)sa_state->i)+((uint8_t)sa_state->phase));
+}
+sa_state->sa_next = 0;
+#line 59 "pack.c"
+return PLUGIN_OK;
+}
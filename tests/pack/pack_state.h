@@ -0,0 +1,45 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#if !defined __SA_PACK_PLUGIN_STATE_H__
+#define __SA_PACK_PLUGIN_STATE_H__
+
+#include <stdint.h>
+
+
+typedef struct _pack_plugin_state {
+uint8_t sa_next;
+#line 40 "pack.c"
+uint16_t delay;
+
+
+
+uint8_t i : 4;
+#line 39 "pack.c"
+uint8_t count : 4;
+
+
+
+uint8_t phase : 2;
+#line 41 "pack.c"
+bool on : 1;
+bool done : 1;
+} pack_plugin_state;
+
+// range narrowing and bit packing saved 3 bytes of state
+#endif // __SA_PACK_PLUGIN_STATE_H__
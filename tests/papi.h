@@ -28,6 +28,7 @@ typedef uint16_t SA_TIME_VAL;
 #define PLUGIN_OK 0
 #define PLUGIN_WAITING 1
 #define PLUGIN_DEBUG 2
+#define PLUGIN_YIELD 3
 
 void ZEPTO_ASSERT(bool condition);
 
@@ -84,6 +85,10 @@ void papi_wait_for_spi_receive( uint8_t spi_id, uint16_t addr, uint8_t addr_sz,
 void papi_wait_for_i2c_receive( uint8_t i2c_id, uint16_t addr, uint8_t addr_sz, uint16_t* data );
 void papi_wait_for_wait_handler( waiting_for* wf );
 
+//Blocking calls waiting for operations started by preceding papi_start_* calls
+void papi_wait_for_all();
+void papi_wait_for_any( uint8_t* completed );
+
 //Helper functions to fill waiting_for structure
 void papi_init_wait_handler( waiting_for* wf );
 void papi_wait_handler_add_wait_for_spi_send( waiting_for* wf, uint8_t spi_id );
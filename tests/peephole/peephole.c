@@ -0,0 +1,69 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+#include "papi.h"
+#include "peephole.h"
+#include "peephole_state.h"
+
+uint8_t peephole_plugin_exec_init(const void* plugin_config,
+                                  void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t peephole_plugin_handler_init(const void* plugin_config,
+                                     void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+void settle(uint8_t spi_id)
+{
+    // merged into a single sleep
+    papi_sleep( 10 );
+    papi_sleep( 20 );
+    papi_sleep( 30 );
+}
+
+uint8_t peephole_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    const peephole_plugin_config* pc = (const peephole_plugin_config*) plugin_config;
+
+    // debug state right before a sleep is removed
+    uint16_t data = papi_parser_read_encoded_uint16( command );
+
+    papi_sleep( 100 );
+    papi_sleep( 200 );
+
+    // not a literal, not merged
+    papi_sleep( data );
+
+    papi_wait_for_spi_send(pc->spi_id, 0x0003, 0x08, data, 0x02);
+
+    settle(pc->spi_id);
+
+    // debug state between these two is kept
+    uint16_t response = 0;
+    uint16_t doubled = data;
+
+    papi_wait_for_spi_receive( pc->spi_id, 0x0000, 0x08, &response );
+
+    // debug state right before return is removed
+    papi_reply_write_encoded_uint16( reply, response + doubled );
+
+    return PLUGIN_OK;
+}
@@ -0,0 +1,130 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "peephole_state.h"
+#include "papi.h"
+#include "peephole.h"
+#include "peephole_state.h"
+#line 20 "peephole.c"
+uint8_t peephole_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+return PLUGIN_OK;
+}
+
+uint8_t peephole_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+
+void settle(void* sa_state0, waiting_for* sa_wf, uint8_t* sa_result, uint8_t spi_id)
+{
+peephole_plugin_state1* sa_state = (peephole_plugin_state1*)sa_state0;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+default: ZEPTO_ASSERT(0);
+}
+#line 35 "peephole.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, 60);
+sa_state->sa_next = 1;
+*sa_result = PLUGIN_WAITING;
+return;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+*sa_result = PLUGIN_WAITING;
+return;
+}
+sa_state->sa_next = 0;
+}
+#line 40 "peephole.c"
+uint8_t peephole_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+peephole_plugin_state* sa_state = (peephole_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+
+uint8_t sa_result0 = PLUGIN_OK;
+
+uint8_t* sa_result = &sa_result0;
+#line 44 "peephole.c"
+const peephole_plugin_config* pc = (const peephole_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+case 4: goto label_4;
+case 5: goto label_5;
+case 6: goto label_6;
+default: ZEPTO_ASSERT(0);
+}
+#line 47 "peephole.c"
+sa_state->data = papi_parser_read_encoded_uint16(command);
+
+papi_wait_handler_add_wait_for_timeout(sa_wf, 300);
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 53 "peephole.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->data));
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 55 "peephole.c"
+papi_start_sending_spi_command_16(pc->spi_id, 0x0003, 0x08, (sa_state->data), 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, pc->spi_id);
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+*(uint8_t*)(sa_state + 1) = 0;
+sa_state->sa_next = 4;
+label_4: 
+#line 57 "peephole.c"
+settle((void*)(sa_state + 1), sa_wf, sa_result, pc->spi_id);
+if(*(uint8_t*)(sa_state + 1) != 0) 
+return *sa_result;
+sa_state->response = 0;
+sa_state->sa_next = 5;
+return PLUGIN_DEBUG;
+label_5: /* nop */ ;
+#line 61 "peephole.c"
+sa_state->doubled = (sa_state->data);
+
+papi_start_receiving_spi_data_16(pc->spi_id, 0x0000, 0x08, &(sa_state->response));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, pc->spi_id);
+sa_state->sa_next = 6;
+return PLUGIN_WAITING;
+label_6:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 66 "peephole.c"
+papi_reply_write_encoded_uint16(reply, (sa_state->response)+(sa_state->doubled));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
@@ -0,0 +1,60 @@
+/*******************************************************************************
+Copyright (C) 2015 OLogN Technologies AG
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*******************************************************************************/
+
+#include "papi.h"
+
+#include "profile.h"
+
+uint8_t profile_plugin_handler_init( const void* plugin_config, void* plugin_state )
+{
+	return PLUGIN_OK;
+}
+
+uint8_t profile_plugin_exec_init( const void* plugin_config, void* plugin_state )
+{
+    return PLUGIN_OK;
+}
+
+void recover(uint16_t delay)
+{
+    /* error path, never run at profile */
+    papi_sleep(delay);
+    papi_sleep(delay);
+}
+
+uint8_t profile_plugin_handler( const void* plugin_config, void* plugin_persistent_state,
+    void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply,
+    waiting_for* wf, uint8_t first_byte )
+{
+    profile_plugin_data req = profile_plugin_parser_read(command);
+    uint16_t delay = req.delay_ms;
+    uint8_t i = 0;
+
+    if (req.total_blinks > 10) {
+        recover(delay);
+    }
+
+    papi_sleep(delay);
+
+    for (i = 0; i < 10; i++) {
+        /* hot, resumed many times while waiting */
+        papi_sleep(delay);
+    }
+
+    papi_reply_write_byte(reply, i);
+    return PLUGIN_OK;
+}
@@ -0,0 +1,122 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "profile_state.h"
+#include "papi.h"
+#include "profile.h"
+#line 22 "profile.c"
+uint8_t profile_plugin_handler_init(const void* plugin_config, void* plugin_state)
+{
+return PLUGIN_OK;
+}
+
+uint8_t profile_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 29 "profile.c"
+return PLUGIN_OK;
+}
+
+SA_COLD void recover(void* sa_state0, waiting_for* sa_wf, uint8_t* sa_result, uint16_t delay)
+{
+profile_plugin_state1* sa_state = (profile_plugin_state1*)sa_state0;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+default: ZEPTO_ASSERT(0);
+}
+#line 35 "profile.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, delay);
+sa_state->sa_next = 1;
+*sa_result = PLUGIN_WAITING;
+return;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+*sa_result = PLUGIN_WAITING;
+return;
+}
+#line 36 "profile.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, delay);
+sa_state->sa_next = 2;
+*sa_result = PLUGIN_WAITING;
+return;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+*sa_result = PLUGIN_WAITING;
+return;
+}
+sa_state->sa_next = 0;
+}
+#line 39 "profile.c"
+uint8_t profile_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+profile_plugin_state* sa_state = (profile_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+
+uint8_t sa_result0 = PLUGIN_OK;
+
+uint8_t* sa_result = &sa_result0;
+if(sa_state->sa_next == 3) goto label_3;
+switch(sa_state->sa_next) {
+case 0: break;
+case 3: goto label_3;
+case 2: goto label_2;
+case 1: goto label_1;
+default: ZEPTO_ASSERT(0);
+}
+#line 43 "profile.c"
+profile_plugin_data req = profile_plugin_parser_read(command);
+sa_state->delay = req.delay_ms;
+sa_state->i = 0;
+
+if(req.total_blinks>10)
+{
+*(uint8_t*)(sa_state + 1) = 0;
+sa_state->sa_next = 1;
+label_1: SA_COLD_LABEL ; 
+#line 48 "profile.c"
+recover((void*)(sa_state + 1), sa_wf, sa_result, (sa_state->delay));
+if(*(uint8_t*)(sa_state + 1) != 0) 
+return *sa_result;
+}
+#line 51 "profile.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 53 "profile.c"
+for((sa_state->i)=0; (sa_state->i)<10;  (sa_state->i)++)
+{
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+#line 58 "profile.c"
+papi_reply_write_byte(reply, (sa_state->i));
+sa_state->sa_next = 0;
+#line 59 "profile.c"
+return PLUGIN_OK;
+}
@@ -0,0 +1,62 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+#include "papi.h"
+#include "promote.h"
+#include "promote_state.h"
+
+uint8_t promote_plugin_exec_init(const void* plugin_config,
+                                 void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t promote_plugin_handler_init(const void* plugin_config,
+                                    void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t promote_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    const promote_plugin_config* pc = (const promote_plugin_config*) plugin_config;
+
+    uint16_t data = papi_parser_read_encoded_uint16( command );
+    uint16_t sum = 0;
+    uint8_t i = 0;
+
+    papi_wait_for_spi_send(pc->spi_id, 0x0003, 0x08, data, 0x02);
+
+    // used in a loop within a single state, promoted
+    for ( i = 0; i < 32; ++i )
+    {
+        if ( papi_read_digital_pin( pc->spi_id ) )
+        {
+            sum += data + i;
+        }
+    }
+
+    papi_sleep( 10 );
+
+    // address is taken, not promoted
+    uint16_t response = 0;
+    papi_wait_for_spi_receive( pc->spi_id, 0x0000, 0x08, &response );
+
+    papi_reply_write_encoded_uint16( reply, sum + response );
+
+    return PLUGIN_OK;
+}
@@ -0,0 +1,103 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "promote_state.h"
+#include "papi.h"
+#include "promote.h"
+#include "promote_state.h"
+#line 20 "promote.c"
+uint8_t promote_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+return PLUGIN_OK;
+}
+
+uint8_t promote_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+
+uint8_t promote_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+promote_plugin_state* sa_state = (promote_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+const promote_plugin_config* pc = (const promote_plugin_config*)plugin_config;
+uint8_t sa_v_i = sa_state->i;
+uint16_t sa_v_sum = sa_state->sum;
+uint16_t sa_v_data = sa_state->data;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+default: ZEPTO_ASSERT(0);
+}
+#line 38 "promote.c"
+sa_v_data = papi_parser_read_encoded_uint16(command);
+sa_v_sum = 0;
+sa_v_i = 0;
+
+papi_start_sending_spi_command_16(pc->spi_id, 0x0003, 0x08, sa_v_data, 0x02);
+papi_wait_handler_add_wait_for_spi_send(sa_wf, pc->spi_id);
+sa_state->i = sa_v_i;
+sa_state->sum = sa_v_sum;
+sa_state->data = sa_v_data;
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_spi_send(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 45 "promote.c"
+for(sa_v_i=0; sa_v_i<32;  ++sa_v_i)
+{
+if(papi_read_digital_pin(pc->spi_id))
+{
+sa_v_sum+=sa_v_data+sa_v_i;
+}
+}
+
+papi_wait_handler_add_wait_for_timeout(sa_wf, 10);
+sa_state->i = sa_v_i;
+sa_state->sum = sa_v_sum;
+sa_state->data = sa_v_data;
+sa_state->sa_next = 2;
+return PLUGIN_WAITING;
+label_2:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 56 "promote.c"
+sa_state->response = 0;
+papi_start_receiving_spi_data_16(pc->spi_id, 0x0000, 0x08, &(sa_state->response));
+papi_wait_handler_add_wait_for_spi_receive(sa_wf, pc->spi_id);
+sa_state->i = sa_v_i;
+sa_state->sum = sa_v_sum;
+sa_state->data = sa_v_data;
+sa_state->sa_next = 3;
+return PLUGIN_WAITING;
+label_3:if(papi_wait_handler_is_waiting_for_spi_receive(sa_wf, pc->spi_id))
+{
+return PLUGIN_WAITING;
+}
+#line 59 "promote.c"
+papi_reply_write_encoded_uint16(reply, sa_v_sum+(sa_state->response));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
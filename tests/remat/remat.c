@@ -0,0 +1,70 @@
+/*******************************************************************************
+Copyright (C) 2015 OLogN Technologies AG
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*******************************************************************************/
+
+#include "papi.h"
+
+#include "remat.h"
+
+#define HAPI_GPIO_VALUE_LOW 0
+#define HAPI_GPIO_VALUE_HIGH 1
+#define HAPI_GPIO_TYPE_OUTPUT 0
+
+void hapi_gpio_init(uint16_t pin_num) {}
+void hapi_gpio_set_mode(uint16_t pin_num, uint8_t mode) {}
+
+
+uint8_t remat_plugin_handler_init( const void* plugin_config, void* plugin_state )
+{
+	return PLUGIN_OK;
+}
+
+uint8_t remat_plugin_exec_init( const void* plugin_config, void* plugin_state )
+{
+    return PLUGIN_OK;
+}
+
+uint8_t remat_plugin_handler( const void* plugin_config, void* plugin_persistent_state,
+    void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply,
+    waiting_for* wf, uint8_t first_byte )
+{
+    remat_plugin_config* pc = (remat_plugin_config*)plugin_config;
+
+    remat_plugin_data req = remat_plugin_parser_read(command);
+    uint8_t made = 0;
+
+    // cheap, recomputed on each resume
+    uint16_t level = pc->pin_led * 2 + HAPI_GPIO_VALUE_HIGH;
+
+    // costly, kept in state
+    uint8_t scaled = pc->pin_led / 3 / 5 / 7;
+
+    // handler is called again with a new first_byte, kept in state
+    uint8_t first = first_byte + 1;
+
+    while (made < req.total_blinks) {
+        // does not depend on the loop, recomputed too
+        uint16_t pin = pc->pin_led + 1;
+        papi_write_digital_pin(pin, HAPI_GPIO_VALUE_HIGH);
+        papi_sleep(req.delay_ms);
+        made++;
+    }
+
+    papi_write_digital_pin(pc->pin_led, HAPI_GPIO_VALUE_LOW);
+    papi_reply_write_byte(reply, made + scaled + first);
+    papi_reply_write_encoded_uint16(reply, level);
+	return PLUGIN_OK;
+}
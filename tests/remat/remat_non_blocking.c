@@ -0,0 +1,90 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "remat_state.h"
+#include "papi.h"
+#include "remat.h"
+#line 22 "remat.c"
+#define HAPI_GPIO_VALUE_LOW 0
+#define HAPI_GPIO_VALUE_HIGH 1
+#define HAPI_GPIO_TYPE_OUTPUT 0
+
+void hapi_gpio_init(uint16_t pin_num)
+{
+}
+#line 27 "remat.c"
+void hapi_gpio_set_mode(uint16_t pin_num, uint8_t mode)
+{
+}
+uint8_t remat_plugin_handler_init(const void* plugin_config, void* plugin_state)
+{
+return PLUGIN_OK;
+}
+
+uint8_t remat_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 37 "remat.c"
+return PLUGIN_OK;
+}
+
+uint8_t remat_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+remat_plugin_state* sa_state = (remat_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+remat_plugin_config* pc = (remat_plugin_config*)plugin_config;
+#line 50 "remat.c"
+uint16_t level = pc->pin_led*2+HAPI_GPIO_VALUE_HIGH;
+#line 60 "remat.c"
+uint16_t pin = pc->pin_led+1;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+default: ZEPTO_ASSERT(0);
+}
+#line 46 "remat.c"
+sa_state->req = remat_plugin_parser_read(command);
+sa_state->made = 0;
+#line 53 "remat.c"
+sa_state->scaled = pc->pin_led/3/5/7;
+
+
+sa_state->first = first_byte+1;
+
+while((sa_state->made)<(sa_state->req).total_blinks)
+{
+
+papi_write_digital_pin(pin, HAPI_GPIO_VALUE_HIGH);
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->req).delay_ms);
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+#line 63 "remat.c"
+(sa_state->made)++;
+}
+
+papi_write_digital_pin(pc->pin_led, HAPI_GPIO_VALUE_LOW);
+papi_reply_write_byte(reply, (sa_state->made)+(sa_state->scaled)+(sa_state->first));
+papi_reply_write_encoded_uint16(reply, level);
+sa_state->sa_next = 0;
+#line 69 "remat.c"
+return PLUGIN_OK;
+}
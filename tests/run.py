@@ -25,8 +25,24 @@ I use a shell script to set PATH for specific gcc instance to test,
 and then run this script
 '''
 
+GCC_FLAGS = ["-fno-exceptions", "-g", "-Os", "-Wall", "-ffunction-sections",
+             "-fdata-sections", "-std=c99"]
 
-def make_non_blocking(prefix, split_all):
+
+def gcc_command(prefix, include_dirs, extra=None):
+    '''
+    Returns the gcc command line used to build a plugin with the runner
+    '''
+    cmd = ["gcc"] + GCC_FLAGS
+    for each in include_dirs:
+        cmd.append("-I%s" % each)
+    cmd += ["-DSA_PLUGIN_ID=%s" % prefix, "-include", "%s.h" % prefix]
+    if extra is not None:
+        cmd += extra
+    return cmd
+
+
+def make_non_blocking(prefix, split, **kwargs):
 
     c_file = "%s.c" % prefix
     nb_file = "%s_non_blocking.c" % prefix
@@ -36,7 +52,7 @@ def make_non_blocking(prefix, split_all):
     plugin = ZeptoPlugin('manifest.xml')
 
     code, header, c2, parser = api.process_file(
-        c_file, plugin, prefix, split_all, True, "../papi.h")
+        c_file, plugin, prefix, split, True, "../papi.h", **kwargs)
 
     f = open(nb_file, 'wb')
     f.write(code)
@@ -97,12 +113,10 @@ def _build_and_run2(f, prefix, file_prefix):
 def _build_and_run(f, prefix, file_prefix):
 
     f.write('--- Build ---\n')
-    cmd = "gcc -fno-exceptions -g -Os -Wall -ffunction-sections "\
-        "-fdata-sections -std=c99 -I.. -DSA_PLUGIN_ID=%s "\
-        "-include %s.h "\
-        "-o %s.exe ../runner.c %s.c" % (prefix, prefix,
-                                        file_prefix, file_prefix)
-    f.write("%s\n" % cmd)
+    cmd = gcc_command(prefix, [".."],
+                      ["-o", "%s.exe" % file_prefix,
+                       "../runner.c", "%s.c" % file_prefix])
+    f.write("%s\n" % " ".join(cmd))
     sp = subprocess.Popen(
         cmd,
         shell=False,
@@ -117,7 +131,7 @@ def _build_and_run(f, prefix, file_prefix):
 
     f.write('\n---  Run  ---\n')
     sp = subprocess.Popen(
-        file_prefix + ".exe",
+        os.path.join(".", file_prefix + ".exe"),
         shell=False,
         stdout=subprocess.PIPE,
         stderr=subprocess.STDOUT)
@@ -23,40 +23,62 @@
 #define __PREFIX(id, name) id##name
 
 
+/* Number of times the handler is run to completion, used for benchmarks */
+#if !defined SA_RUNS
+#define SA_RUNS 1
+#endif
+
+/* When defined, the total number of handler entries is printed */
+#if defined SA_COUNT_ENTRIES
+static unsigned long entries = 0;
+#define SA_ENTERED() (++entries)
+#else
+#define SA_ENTERED()
+#endif
+
+
 int main(int argc, char *argv[]) {
 
     PREFIX(_plugin_config) config;
     PREFIX(_plugin_persistent_state) persist;
     char state_buffer[1024];
+    unsigned long runs;
     
-    uint8_t result = PREFIX(_plugin_exec_init)(&config, state_buffer);
-    
-    if (result != 0) {
-        printf("Error, exec_init returned %d", result);
-        return 1;
-    }
-    
-    
-    result = PREFIX(_plugin_handler_init)(&config, &persist);
-    
-    if (result != 0) {
-        printf("Error, handler_init returned %d", result);
-        return 1;
-    }
-    
-    parser_obj parser = 0;
-    MEMORY_HANDLE reply = 0;
-    waiting_for waiting = 0;
-    
-    do {
-        result = PREFIX(_plugin_handler)(&config, &persist, state_buffer, &parser, reply, &waiting, 0);
-    } while (result > 0);
-    
-    if (result != 0) {
-        printf("Error, handler returned %d", result);
-        return 1;
+    for (runs = 0; runs != SA_RUNS; ++runs) {
+        
+        uint8_t result = PREFIX(_plugin_exec_init)(&config, state_buffer);
+        
+        if (result != 0) {
+            printf("Error, exec_init returned %d", result);
+            return 1;
+        }
+        
+        
+        result = PREFIX(_plugin_handler_init)(&config, &persist);
+        
+        if (result != 0) {
+            printf("Error, handler_init returned %d", result);
+            return 1;
+        }
+        
+        parser_obj parser = 0;
+        MEMORY_HANDLE reply = 0;
+        waiting_for waiting = 0;
+        
+        do {
+            result = PREFIX(_plugin_handler)(&config, &persist, state_buffer, &parser, reply, &waiting, 0);
+            SA_ENTERED();
+        } while (result > 0);
+        
+        if (result != 0) {
+            printf("Error, handler returned %d", result);
+            return 1;
+        }
     }
     printf("Ok");
+#if defined SA_COUNT_ENTRIES
+    printf(" %lu entries", entries);
+#endif
     return 0;
 }
 
@@ -115,6 +137,8 @@ void papi_wait_for_i2c_send( uint8_t i2c_id, uint16_t addr, uint8_t addr_sz, uin
 void papi_wait_for_spi_receive( uint8_t spi_id, uint16_t addr, uint8_t addr_sz, uint16_t* data ) {}
 void papi_wait_for_i2c_receive( uint8_t i2c_id, uint16_t addr, uint8_t addr_sz, uint16_t* data ) {}
 void papi_wait_for_wait_handler( waiting_for* wf ) {}
+void papi_wait_for_all() {}
+void papi_wait_for_any( uint8_t* completed ) {*completed = 0;}
 
 //Helper functions to fill WAITING_FOR structure
 void papi_init_wait_handler( waiting_for* wf ) {}
@@ -0,0 +1,96 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "scalar_state.h"
+#include "papi.h"
+#include "scalar.h"
+#line 22 "scalar.c"
+#define HAPI_GPIO_VALUE_LOW 0
+#define HAPI_GPIO_VALUE_HIGH 1
+#define HAPI_GPIO_TYPE_OUTPUT 0
+
+void hapi_gpio_init(uint16_t pin_num)
+{
+}
+#line 27 "scalar.c"
+void hapi_gpio_set_mode(uint16_t pin_num, uint8_t mode)
+{
+}
+uint8_t scalar_plugin_handler_init(const void* plugin_config, void* plugin_state)
+{
+return PLUGIN_OK;
+}
+
+uint8_t scalar_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 37 "scalar.c"
+scalar_plugin_config* pc = (scalar_plugin_config*)plugin_config;
+hapi_gpio_init(pc->pin_led);
+hapi_gpio_set_mode(pc->pin_led, HAPI_GPIO_TYPE_OUTPUT);
+return PLUGIN_OK;
+}
+
+uint8_t scalar_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+scalar_plugin_state* sa_state = (scalar_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+scalar_plugin_config* pc = (scalar_plugin_config*)plugin_config;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+default: ZEPTO_ASSERT(0);
+}
+#line 50 "scalar.c"
+scalar_plugin_data req = scalar_plugin_parser_read(command);
+#line 50 "scalar.c"
+sa_state->sa_req_delay_ms = req.delay_ms;
+#line 50 "scalar.c"
+sa_state->sa_req_total_blinks = req.total_blinks;
+#line 50 "scalar.c"
+uint8_t sa_req_initial = req.initial;
+#line 50 "scalar.c"
+sa_state->sa_req_final = req.final;
+if(sa_req_initial>0)
+{
+#line 52 "scalar.c"
+papi_write_digital_pin(pc->pin_led, HAPI_GPIO_VALUE_HIGH);
+}
+
+sa_state->i = 0;
+for(; (sa_state->i)<(sa_state->sa_req_total_blinks);  (sa_state->i)++)
+{
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->sa_req_delay_ms));
+sa_state->sa_next = 1;
+return PLUGIN_WAITING;
+label_1:if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+return PLUGIN_WAITING;
+}
+}
+#line 61 "scalar.c"
+if((sa_state->sa_req_final)>0)
+{
+#line 62 "scalar.c"
+papi_write_digital_pin(pc->pin_led, HAPI_GPIO_VALUE_HIGH);
+}
+papi_reply_write_byte(reply, (sa_state->i));
+sa_state->sa_next = 0;
+#line 65 "scalar.c"
+return PLUGIN_OK;
+}
@@ -13,13 +13,22 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+import json
 import os
+import shutil
+import tempfile
 
 from smartanthill_phc import api
+from smartanthill_phc.c_node import IntegerLiteralExprNode
+from smartanthill_phc.common.base import ArgumentListNode
+from smartanthill_phc.common.compiler import Compiler, Ctx
+from smartanthill_phc.common.expr import BinaryOpExprNode, UnaryOpExprNode
+from smartanthill_phc.fold import get_constant_value
+from smartanthill_phc.interpreter import SimulatedPapi
 from smartanthill_phc.parse_write import ZeptoPlugin
 
 
-def composer_test(prefix):
+def composer_test(prefix, **kwargs):
 
     h_file = "%s.h" % prefix
     xml_file = "manifest.xml"
@@ -28,7 +37,8 @@ def composer_test(prefix):
     os.chdir("tests/%s" % prefix)
     try:
         plugin = ZeptoPlugin(xml_file)
-        code = api.process_manifest(plugin, prefix, False, "../papi.h")
+        code = api.process_manifest(plugin, prefix, False, "../papi.h",
+                                    **kwargs)
 
         f = open(h_file, 'rb')
         assert code == f.read()
@@ -36,11 +46,11 @@ def composer_test(prefix):
         os.chdir("../..")
 
 
-def non_blocking_test(prefix, split_all):
+def non_blocking_test(prefix, split, suffix='', **kwargs):
 
     c_file = "%s.c" % prefix
-    nb_file = "%s_non_blocking.c" % prefix
-    h_file = "%s_state.h" % prefix
+    nb_file = "%s%s_non_blocking.c" % (prefix, suffix)
+    h_file = "%s%s_state.h" % (prefix, suffix)
     parser_file = "%s.h" % prefix
     print os.getcwd()
 
@@ -48,7 +58,7 @@ def non_blocking_test(prefix, split_all):
     try:
         plugin = ZeptoPlugin("manifest.xml")
         code, header, c2, parser = api.process_file(
-            c_file, plugin, prefix, split_all, False, "../papi.h")
+            c_file, plugin, prefix, split, False, "../papi.h", **kwargs)
 
         assert_are_equal(nb_file, code.splitlines())
         assert_are_equal(h_file, header.splitlines())
@@ -58,6 +68,113 @@ def non_blocking_test(prefix, split_all):
         os.chdir("../..")
 
 
+def cost_report_test(prefix, split, **kwargs):
+
+    c_file = "%s.c" % prefix
+    text_file = "%s_costs.txt" % prefix
+    json_file = "%s_costs.json" % prefix
+
+    os.chdir("tests/%s" % prefix)
+    try:
+        plugin = ZeptoPlugin("manifest.xml")
+        text = api.report_costs(
+            c_file, plugin, prefix, split, "../papi.h", **kwargs)
+        assert_are_equal(text_file, text.splitlines())
+
+        text = api.report_costs(
+            c_file, plugin, prefix, split, "../papi.h", True, **kwargs)
+        assert_are_equal(json_file, text.splitlines())
+
+    finally:
+        os.chdir("../..")
+
+
+def size_report_test(prefix):
+
+    text_file = "%s_sizes.txt" % prefix
+    json_file = "%s_sizes.json" % prefix
+
+    os.chdir("tests/%s" % prefix)
+    try:
+        plugin = ZeptoPlugin("manifest.xml")
+        text = api.report_sizes(plugin)
+        assert_are_equal(text_file, text.splitlines())
+
+        text = api.report_sizes(plugin, True)
+        assert_are_equal(json_file, text.splitlines())
+
+    finally:
+        os.chdir("../..")
+
+
+def interpreter_test(prefix, split, sim, **kwargs):
+
+    c_file = "%s.c" % prefix
+    text_file = "%s_run.txt" % prefix
+
+    os.chdir("tests/%s" % prefix)
+    try:
+        plugin = ZeptoPlugin("manifest.xml")
+        text = api.simulate_handler(
+            c_file, plugin, prefix, split, "../papi.h", sim, **kwargs)
+        assert_are_equal(text_file, text.splitlines())
+
+    finally:
+        os.chdir("../..")
+
+
+def many_states_test(prefix, sub_states, handler_states, **kwargs):
+    '''
+    Generates a plugin with a sub state machine of sub_states states, and
+    a handler of handler_states states, and returns non blocking code and
+    state header
+    '''
+    lines = ['#include "%s.h"' % prefix,
+             '#include "%s_state.h"' % prefix,
+             '',
+             'uint8_t %s_plugin_exec_init(const void* plugin_config, '
+             'void* plugin_state)' % prefix,
+             '{', '    return PLUGIN_OK;', '}', '',
+             'uint8_t %s_plugin_handler_init(const void* plugin_config, '
+             'void* plugin_persistent_state)' % prefix,
+             '{', '    return PLUGIN_OK;', '}', '',
+             'void helper_func()', '{']
+    lines += ['    papi_sleep( 1 );'] * sub_states
+    lines += ['}', '',
+              'uint8_t %s_plugin_handler(const void* plugin_config,' % prefix,
+              '    void* plugin_persistent_state, void* plugin_state, '
+              'parser_obj* command,',
+              '    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)',
+              '{', '    helper_func();']
+    lines += ['    papi_sleep( 1 );'] * (handler_states - 1)
+    lines += ['    return PLUGIN_OK;', '}', '']
+
+    tmp = tempfile.mkdtemp()
+    try:
+        c_file = os.path.join(tmp, "%s.c" % prefix)
+        f = open(c_file, 'wb')
+        f.write('\n'.join(lines))
+        f.close()
+
+        plugin = ZeptoPlugin(os.path.join("tests", "sleep", "manifest.xml"))
+        code, header, _, _ = api.process_file(
+            c_file, plugin, prefix, False, False,
+            os.path.join("tests", "papi.h"), **kwargs)
+    finally:
+        shutil.rmtree(tmp)
+
+    return code, header
+
+
+def literal(compiler, txt):
+    '''
+    Returns a new integer literal expression node
+    '''
+    node = compiler.init_node(IntegerLiteralExprNode(), Ctx.ROOT)
+    node.txt_literal = txt
+    return node
+
+
 def assert_are_equal(file_name, text_array):
 
     f = open(file_name, 'rb')
@@ -79,6 +196,17 @@ def test_blink():
     non_blocking_test('blink', False)
 
 
+def test_buffer_sizes():
+
+    composer_test('buffer_sizes', buffer_sizes=True)
+    size_report_test('buffer_sizes')
+
+
+def test_computed_goto():
+
+    non_blocking_test('computed_goto', True, computed_goto=True)
+
+
 def test_debug():
 
     non_blocking_test('debug', True)
@@ -89,11 +217,216 @@ def test_expression():
     non_blocking_test('expression', False)
 
 
+def test_fast_poll():
+
+    non_blocking_test('fast_poll', False, overlap_waits=True, fast_polls=4)
+
+
+def test_fields_table():
+
+    composer_test('fields_table', fields_table=True)
+
+
+def test_fold():
+
+    non_blocking_test('fold', False, fold=True)
+
+    # shifts are not parsed yet, so the expression is built here
+    c = Compiler()
+    count = c.init_node(UnaryOpExprNode(), Ctx.ROOT)
+    count.txt_operator = '-'
+    count.expression.set(literal(c, '1'))
+    shift = c.init_node(BinaryOpExprNode(), Ctx.ROOT)
+    shift.argument_list.set(c.init_node(ArgumentListNode(), Ctx.ROOT))
+    shift.argument_list.get().arguments.add(literal(c, '2'))
+    shift.argument_list.get().arguments.add(count)
+
+    # negative shift count is undefined, not folded
+    for op in ('<<', '>>'):
+        shift.txt_operator = op
+        assert get_constant_value(shift) is None
+
+    count.txt_operator = '+'
+    assert get_constant_value(shift) == 1
+    shift.txt_operator = '<<'
+    assert get_constant_value(shift) == 4
+
+
+def test_inline():
+
+    non_blocking_test('inline', False, inline_threshold=4)
+
+
 def test_loop():
 
     non_blocking_test('loop', False)
 
 
+def test_outline():
+
+    non_blocking_test('outline', False, outline_waits=4)
+
+
+def test_overlap():
+
+    non_blocking_test('overlap', False, overlap_waits=True)
+
+
+def test_wait_for():
+
+    non_blocking_test('wait_for', False)
+
+
+def test_split():
+
+    non_blocking_test('split', 'block')
+    non_blocking_test('split', 'loop', '_loop')
+    non_blocking_test('split', 2, '_2')
+
+
+def test_yield():
+
+    non_blocking_test('yield', False, yield_budget=64)
+
+
+def test_cost_report():
+
+    cost_report_test('yield', False, yield_budget=64)
+
+
+def test_interpreter():
+    interpreter_test('blink', False, SimulatedPapi(
+        poll=50, entry=1, request={'total_blinks': 3, 'delay_ms': 200}))
+    interpreter_test('sub_machine', False, SimulatedPapi())
+    interpreter_test('yield', False, SimulatedPapi(calls={
+        'papi_parser_read_encoded_uint16': lambda *args: 40,
+        'papi_parser_read_byte': lambda *args: 1}), yield_budget=64)
+
+
+def test_options():
+
+    # rewrite is enabled unless an option it can not follow is
+    assert api.Options().rewrite
+    assert not api.Options(yield_budget=64).rewrite
+    assert not api.Options(rewrite=False).rewrite
+
+    try:
+        api.Options(yield_budget=64, rewrite=True)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_simulator():
+
+    os.chdir("tests/scenario")
+    try:
+        for policy in ('fifo', 'round_robin', 'priority'):
+            text = api.simulate_scenario("scenario.json", policy)
+            assert_are_equal("scenario_%s.txt" % policy, text.splitlines())
+
+    finally:
+        os.chdir("../..")
+
+
+def test_many_states():
+
+    # token based rewrite of so many states is slow, and not tested here
+    code, header = many_states_test('many', 300, 3000, rewrite=False)
+
+    assert "typedef struct _many_plugin_state1 {\nuint16_t sa_next;" in header
+    assert "typedef struct _many_plugin_state {\nuint16_t sa_next;" in header
+    assert "*(uint16_t*)(sa_state + 1) = 0;" in code
+    assert "if(*(uint16_t*)(sa_state + 1) != 0)" in code
+
+    # sub state machine is small enough for a single switch
+    assert code.count("switch(sa_state->sa_next) {") == 1
+    assert code.count("switch(sa_state->sa_next / 256) {") == 1
+    assert code.count("switch(sa_state->sa_next % 256) {") == 12
+    assert "case 11:\nswitch(sa_state->sa_next % 256) {\n"\
+        "case 0: goto label_2816;" in code
+
+    # label tables have an entry for each state, switch is the fallback
+    code, header = many_states_test('many', 300, 3000, computed_goto=True,
+                                    rewrite=False)
+
+    assert code.count("goto *sa_labels[sa_state->sa_next];") == 2
+    assert "&&label_300,\n};\nZEPTO_ASSERT(sa_state->sa_next < 301);\n"\
+        "goto *sa_labels[sa_state->sa_next];" in code
+    assert "&&label_3000,\n};\nZEPTO_ASSERT(sa_state->sa_next < 3001);\n"\
+        "goto *sa_labels[sa_state->sa_next];" in code
+    assert "#else\nswitch(sa_state->sa_next) {" in code
+    assert "#else\nswitch(sa_state->sa_next / 256) {" in code
+    assert code.count("switch(sa_state->sa_next % 256) {") == 12
+
+
+def test_narrow():
+
+    non_blocking_test('narrow', False, narrow_vars=True)
+
+
+def test_trace():
+    non_blocking_test('trace', False, trace=True)
+
+    os.chdir("tests/trace")
+    try:
+        plugin = ZeptoPlugin("manifest.xml")
+        text = api.write_state_map("trace.c", plugin, "trace", False,
+                                   "../papi.h")
+        assert_are_equal("trace_state_map.json", text.splitlines())
+
+        # trace.bin was captured running the code with sa_trace.h macros
+        text = api.decode_trace("trace_state_map.json", "trace.bin")
+        assert_are_equal("trace_decoded.txt", text.splitlines())
+
+        text = api.write_profile("trace_state_map.json", "trace.bin")
+        assert_are_equal("trace_profile.json", text.splitlines())
+
+    finally:
+        os.chdir("../..")
+
+
+def test_profile():
+    with open("tests/profile/profile.json") as f:
+        profile = json.load(f)
+    non_blocking_test('profile', False, profile=profile)
+
+
+def test_peephole():
+
+    non_blocking_test('peephole', True, peephole=True)
+
+
+def test_micro_sleep():
+
+    non_blocking_test('micro_sleep', False, micro_sleep=5)
+
+
+def test_parse_in_place():
+
+    non_blocking_test('parse_in_place', False, parse_in_place=True)
+
+
+def test_promote():
+
+    non_blocking_test('promote', False, promote_vars=4)
+
+
+def test_pack():
+
+    non_blocking_test('pack', False, pack_state=True)
+
+
+def test_remat():
+
+    non_blocking_test('remat', False, recompute=True)
+
+
+def test_scalar():
+
+    non_blocking_test('scalar', False, scalar_structs=True)
+
+
 def test_sleep():
 
     non_blocking_test('sleep', False)
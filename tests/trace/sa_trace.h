@@ -0,0 +1,70 @@
+/*******************************************************************************
+Copyright (C) 2016 OLogN Technologies AG
+
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+*******************************************************************************/
+
+/*
+ * Host side trace macros used to capture trace.bin, records are written
+ * as decoded by smartanthill_phc.trace, time is the count of records.
+ * Build with -include sa_trace.h before the plugin sources.
+ */
+
+#if !defined __SA_TRACE_H__
+#define __SA_TRACE_H__
+
+#include <stdio.h>
+#include <stdint.h>
+
+/* weak, so all sources included into share them */
+uint8_t sa_trace_buffer[4096] __attribute__((weak));
+uint32_t sa_trace_size __attribute__((weak)) = 0;
+
+void __attribute__((weak)) sa_trace_record(uint16_t value, uint8_t machine, uint8_t event)
+{
+    uint32_t time = sa_trace_size / 8;
+    if (sa_trace_size + 8 > sizeof(sa_trace_buffer))
+        return;
+
+    sa_trace_buffer[sa_trace_size++] = time & 0xff;
+    sa_trace_buffer[sa_trace_size++] = (time >> 8) & 0xff;
+    sa_trace_buffer[sa_trace_size++] = (time >> 16) & 0xff;
+    sa_trace_buffer[sa_trace_size++] = (time >> 24) & 0xff;
+    sa_trace_buffer[sa_trace_size++] = value & 0xff;
+    sa_trace_buffer[sa_trace_size++] = (value >> 8) & 0xff;
+    sa_trace_buffer[sa_trace_size++] = machine;
+    sa_trace_buffer[sa_trace_size++] = event;
+}
+
+void __attribute__((weak, destructor)) sa_trace_write(void)
+{
+    FILE* f = fopen("trace.bin", "wb");
+    if (f != NULL) {
+        fwrite(sa_trace_buffer, 1, sa_trace_size, f);
+        fclose(f);
+    }
+}
+
+#define SA_TRACE_STATE_ENTER(plugin, machine, state)\
+    sa_trace_record(state, machine, 1)
+#define SA_TRACE_YIELD(plugin, machine, state, reason)\
+    sa_trace_record(state, machine, 2 | ((reason) << 4))
+#define SA_TRACE_SUB_ENTER(plugin, machine, callee)\
+    sa_trace_record(callee, machine, 3)
+#define SA_TRACE_SUB_EXIT(plugin, machine, callee)\
+    sa_trace_record(callee, machine, 4)
+#define SA_TRACE_RETURN(plugin, machine)\
+    sa_trace_record(0, machine, 5)
+
+#endif // __SA_TRACE_H__
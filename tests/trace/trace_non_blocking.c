@@ -0,0 +1,128 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "trace_state.h"
+#include "papi.h"
+#include "trace.h"
+#line 22 "trace.c"
+uint8_t trace_plugin_handler_init(const void* plugin_config, void* plugin_state)
+{
+return PLUGIN_OK;
+}
+
+uint8_t trace_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 29 "trace.c"
+return PLUGIN_OK;
+}
+
+void wait_twice(void* sa_state0, waiting_for* sa_wf, uint8_t* sa_result, uint16_t delay)
+{
+trace_plugin_state1* sa_state = (trace_plugin_state1*)sa_state0;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+default: ZEPTO_ASSERT(0);
+}
+SA_TRACE_STATE_ENTER(trace, 0, 0);
+#line 34 "trace.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, delay);
+sa_state->sa_next = 1;
+SA_TRACE_YIELD(trace, 0, 1, PLUGIN_WAITING);
+*sa_result = PLUGIN_WAITING;
+return;
+label_1:
+SA_TRACE_STATE_ENTER(trace, 0, 1);
+if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+SA_TRACE_YIELD(trace, 0, 1, PLUGIN_WAITING);
+*sa_result = PLUGIN_WAITING;
+return;
+}
+#line 35 "trace.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, delay);
+sa_state->sa_next = 2;
+SA_TRACE_YIELD(trace, 0, 2, PLUGIN_WAITING);
+*sa_result = PLUGIN_WAITING;
+return;
+label_2:
+SA_TRACE_STATE_ENTER(trace, 0, 2);
+if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+SA_TRACE_YIELD(trace, 0, 2, PLUGIN_WAITING);
+*sa_result = PLUGIN_WAITING;
+return;
+}
+sa_state->sa_next = 0;
+SA_TRACE_RETURN(trace, 0);
+}
+#line 38 "trace.c"
+uint8_t trace_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, ZEPTO_PARSER* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+trace_plugin_state* sa_state = (trace_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+
+uint8_t sa_result0 = PLUGIN_OK;
+
+uint8_t* sa_result = &sa_result0;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+default: ZEPTO_ASSERT(0);
+}
+SA_TRACE_STATE_ENTER(trace, 1, 0);
+#line 42 "trace.c"
+trace_plugin_data req = trace_plugin_parser_read(command);
+sa_state->delay = req.delay_ms;
+sa_state->i = 0;
+
+for((sa_state->i)=0; (sa_state->i)<3;  (sa_state->i)++)
+{
+#line 47 "trace.c"
+papi_wait_handler_add_wait_for_timeout(sa_wf, (sa_state->delay));
+sa_state->sa_next = 1;
+SA_TRACE_YIELD(trace, 1, 1, PLUGIN_WAITING);
+return PLUGIN_WAITING;
+label_1:
+SA_TRACE_STATE_ENTER(trace, 1, 1);
+if(papi_wait_handler_is_waiting_for_timeout(0, sa_wf))
+{
+SA_TRACE_YIELD(trace, 1, 1, PLUGIN_WAITING);
+return PLUGIN_WAITING;
+}
+}
+*(uint8_t*)(sa_state + 1) = 0;
+sa_state->sa_next = 2;
+label_2: 
+SA_TRACE_STATE_ENTER(trace, 1, 2);
+SA_TRACE_SUB_ENTER(trace, 1, 0);
+#line 50 "trace.c"
+wait_twice((void*)(sa_state + 1), sa_wf, sa_result, (sa_state->delay));
+if(*(uint8_t*)(sa_state + 1) != 0) 
+return *sa_result;
+SA_TRACE_SUB_EXIT(trace, 1, 0);
+#line 52 "trace.c"
+papi_reply_write_byte(reply, (sa_state->i));
+sa_state->sa_next = 0;
+SA_TRACE_RETURN(trace, 1);
+#line 53 "trace.c"
+return PLUGIN_OK;
+}
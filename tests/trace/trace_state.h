@@ -0,0 +1,45 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#if !defined __SA_TRACE_PLUGIN_STATE_H__
+#define __SA_TRACE_PLUGIN_STATE_H__
+
+#include <stdint.h>
+
+
+#if !defined SA_TRACE_STATE_ENTER
+#define SA_TRACE_STATE_ENTER(plugin, machine, state)
+#define SA_TRACE_YIELD(plugin, machine, state, reason)
+#define SA_TRACE_SUB_ENTER(plugin, machine, callee)
+#define SA_TRACE_SUB_EXIT(plugin, machine, callee)
+#define SA_TRACE_RETURN(plugin, machine)
+#endif
+
+typedef struct _trace_plugin_state1 {
+uint8_t sa_next;
+} trace_plugin_state1;
+
+typedef struct _trace_plugin_state {
+uint8_t sa_next;
+#line 44 "trace.c"
+uint8_t i;
+#line 43 "trace.c"
+uint16_t delay;
+} trace_plugin_state;
+
+#endif // __SA_TRACE_PLUGIN_STATE_H__
@@ -0,0 +1,60 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+#include "papi.h"
+#include "wait_for.h"
+#include "wait_for_state.h"
+
+uint8_t wait_for_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t wait_for_plugin_handler_init(const void* plugin_config,
+                                    void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+
+uint8_t wait_for_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    const wait_for_plugin_config* pc = (const wait_for_plugin_config*) plugin_config;
+
+    uint16_t data = papi_parser_read_encoded_uint16( command );
+
+    papi_start_sending_spi_command_16(pc->spi_id, 0x0003, 0x08, data, 0x02);
+    papi_start_sending_i2c_command_16(pc->i2c_id, 0x0003, 0x08, data, 0x02);
+    papi_wait_for_all();
+
+    uint16_t spi_response = 0;
+    uint16_t i2c_response = 0;
+    uint8_t completed = 0;
+    papi_start_receiving_spi_data_16( pc->spi_id, 0x0000, 0x08, &spi_response );
+    papi_start_receiving_i2c_data_16( pc->i2c_id, 0x0000, 0x08, &i2c_response );
+    papi_wait_for_any( &completed );
+
+    if ( completed == 0 ) {
+        papi_reply_write_encoded_uint16( reply, spi_response );
+    }
+    else {
+        papi_reply_write_encoded_uint16( reply, i2c_response );
+    }
+
+    return PLUGIN_OK;
+}
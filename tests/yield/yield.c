@@ -0,0 +1,63 @@
+// Copyright (C) 2015 OLogN Technologies AG
+//
+// This source file is free software; you can redistribute it and/or
+// modify it under the terms of the GNU General Public License version 2
+// as published by the Free Software Foundation.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License along
+// with this program; if not, write to the Free Software Foundation, Inc.,
+// 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+#include "papi.h"
+#include "yield.h"
+#include "yield_state.h"
+
+uint8_t yield_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+    return PLUGIN_OK;
+}
+
+uint8_t yield_plugin_handler_init(const void* plugin_config,
+                                    void* plugin_persistent_state)
+{
+    return PLUGIN_OK;
+}
+
+
+uint8_t yield_plugin_handler(const void* plugin_config,
+    void* plugin_persistent_state, void* plugin_state, parser_obj* command,
+    MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+    uint16_t count = papi_parser_read_encoded_uint16( command );
+
+    // unknown trip count, yields once every few iterations
+    uint16_t sum = 0;
+    for (uint16_t i = 0; i < count; i++) {
+        sum = sum + papi_parser_read_byte( command );
+    }
+
+    // counter restarted in the body, trip count is not known
+    uint8_t parity = 0;
+    uint8_t retry = 1;
+    for (uint8_t j = 0; j < 4; j++) {
+        parity = parity + j;
+        if (parity > first_byte && retry != 0) {
+            parity = 0;
+            j = 0;
+            retry = 0;
+        }
+    }
+
+    papi_reply_write_encoded_uint16( reply, sum );
+    papi_reply_write_encoded_uint16( reply, parity );
+    papi_reply_write_encoded_uint16( reply, count );
+    papi_reply_write_encoded_uint16( reply, sum - count );
+
+    return PLUGIN_OK;
+}
@@ -0,0 +1,110 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#include "yield_state.h"
+#include "papi.h"
+#include "yield.h"
+#include "yield_state.h"
+#line 21 "yield.c"
+uint8_t yield_plugin_exec_init(const void* plugin_config, void* plugin_state)
+{
+*(uint8_t*)plugin_state = 0;
+#line 23 "yield.c"
+return PLUGIN_OK;
+}
+
+uint8_t yield_plugin_handler_init(const void* plugin_config, void* plugin_persistent_state)
+{
+
+return PLUGIN_OK;
+}
+
+
+uint8_t yield_plugin_handler(const void* plugin_config, void* plugin_persistent_state, void* plugin_state, parser_obj* command, MEMORY_HANDLE reply, waiting_for* wf, uint8_t first_byte)
+{
+yield_plugin_state* sa_state = (yield_plugin_state*)plugin_state;
+waiting_for* sa_wf = wf;
+switch(sa_state->sa_next) {
+case 0: break;
+case 1: goto label_1;
+case 2: goto label_2;
+case 3: goto label_3;
+default: ZEPTO_ASSERT(0);
+}
+#line 37 "yield.c"
+sa_state->count = papi_parser_read_encoded_uint16(command);
+
+
+sa_state->sum = 0;
+{
+#line 41 "yield.c"
+sa_state->i = 0;
+
+sa_state->sa_yield_1 = 0;
+#line 41 "yield.c"
+for(; (sa_state->i)<(sa_state->count);  (sa_state->i)++)
+{
+#line 42 "yield.c"
+(sa_state->sum)=(sa_state->sum)+papi_parser_read_byte(command);
+if(++sa_state->sa_yield_1 == 4) {
+sa_state->sa_yield_1 = 0;
+sa_state->sa_next = 1;
+return PLUGIN_YIELD;
+}
+label_1: /* nop */ ;
+}
+}
+#line 46 "yield.c"
+sa_state->parity = 0;
+sa_state->retry = 1;
+{
+#line 48 "yield.c"
+sa_state->j = 0;
+#line 55 "yield.c"
+sa_state->sa_yield_2 = 0;
+#line 48 "yield.c"
+for(; (sa_state->j)<4;  (sa_state->j)++)
+{
+#line 49 "yield.c"
+(sa_state->parity)=(sa_state->parity)+(sa_state->j);
+if((sa_state->parity)>first_byte&&(sa_state->retry)!=0)
+{
+#line 51 "yield.c"
+(sa_state->parity)=0;
+(sa_state->j)=0;
+(sa_state->retry)=0;
+}
+if(++sa_state->sa_yield_2 == 4) {
+sa_state->sa_yield_2 = 0;
+sa_state->sa_next = 2;
+return PLUGIN_YIELD;
+}
+label_2: /* nop */ ;
+}
+}
+sa_state->sa_next = 3;
+return PLUGIN_YIELD;
+label_3: /* nop */ ;
+#line 57 "yield.c"
+papi_reply_write_encoded_uint16(reply, (sa_state->sum));
+papi_reply_write_encoded_uint16(reply, (sa_state->parity));
+papi_reply_write_encoded_uint16(reply, (sa_state->count));
+papi_reply_write_encoded_uint16(reply, (sa_state->sum)-(sa_state->count));
+sa_state->sa_next = 0;
+return PLUGIN_OK;
+}
@@ -0,0 +1,45 @@
+/*****************************************************************************
+    Copyright (C) 2015 OLogN Technologies AG
+    
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the GNU General Public License version 2 as
+    published by the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to the Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+    
+*****************************************************************************/
+
+#if !defined __SA_YIELD_PLUGIN_STATE_H__
+#define __SA_YIELD_PLUGIN_STATE_H__
+
+#include <stdint.h>
+
+
+typedef struct _yield_plugin_state {
+uint8_t sa_next;
+#line 43 "yield.c"
+uint8_t sa_yield_1;
+#line 41 "yield.c"
+uint16_t i;
+#line 37 "yield.c"
+uint16_t count;
+
+
+uint16_t sum;
+#line 55 "yield.c"
+uint8_t sa_yield_2;
+#line 48 "yield.c"
+uint8_t j;
+#line 46 "yield.c"
+uint8_t parity;
+uint8_t retry;
+} yield_plugin_state;
+
+#endif // __SA_YIELD_PLUGIN_STATE_H__